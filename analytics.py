@@ -0,0 +1,192 @@
+"""
+analytics.py - Vectorized in-memory analytics snapshot
+Vehicle Violation Management System
+
+Loads the analytic columns of `violations` once into NumPy arrays, with the
+vehicle type, violation type and status stored as small categorical codes
+from config.py. Filters, group-bys, histograms and percentiles are then
+answered with vectorized operations instead of a GROUP BY round trip.
+
+    snapshot = AnalyticsSnapshot(db)
+    snapshot.refresh()                              # initial load
+    paid = snapshot.mask(status="Paid")
+    snapshot.count_by("violation_type", paid)
+    snapshot.refresh()                              # only new/changed rows
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from config import VEHICLE_TYPES, VIOLATION_TYPES, STATUS_TYPES
+
+OTHER_CATEGORY = '(other)'
+
+# Categorical dimensions and their labels; unknown values map to OTHER_CATEGORY
+DIMENSIONS = {
+    'vehicle_type': list(VEHICLE_TYPES) + [OTHER_CATEGORY],
+    'violation_type': list(VIOLATION_TYPES) + [OTHER_CATEGORY],
+    'status': list(STATUS_TYPES) + [OTHER_CATEGORY],
+}
+
+CODE_DTYPE = np.int16
+
+
+def _encoder(labels: List[str]):
+    codes = {label: code for code, label in enumerate(labels)}
+    other = len(labels) - 1
+    return lambda value: codes.get(value, other)
+
+
+class AnalyticsSnapshot:
+    def __init__(self, db):
+        self.db = db
+        self.ids = np.empty(0, dtype=np.int64)
+        self.fines = np.empty(0, dtype=np.float64)
+        self.date_times = np.empty(0, dtype='datetime64[s]')
+        self.codes = {name: np.empty(0, dtype=CODE_DTYPE) for name in DIMENSIONS}
+        self._encoders = {name: _encoder(labels) for name, labels in DIMENSIONS.items()}
+        # High-water marks for incremental refresh
+        self.max_id = 0
+        self.max_updated: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def refresh(self) -> int:
+        """Pull rows added or changed since the last refresh; returns how many"""
+        rows = self.db.fetch_analytics_rows(self.max_id, self.max_updated)
+        if self.refreshed_at is not None:
+            # Margin for clock skew against the server; removing twice is harmless
+            self.remove(self.db.get_deleted_ids_since(self.refreshed_at - timedelta(minutes=1)))
+        self.refreshed_at = datetime.now()
+        if not rows:
+            return 0
+
+        rows = sorted(rows, key=lambda row: row[0])
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        fines = np.fromiter((float(row[4]) for row in rows), dtype=np.float64, count=len(rows))
+        date_times = np.array([row[5] for row in rows], dtype='datetime64[s]')
+        codes = {}
+        for column, name in ((1, 'vehicle_type'), (2, 'violation_type'), (3, 'status')):
+            encode = self._encoders[name]
+            codes[name] = np.fromiter((encode(row[column]) for row in rows),
+                                      dtype=CODE_DTYPE, count=len(rows))
+
+        # Rows we already hold are overwritten in place; the rest are appended
+        positions = np.searchsorted(self.ids, ids)
+        in_range = positions < len(self.ids)
+        existing = np.zeros(len(ids), dtype=bool)
+        existing[in_range] = self.ids[positions[in_range]] == ids[in_range]
+
+        target = positions[existing]
+        self.fines[target] = fines[existing]
+        self.date_times[target] = date_times[existing]
+        for name in DIMENSIONS:
+            self.codes[name][target] = codes[name][existing]
+
+        new = ~existing
+        if new.any():
+            self.ids = np.concatenate([self.ids, ids[new]])
+            self.fines = np.concatenate([self.fines, fines[new]])
+            self.date_times = np.concatenate([self.date_times, date_times[new]])
+            for name in DIMENSIONS:
+                self.codes[name] = np.concatenate([self.codes[name], codes[name][new]])
+            order = np.argsort(self.ids, kind='stable')
+            if not np.array_equal(order, np.arange(len(order))):
+                self._reorder(order)
+
+        self.max_id = max(self.max_id, int(ids.max()))
+        latest = max((row[6] for row in rows if row[6] is not None), default=None)
+        if latest is not None and (self.max_updated is None or latest > self.max_updated):
+            self.max_updated = latest
+        return len(rows)
+
+    def remove(self, violation_ids: Sequence[int]):
+        """Drop rows that were deleted or archived"""
+        if not len(self.ids) or not len(violation_ids):
+            return
+        keep = ~np.isin(self.ids, np.asarray(violation_ids, dtype=np.int64))
+        self._reorder(np.nonzero(keep)[0])
+
+    def _reorder(self, index: np.ndarray):
+        self.ids = self.ids[index]
+        self.fines = self.fines[index]
+        self.date_times = self.date_times[index]
+        for name in DIMENSIONS:
+            self.codes[name] = self.codes[name][index]
+
+    def mask(self, vehicle_type: Optional[str] = None, violation_type: Optional[str] = None,
+             status: Optional[str] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, min_fine: Optional[float] = None,
+             max_fine: Optional[float] = None) -> np.ndarray:
+        """Boolean row filter; every argument left as None matches everything"""
+        result = np.ones(len(self.ids), dtype=bool)
+        for name, value in (('vehicle_type', vehicle_type), ('violation_type', violation_type),
+                            ('status', status)):
+            if value is not None:
+                result &= self.codes[name] == self._encoders[name](value)
+        if start is not None:
+            result &= self.date_times >= np.datetime64(start, 's')
+        if end is not None:
+            result &= self.date_times < np.datetime64(end, 's')
+        if min_fine is not None:
+            result &= self.fines >= min_fine
+        if max_fine is not None:
+            result &= self.fines <= max_fine
+        return result
+
+    def _labels(self, dimension: str) -> List[str]:
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'")
+        return DIMENSIONS[dimension]
+
+    def count_by(self, dimension: str, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Row count per category"""
+        labels = self._labels(dimension)
+        codes = self.codes[dimension] if mask is None else self.codes[dimension][mask]
+        counts = np.bincount(codes, minlength=len(labels))
+        return {label: int(count) for label, count in zip(labels, counts) if count}
+
+    def sum_by(self, dimension: str, mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """Total fines per category"""
+        labels = self._labels(dimension)
+        codes, fines = self.codes[dimension], self.fines
+        if mask is not None:
+            codes, fines = codes[mask], fines[mask]
+        totals = np.bincount(codes, weights=fines, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        return {label: float(total) for label, total, count in zip(labels, totals, counts) if count}
+
+    def crosstab(self, rows: str, columns: str, mask: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """Counts for every (rows, columns) category pair, e.g. status mix by type"""
+        row_labels, column_labels = self._labels(rows), self._labels(columns)
+        row_codes = self.codes[rows].astype(np.int64)
+        column_codes = self.codes[columns].astype(np.int64)
+        if mask is not None:
+            row_codes, column_codes = row_codes[mask], column_codes[mask]
+        flat = np.bincount(row_codes * len(column_labels) + column_codes,
+                           minlength=len(row_labels) * len(column_labels))
+        table = flat.reshape(len(row_labels), len(column_labels))
+        return {
+            row_label: {column_labels[j]: int(table[i, j]) for j in np.nonzero(table[i])[0]}
+            for i, row_label in enumerate(row_labels) if table[i].any()
+        }
+
+    def fine_histogram(self, bins: int = 20, mask: Optional[np.ndarray] = None):
+        """(counts, bin_edges) of the fine distribution"""
+        fines = self.fines if mask is None else self.fines[mask]
+        return np.histogram(fines, bins=bins)
+
+    def fine_percentiles(self, percentiles: Sequence[float] = (50, 90, 99),
+                         mask: Optional[np.ndarray] = None) -> Dict[float, float]:
+        fines = self.fines if mask is None else self.fines[mask]
+        if not len(fines):
+            return {}
+        values = np.percentile(fines, percentiles)
+        return {p: float(v) for p, v in zip(percentiles, values)}
+
+    def hourly_counts(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Violations per hour of day (24 buckets)"""
+        date_times = self.date_times if mask is None else self.date_times[mask]
+        hours = (date_times - date_times.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+        return np.bincount(hours, minlength=24)
@@ -0,0 +1,461 @@
+"""
+anpr_daemon.py - Camera detection ingestion daemon
+Vehicle Violation Management System
+
+Turns ANPR camera detections into violations without the Tk form.
+Detections are JSON objects with the violations columns (plate_number,
+vehicle_type, violation_type, location, optional date_time, fine_amount,
+camera_id, notes) and arrive two ways:
+
+  * spool directory: cameras write *.jsonl files (to a temporary name, then
+    rename). A file is moved to spool/done/ only after every line in it
+    is committed, so a crash means the file is read again on restart.
+    A file that cannot be read to the end is moved to spool/rejects/;
+    lines that are not valid UTF-8 or JSON go to spool/rejects.jsonl.
+  * socket: one JSON object per line. The daemon answers each line with
+    "ok" once the detection is committed, or "error <reason>" if it is
+    invalid or the database refused it. Clients resend anything left
+    unanswered.
+
+Both sources feed one bounded queue. When the queue is full, readers stop
+reading, which pushes back through TCP to the cameras. A single writer
+drains the queue in micro-batches (by size or age) and inserts each batch
+in one transaction. While the database is unreachable a batch is retried
+with back-off rather than dropped; a batch the database refuses is split
+until the offending detection is isolated in spool/dead_letter.jsonl.
+Delivery is at-least-once; redelivered detections merge into the existing
+row through duplicate detection. On shutdown the queue gets
+`shutdown_timeout` seconds to commit; whatever is left is redelivered
+after restart (spool files stay put, socket lines go unanswered).
+
+    python anpr_daemon.py [--spool spool] [--port 8090] [--metrics-port 8091]
+    curl http://127.0.0.1:8091/metrics
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import ANPR_CONFIG
+from db_pool import is_connection_error
+from fines import FineScheduleCache
+from ingest import normalize_record, install_fine_schedule
+
+
+def detection_to_record(event: Dict) -> Dict:
+    """Validate one detection into a violations record (raises ValueError)"""
+    if not isinstance(event, dict):
+        raise ValueError("detection must be a JSON object")
+    fields = {key: str(value) for key, value in event.items() if value is not None}
+    if not fields.get('officer_name'):
+        fields['officer_name'] = f"Camera {fields['camera_id']}" if fields.get('camera_id') else 'Camera'
+    return normalize_record(fields)
+
+
+class Detection:
+    """A queued record; on_done(error) is called with None once it is committed,
+    or with the reason it was moved to the dead-letter file"""
+    __slots__ = ('record', 'received_at', 'on_done')
+
+    def __init__(self, record: Dict, on_done: Callable[[Optional[str]], None]):
+        self.record = record
+        self.received_at = time.monotonic()
+        self.on_done = on_done
+
+
+class SpoolFile:
+    """Moves a spool file to done/ once every detection read from it is committed"""
+
+    def __init__(self, path: str, done_dir: str):
+        self.path = path
+        self.done_dir = done_dir
+        self.pending = 0
+        self.fully_read = False
+
+    def committed(self, error: Optional[str] = None):
+        # A dead-lettered line is kept in dead_letter.jsonl, so it counts as handled
+        self.pending -= 1
+        self.finish()
+
+    def finish(self):
+        if self.fully_read and self.pending == 0:
+            os.replace(self.path, os.path.join(self.done_dir, os.path.basename(self.path)))
+
+
+class Metrics:
+    def __init__(self, window: float = 10.0):
+        self.started = time.time()
+        self.received = 0
+        self.committed = 0
+        self.rejected = 0
+        self.rejected_files = 0
+        self.batches = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+        self.last_commit_lag = 0.0
+        self.max_commit_lag = 0.0
+        self.window = window
+        self._recent = deque()
+
+    def record_batch(self, size: int, lag: float):
+        now = time.monotonic()
+        self.batches += 1
+        self.committed += size
+        self.last_commit_lag = lag
+        self.max_commit_lag = max(self.max_commit_lag, lag)
+        self._recent.append((now, size))
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+
+    def throughput(self) -> float:
+        """Committed detections per second over the recent window"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0][0] > self.window:
+            self._recent.popleft()
+        return sum(size for _, size in self._recent) / self.window
+
+
+class AnprDaemon:
+    def __init__(self, db=None, config: Optional[Dict] = None):
+        self.config = dict(ANPR_CONFIG, **(config or {}))
+        self.db = db
+        self.queue: Optional[asyncio.Queue] = None
+        self.metrics = Metrics()
+        # The database handle is only ever used from this one thread
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='anpr-writer')
+        self._fines: Optional[FineScheduleCache] = None
+        self._claimed = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    def _open_database(self):
+        if self.db is None:
+            from database import ViolationDatabase
+            self.db = ViolationDatabase()
+        self._fines = FineScheduleCache(self.db)
+        install_fine_schedule(self._fines.schedule())
+
+    async def submit(self, record: Dict, on_done: Callable[[Optional[str]], None]):
+        """Queue one valid detection, waiting while the queue is full"""
+        self.metrics.received += 1
+        await self.queue.put(Detection(record, on_done))
+
+    # --- Writer -----------------------------------------------------------
+
+    def _insert(self, records: List[Dict]):
+        install_fine_schedule(self._fines.schedule())
+        return self.db.insert_violations_bulk(records, self.config['on_duplicate'])
+
+    def _reconnect(self):
+        """Replace the handle after a connection error (writer thread)
+
+        A connection revived with ping(reconnect=True) has no database
+        selected, so every retry would fail; open a fresh handle instead.
+        If the server is still down this raises and the next retry tries again.
+        """
+        from database import ViolationDatabase
+        try:
+            self.db.close()
+        except Exception:
+            pass
+        self.db = ViolationDatabase(getattr(self.db, 'config', None), check_schema=False)
+        self._fines.db = self.db
+
+    async def batcher(self):
+        """Drain the queue in micro-batches, one transaction each"""
+        loop = asyncio.get_running_loop()
+        batch_size, batch_timeout = self.config['batch_size'], self.config['batch_timeout']
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + batch_timeout
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.write_batch(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def write_batch(self, batch: List[Detection]):
+        """Insert a batch, retrying with back-off until it commits"""
+        loop = asyncio.get_running_loop()
+        records = [detection.record for detection in batch]
+        delay = 0.5
+        while True:
+            try:
+                await loop.run_in_executor(self._writer, self._insert, records)
+                break
+            except Exception as e:
+                if not is_connection_error(e):
+                    # The data, not the server, is at fault: isolate the bad detection
+                    await self.split_batch(batch, e)
+                    return
+                self.metrics.retries += 1
+                self.metrics.last_error = str(e)
+                print(f"⚠ Batch of {len(batch)} not committed, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.config['retry_max_seconds'])
+                try:
+                    await loop.run_in_executor(self._writer, self._reconnect)
+                except Exception:
+                    pass
+
+        self.metrics.record_batch(len(batch), time.monotonic() - batch[0].received_at)
+        for detection in batch:
+            detection.on_done(None)
+
+    async def split_batch(self, batch: List[Detection], error: Exception):
+        """Retry halves of a rejected batch; a single bad detection goes to the dead-letter file"""
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            await self.write_batch(batch[:middle])
+            await self.write_batch(batch[middle:])
+            return
+
+        detection = batch[0]
+        self.metrics.dead_lettered += 1
+        self.metrics.last_error = str(error)
+        print(f"✗ Detection for {detection.record['plate_number']} moved to dead letters: {error}")
+        dead_letter_path = os.path.join(self.config['spool_dir'], 'dead_letter.jsonl')
+        with open(dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'record': detection.record, 'error': str(error)}, default=str) + "\n")
+        detection.on_done(" ".join(str(error).split()) or type(error).__name__)
+
+    # --- Sources ----------------------------------------------------------
+
+    async def watch_spool(self):
+        """Pick up finished *.jsonl files from the spool directory"""
+        spool_dir = self.config['spool_dir']
+        done_dir = os.path.join(spool_dir, 'done')
+        rejects_dir = os.path.join(spool_dir, 'rejects')
+        os.makedirs(done_dir, exist_ok=True)
+        os.makedirs(rejects_dir, exist_ok=True)
+        rejects_path = os.path.join(spool_dir, 'rejects.jsonl')
+        while True:
+            names = sorted(name for name in os.listdir(spool_dir) if name.endswith('.jsonl')
+                           and name not in ('rejects.jsonl', 'dead_letter.jsonl'))
+            # Forget files already moved to done/
+            self._claimed &= {os.path.join(spool_dir, name) for name in names}
+            for name in names:
+                path = os.path.join(spool_dir, name)
+                if path in self._claimed:
+                    continue
+                self._claimed.add(path)
+                try:
+                    await self.read_spool_file(SpoolFile(path, done_dir), rejects_path)
+                except OSError as e:
+                    self.reject_spool_file(path, rejects_dir, e)
+            await asyncio.sleep(self.config['poll_interval'])
+
+    async def read_spool_file(self, spool_file: SpoolFile, rejects_path: str):
+        # Read as bytes so one badly encoded line is rejected on its own
+        with open(spool_file.path, 'rb') as f, \
+                open(rejects_path, 'a', encoding='utf-8') as rejects:
+            for raw in f:
+                if not raw.strip():
+                    continue
+                try:
+                    line = raw.decode('utf-8')
+                    record = detection_to_record(json.loads(line))
+                except ValueError as e:  # includes UnicodeDecodeError
+                    self.metrics.rejected += 1
+                    rejects.write(json.dumps({'file': os.path.basename(spool_file.path),
+                                              'line': raw.decode('utf-8', 'replace').rstrip('\n'),
+                                              'error': str(e)}) + "\n")
+                    continue
+                spool_file.pending += 1
+                await self.submit(record, spool_file.committed)
+        spool_file.fully_read = True
+        spool_file.finish()
+
+    def reject_spool_file(self, path: str, rejects_dir: str, error: Exception):
+        """Move a spool file that could not be read out of the way
+
+        Lines already queued from it are still committed; replaying the file
+        from rejects/ later is safe, since duplicates merge.
+        """
+        self.metrics.rejected_files += 1
+        self.metrics.last_error = f"{os.path.basename(path)}: {error}"
+        print(f"✗ Spool file {path} unreadable, moved to {rejects_dir}: {error}")
+        try:
+            os.replace(path, os.path.join(rejects_dir, os.path.basename(path)))
+        except OSError as e:
+            print(f"✗ Could not move {path}: {e}")
+
+    async def supervise(self, name: str, factory: Callable[[], Awaitable]):
+        """Run a background coroutine, restarting it if it fails"""
+        while True:
+            try:
+                await factory()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics.last_error = f"{name}: {e}"
+                print(f"✗ {name} failed, restarting: {e}")
+                await asyncio.sleep(self.config['poll_interval'])
+
+    async def handle_socket(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read detections line by line and answer each once it is committed"""
+        replies: asyncio.Queue = asyncio.Queue()
+
+        async def answer():
+            while True:
+                reply = await replies.get()
+                if reply is None:
+                    return
+                if isinstance(reply, asyncio.Future):
+                    reply = await reply
+                writer.write(reply.encode() + b"\n")
+                await writer.drain()
+
+        answering = asyncio.create_task(answer())
+        loop = asyncio.get_running_loop()
+        try:
+            while not answering.done():
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    record = detection_to_record(json.loads(line))
+                except ValueError as e:
+                    self.metrics.rejected += 1
+                    replies.put_nowait(f"error {e}")
+                    continue
+                committed = loop.create_future()
+                replies.put_nowait(committed)
+                await self.submit(record, lambda error, future=committed: future.done() or future.set_result(
+                    "ok" if error is None else f"error {error}"))
+            replies.put_nowait(None)
+            await answering
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            answering.cancel()
+            writer.close()
+
+    async def handle_metrics(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer any HTTP request with the counters as JSON"""
+        try:
+            while (await reader.readline()).strip():
+                pass
+            body = json.dumps(self.snapshot(), indent=2).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(body)).encode() +
+                         b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def snapshot(self) -> Dict:
+        metrics = self.metrics
+        return {
+            'uptime_seconds': round(time.time() - metrics.started, 1),
+            'received': metrics.received,
+            'committed': metrics.committed,
+            'rejected': metrics.rejected,
+            'rejected_files': metrics.rejected_files,
+            'batches': metrics.batches,
+            'retries': metrics.retries,
+            'dead_lettered': metrics.dead_lettered,
+            'queue_depth': self.queue.qsize() if self.queue else 0,
+            'queue_capacity': self.config['queue_size'],
+            'throughput_per_second': round(metrics.throughput(), 1),
+            'commit_lag_seconds': round(metrics.last_commit_lag, 3),
+            'max_commit_lag_seconds': round(metrics.max_commit_lag, 3),
+            'last_error': metrics.last_error,
+        }
+
+    # --- Lifecycle --------------------------------------------------------
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        """Serve until stopped, then commit everything already queued"""
+        self.queue = asyncio.Queue(maxsize=self.config['queue_size'])
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._writer, self._open_database)
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+
+        os.makedirs(self.config['spool_dir'], exist_ok=True)
+        detections = await asyncio.start_server(self.handle_socket, self.config['host'],
+                                                self.config['port'], backlog=1024)
+        metrics = await asyncio.start_server(self.handle_metrics, self.config['host'],
+                                             self.config['metrics_port'])
+        batcher = asyncio.create_task(self.batcher())
+        spool = asyncio.create_task(self.supervise('Spool watcher', self.watch_spool))
+        print(f"✓ ANPR daemon listening on {self.config['host']}:{self.config['port']}, "
+              f"spool '{self.config['spool_dir']}', metrics on port {self.config['metrics_port']}")
+
+        try:
+            await self._stopping.wait()
+        finally:
+            print("✓ Stopping: no new detections, committing the queue...")
+            detections.close()
+            spool.cancel()
+            timeout = self.config['shutdown_timeout']
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠ Queue not committed after {timeout}s ({self.queue.qsize():,} detection(s) "
+                      f"still waiting); uncommitted detections are redelivered after restart")
+            batcher.cancel()
+            metrics.close()
+            try:
+                # Queued behind an insert that may still be waiting on the server
+                await asyncio.wait_for(loop.run_in_executor(self._writer, self.db.close), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._writer.shutdown(wait=False)
+            print(f"✓ ANPR daemon stopped ({self.metrics.committed:,} committed, "
+                  f"{self.metrics.rejected:,} rejected)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest ANPR camera detections")
+    parser.add_argument("--spool", default=ANPR_CONFIG['spool_dir'], help="spool directory to watch")
+    parser.add_argument("--host", default=ANPR_CONFIG['host'])
+    parser.add_argument("--port", type=int, default=ANPR_CONFIG['port'])
+    parser.add_argument("--metrics-port", type=int, default=ANPR_CONFIG['metrics_port'])
+    args = parser.parse_args(argv)
+
+    daemon = AnprDaemon(config={'spool_dir': args.spool, 'host': args.host,
+                                'port': args.port, 'metrics_port': args.metrics_port})
+    try:
+        asyncio.run(daemon.run())
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        print(f"✗ ANPR daemon failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,450 @@
+"""
+api_server.py - Headless HTTP/JSON API over ViolationDatabase
+Vehicle Violation Management System
+
+Lets handheld devices, cameras and the public lookup kiosk read and write
+violations without the Tk app.
+
+    python api_server.py [--host 0.0.0.0] [--port 8080]
+
+Endpoints:
+    GET    /health
+    GET    /violations?q=<term>&history=1&limit=n   list or search, newest first
+    GET    /violations?notes=<words>&page=n   ranked full-text search of notes
+    GET    /violations/<id>                   single record
+    POST   /violations                        create
+    POST   /violations/bulk                   bulk ingest ({"records": [...]})
+    PATCH  /violations/<id>                   partial update ({"changes": {...}, "version": n})
+    DELETE /violations/<id>                   delete
+    GET    /plates/<plate>                    plate history (cached)
+
+The backend is any callable returning an object with the ViolationDatabase
+methods, so the service can run against a stand-in backend in tests.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs, unquote
+from config import API_CONFIG
+from database import StaleRecordError, DuplicateViolationError, ENUM_COLUMNS
+from async_database import AsyncViolationDatabase
+from fines import FineSchedule, FineScheduleCache
+from replication import open_database
+
+# Column names of the row tuples returned by list/search/history queries
+LIST_COLUMNS = ('id', 'plate_number', 'vehicle_type', 'violation_type',
+                'location', 'fine_amount', 'date_time', 'status')
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimiter:
+    """Token bucket per client address
+
+    A bucket idle long enough to refill completely is the same as no bucket,
+    so those are swept out now and then instead of growing with every
+    address ever seen.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._refill_seconds = burst / rate if rate > 0 else float('inf')
+        self._swept_at = time.monotonic()
+
+    def _sweep(self, now: float):
+        cutoff = now - self._refill_seconds
+        self._buckets = {client: bucket for client, bucket in self._buckets.items()
+                         if bucket[1] > cutoff}
+        self._swept_at = now
+
+    def allow(self, client: str) -> bool:
+        now = time.monotonic()
+        if now - self._swept_at > max(self._refill_seconds, 60):
+            self._sweep(now)
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return False
+        self._buckets[client] = (tokens - 1, now)
+        return True
+
+
+class ResponseCache:
+    """Small LRU cache with a time-to-live for hot plate lookups"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def to_json(value) -> bytes:
+    """Serialize database values (datetimes, decimals) to JSON"""
+    def default(obj):
+        if isinstance(obj, datetime):
+            return obj.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return str(obj)
+    return json.dumps(value, default=default).encode('utf-8')
+
+
+def rows_to_dicts(rows):
+    return [dict(zip(LIST_COLUMNS, row)) for row in rows]
+
+
+class ViolationService:
+    """Async request handlers running blocking database calls on a pool"""
+
+    def __init__(self, backend_factory: Optional[Callable] = None, config: Optional[Dict] = None):
+        self.config = dict(API_CONFIG, **(config or {}))
+        self.db = AsyncViolationDatabase(self.config['pool_size'],
+                                         factory=backend_factory or open_database)
+        self.limiter = RateLimiter(self.config['rate_limit_per_second'],
+                                   self.config['rate_limit_burst'])
+        self.cache = ResponseCache(self.config['cache_ttl_seconds'],
+                                   self.config['cache_max_entries'])
+        # Identical lookups already in flight share one database call
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        # Missing fines use the effective-dated schedule, like the app and importer
+        self.fines = FineScheduleCache(None)
+
+    async def call(self, method: str, *args, **kwargs):
+        """Await an AsyncViolationDatabase method"""
+        return await getattr(self.db, method)(*args, **kwargs)
+
+    async def call_shared(self, key: tuple, method: str, *args):
+        """Coalesce concurrent identical read requests into one call"""
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self.call(method, *args)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a lone caller does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def fine_schedule(self, payloads) -> Optional[FineSchedule]:
+        """The fine schedule if any payload lacks a fine, checked on a pooled connection"""
+        if all(payload.get('fine_amount') is not None for payload in payloads):
+            return None
+        return await self.db.run_with_connection(self.fines.schedule)
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """Route a request to its handler, returning (status, payload)"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        payload = json.loads(body) if body else {}
+
+        if parts == ['health']:
+            return 200, {'status': 'ok'}
+
+        if parts and parts[0] == 'plates' and len(parts) == 2 and method == 'GET':
+            return 200, await self.plate_history(parts[1])
+
+        if parts and parts[0] == 'violations':
+            if len(parts) == 1:
+                if method == 'GET':
+                    return 200, await self.list_violations(query)
+                if method == 'POST':
+                    return 201, await self.create_violation(payload)
+            elif parts[1] == 'bulk' and len(parts) == 2:
+                if method == 'POST':
+                    return 201, await self.bulk_ingest(payload)
+            elif len(parts) == 2 and parts[1].isdigit():
+                violation_id = int(parts[1])
+                if method == 'GET':
+                    return 200, await self.get_violation(violation_id)
+                if method == 'PATCH':
+                    return 200, await self.patch_violation(violation_id, payload)
+                if method == 'DELETE':
+                    return 200, await self.delete_violation(violation_id)
+            else:
+                raise HTTPError(404, 'Not found')
+            raise HTTPError(405, f'{method} not allowed here')
+
+        raise HTTPError(404, 'Not found')
+
+    async def list_violations(self, query: Dict):
+        history = query.get('history') in ('1', 'true')
+        term = query.get('q', '').strip()
+        notes = query.get('notes', '').strip()
+        if notes:
+            page = max(int(query.get('page', 1) or 1), 1)
+            page_size = min(max(int(query.get('page_size', 50) or 50), 1), 500)
+            rows, total = await self.call_shared(('notes', notes, page, page_size), 'search_notes',
+                                                 notes, page, page_size)
+            return {'count': len(rows), 'total': total, 'page': page,
+                    'violations': rows_to_dicts(rows)}
+        limit = int(query.get('limit', 0) or 0) or self.config['list_default_limit']
+        limit = min(max(limit, 1), self.config['list_max_limit'])
+        if term:
+            rows = await self.call_shared(('search', term, history, limit), 'search_violations',
+                                          term, history, limit)
+        else:
+            rows = await self.call_shared(('all', history, limit), 'get_all_violations', history, limit)
+        return {'count': len(rows), 'violations': rows_to_dicts(rows)}
+
+    async def plate_history(self, plate: str):
+        plate = plate.upper()
+        cached = self.cache.get(plate)
+        if cached is not None:
+            return cached
+        rows = await self.call_shared(('plate', plate), 'get_plate_history', plate)
+        result = {'plate_number': plate, 'count': len(rows), 'violations': rows_to_dicts(rows)}
+        self.cache.put(plate, result)
+        return result
+
+    async def get_violation(self, violation_id: int):
+        record = await self.call('get_violation', violation_id)
+        if not record:
+            raise HTTPError(404, f'Violation {violation_id} not found')
+        return record.to_dict()
+
+    async def create_violation(self, payload: Dict):
+        record = parse_record(payload, await self.fine_schedule([payload]))
+        try:
+            violation_id = await self.call(
+                'create_violation', record['plate_number'], record['vehicle_type'],
+                record['violation_type'], record['location'], record['fine_amount'],
+                record['officer_name'], record['status'], record['notes'],
+                record['date_time'], payload.get('on_duplicate')
+            )
+        except DuplicateViolationError as e:
+            raise HTTPError(409, str(e))
+        self.cache.invalidate(record['plate_number'])
+        return {'id': violation_id}
+
+    async def bulk_ingest(self, payload: Dict):
+        items = payload.get('records', [])
+        schedule = await self.fine_schedule(items)
+        records = [parse_record(item, schedule) for item in items]
+        counts = await self.call('insert_violations_bulk', records, payload.get('on_duplicate'))
+        for record in records:
+            self.cache.invalidate(record['plate_number'])
+        return counts
+
+    async def patch_violation(self, violation_id: int, payload: Dict):
+        changes = payload.get('changes', {})
+        check_lookup_values(changes)
+        if 'fine_amount' in changes:
+            changes['fine_amount'] = parse_amount(changes['fine_amount'])
+        try:
+            updated = await self.call('patch_violation', violation_id, changes, payload.get('version'))
+        except StaleRecordError as e:
+            raise HTTPError(409, str(e))
+        if not updated:
+            raise HTTPError(404, f'Violation {violation_id} not found')
+        # The plate may have changed, so drop every cached lookup
+        self.cache.clear()
+        return {'id': violation_id, 'updated': True}
+
+    async def delete_violation(self, violation_id: int):
+        deleted = await self.call('delete_violation', violation_id)
+        if not deleted:
+            raise HTTPError(404, f'Violation {violation_id} not found')
+        self.cache.clear()
+        return {'id': violation_id, 'deleted': True}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one keep-alive connection"""
+        client = writer.get_extra_info('peername')
+        client = client[0] if client else 'unknown'
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version == 'HTTP/1.1')
+
+                if length < 0:
+                    # Without a usable length the body cannot be skipped, so
+                    # the connection is closed after the answer
+                    status, payload = 400, {'error': 'Invalid Content-Length'}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': 'Request body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    if not self.limiter.allow(client):
+                        status, payload = 429, {'error': 'Rate limit exceeded'}
+                    else:
+                        try:
+                            status, payload = await self.dispatch(method.upper(), target, body)
+                        except HTTPError as e:
+                            status, payload = e.status, {'error': str(e)}
+                        except (ValueError, KeyError, TypeError) as e:
+                            status, payload = 400, {'error': f'Invalid request: {e}'}
+                        except (TimeoutError, asyncio.TimeoutError) as e:
+                            status, payload = 503, {'error': str(e) or 'Database timeout'}
+                        except Exception as e:
+                            print(f"✗ API error on {method} {target}: {e}")
+                            status, payload = 500, {'error': 'Internal server error'}
+
+                data = to_json(payload)
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f"✓ API listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.db.close()
+
+
+def parse_amount(value) -> float:
+    amount = float(value)
+    if amount <= 0:
+        raise ValueError("fine_amount must be positive")
+    return amount
+
+
+def check_lookup_values(fields: Dict):
+    """Reject vehicle/violation types and statuses the ENUM columns cannot hold"""
+    for column, values in ENUM_COLUMNS.items():
+        if column in fields and fields[column] not in values:
+            raise ValueError(f"'{column}' must be one of: {', '.join(values)}")
+
+
+def parse_record(payload: Dict, schedule: Optional[FineSchedule] = None) -> Dict:
+    """Validate a violation JSON object into insert arguments
+
+    A missing fine_amount becomes the scheduled fine for the violation date.
+    """
+    for field in ('plate_number', 'vehicle_type', 'violation_type', 'location'):
+        if not str(payload.get(field, '')).strip():
+            raise ValueError(f"'{field}' is required")
+    check_lookup_values(payload)
+
+    date_time = payload.get('date_time')
+    date_time = datetime.fromisoformat(date_time) if date_time else None
+    fine = payload.get('fine_amount')
+    if fine is None:
+        fine_amount = (schedule or FineSchedule()).fine_for(payload['violation_type'], date_time)
+    else:
+        fine_amount = parse_amount(fine)
+    return {
+        'plate_number': payload['plate_number'].strip().upper(),
+        'vehicle_type': payload['vehicle_type'],
+        'violation_type': payload['violation_type'],
+        'location': payload['location'].strip(),
+        'fine_amount': fine_amount,
+        'officer_name': payload.get('officer_name', 'Officer'),
+        'status': payload.get('status', 'Pending'),
+        'notes': payload.get('notes', ''),
+        'date_time': date_time
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the violations HTTP API")
+    parser.add_argument("--host", default=API_CONFIG['host'])
+    parser.add_argument("--port", type=int, default=API_CONFIG['port'])
+    args = parser.parse_args(argv)
+
+    try:
+        service = ViolationService()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n✓ API stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
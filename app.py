@@ -4,10 +4,12 @@ Modern GUI with XAMPP MySQL Database
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import traceback
 import os
 import sys
+import threading
+from datetime import datetime
 from login_window import LoginWindow
 
 def restart_application():
@@ -53,7 +55,8 @@ def main():
             print("\nStep 3: Loading configuration...")
             try:
                 from config import (APP_CONFIG, VEHICLE_TYPES, VIOLATION_TYPES, 
-                                   STATUS_TYPES, get_default_fine)
+                                   STATUS_TYPES, MESSAGES, CHANGE_FEED_CONFIG,
+                                   DIAGNOSTICS_CONFIG)
                 print("✓ Configuration loaded")
             except Exception as e:
                 print(f"✗ Config error: {e}")
@@ -63,9 +66,18 @@ def main():
             # Connect to database
             print("\nStep 4: Connecting to database...")
             try:
-                from database import ViolationDatabase
+                from database import StaleRecordError, DuplicateViolationError, ViolationDatabase
+                from replication import open_database
+                from models import ViolationTableModel
+                from gazetteer import load_autocomplete
+                from fines import FineScheduleCache
+                from audit import AuditLogger
+                from reports import ReportEngine
+                from plate_search import PlateIndex
+                from diagnostics import UIDiagnostics
+                from database import month_start
                 print("  - Importing database module...")
-                db = ViolationDatabase()
+                db = open_database()
                 print("✓ Database connected")
             except Exception as e:
                 print(f"\n✗ Database error: {e}")
@@ -94,6 +106,22 @@ def main():
                     self.db = db
                     self.user = user
                     self.selected_id = None
+                    self.selected_record = None
+                    self.model = ViolationTableModel()
+                    self.rendered = 0  # model rows already inserted into the Treeview
+                    self.locations = load_autocomplete(self.db)
+                    self.fines = FineScheduleCache(self.db)
+                    self.audit = AuditLogger(user['username'] if user else 'unknown')
+                    self.db.attach_audit_logger(self.audit)
+                    self.reports = ReportEngine()
+                    self.plate_index = PlateIndex()
+                    self.plate_index_lock = threading.Lock()
+                    self.plate_index_ready = threading.Event()
+                    self.plate_index_stop = threading.Event()
+                    threading.Thread(target=self.maintain_plate_index,
+                                     name='plate-index', daemon=True).start()
+                    self.high_water = None
+                    self.filtered = False
                     
                     # Main container with background color
                     if modern:
@@ -156,8 +184,16 @@ def main():
                     )
                     self.status_bar.pack(side="bottom", fill="x")
                     
-                    # Load data
+                    # Hidden diagnostics menu (Ctrl+Shift+D)
+                    self.diagnostics = UIDiagnostics(
+                        self.root, notify=lambda text: self.status_bar.config(text=text))
+                    self.diagnostics.bind_menu()
+                    if DIAGNOSTICS_CONFIG['enabled']:
+                        self.diagnostics.enable()
+                    
+                    # Load data, then keep it current with the change feed
                     self.load_data()
+                    self.root.after(CHANGE_FEED_CONFIG['poll_interval_ms'], self.poll_changes)
                     print("✓ Interface built successfully")
                 
                 def create_form_section(self, parent):
@@ -194,8 +230,9 @@ def main():
                     
                     tk.Label(form_frame, text="Location:", font=("Arial", 10, "bold")).grid(
                         row=1, column=2, padx=10, pady=8, sticky="w")
-                    self.inputs["location"] = ttk.Entry(form_frame, width=25)
+                    self.inputs["location"] = ttk.Combobox(form_frame, width=23)
                     self.inputs["location"].grid(row=1, column=3, padx=10, pady=8, sticky="ew")
+                    self.inputs["location"].bind("<KeyRelease>", self.on_location_typed)
                     
                     # Row 2
                     tk.Label(form_frame, text="Fine Amount (₱):", font=("Arial", 10, "bold")).grid(
@@ -264,6 +301,37 @@ def main():
                     search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
                     search_entry.pack(side="left")
                     
+                    self.search_notes_var = tk.BooleanVar(value=False)
+                    ttk.Checkbutton(
+                        search_frame, text="Search notes", variable=self.search_notes_var,
+                        command=self.on_search
+                    ).pack(side="left", padx=(10, 0))
+                    
+                    self.history_var = tk.BooleanVar(value=False)
+                    ttk.Checkbutton(
+                        search_frame, text="Include history", variable=self.history_var,
+                        command=self.on_search
+                    ).pack(side="left", padx=(10, 0))
+                    
+                    # Bulk actions on multi-row selection
+                    ttk.Button(
+                        search_frame, text="✔ Apply to Selected",
+                        command=self.bulk_set_status
+                    ).pack(side="right", padx=(5, 0))
+                    
+                    self.bulk_status = ttk.Combobox(
+                        search_frame, values=STATUS_TYPES, state="readonly", width=15)
+                    self.bulk_status.set("Paid")
+                    self.bulk_status.pack(side="right")
+                    
+                    tk.Label(search_frame, text="Set status:", 
+                            font=("Arial", 10, "bold"), bg="white").pack(side="right", padx=(0, 10))
+                    
+                    ttk.Button(
+                        search_frame, text="📊 Monthly Reports",
+                        command=self.generate_reports
+                    ).pack(side="right", padx=(0, 20))
+                    
                     # Table
                     table_container = tk.Frame(table_frame)
                     table_container.pack(fill="both", expand=True)
@@ -271,6 +339,7 @@ def main():
                     # Scrollbars
                     y_scroll = ttk.Scrollbar(table_container)
                     y_scroll.pack(side="right", fill="y")
+                    self.y_scroll = y_scroll
                     
                     x_scroll = ttk.Scrollbar(table_container, orient="horizontal")
                     x_scroll.pack(side="bottom", fill="x")
@@ -282,8 +351,9 @@ def main():
                         table_container,
                         columns=columns,
                         show="headings",
+                        selectmode="extended",
                         height=15,
-                        yscrollcommand=y_scroll.set,
+                        yscrollcommand=self.on_tree_scrolled,
                         xscrollcommand=x_scroll.set
                     )
                     
@@ -314,10 +384,16 @@ def main():
                     """Auto-fill fine amount when violation type is selected"""
                     violation_type = self.inputs["violation"].get()
                     if violation_type:
-                        default_fine = get_default_fine(violation_type)
+                        default_fine = self.fines.fine_for(violation_type)
                         self.inputs["fine"].delete(0, tk.END)
                         self.inputs["fine"].insert(0, str(default_fine))
                 
+                def on_location_typed(self, event=None):
+                    """Offer the most used matching locations as the user types"""
+                    if event is not None and event.keysym in ("Up", "Down", "Return", "Escape"):
+                        return
+                    self.inputs["location"]["values"] = self.locations.suggest(self.inputs["location"].get())
+                
                 def on_search(self):
                     """Search violations"""
                     search_term = self.search_var.get().strip()
@@ -326,17 +402,19 @@ def main():
                         return
                     
                     try:
-                        self.tree.delete(*self.tree.get_children())
-                        results = self.db.search_violations(search_term)
+                        if self.search_notes_var.get():
+                            results, total = self.db.search_notes(search_term, page_size=500)
+                            self.show_rows(results)
+                            self.filtered = True
+                            self.status_bar.config(
+                                text=f"Found {total} record(s) by notes, showing the best {len(results)}")
+                            return
                         
-                        for row in results:
-                            formatted_row = (
-                                row[0], row[1], row[2], row[3], row[4],
-                                f"₱{float(row[5]):,.2f}",
-                                row[6].strftime("%Y-%m-%d %H:%M") if hasattr(row[6], 'strftime') else str(row[6]),
-                                row[7]
-                            )
-                            self.tree.insert("", "end", values=formatted_row)
+                        results = self.db.search_violations(search_term, self.history_var.get())
+                        if not results and self.show_similar_plates(search_term):
+                            return
+                        self.show_rows(results)
+                        self.filtered = True
                         
                         self.status_bar.config(text=f"Found {len(results)} record(s)")
                     except Exception as e:
@@ -361,6 +439,7 @@ def main():
                         
                         # Store selected ID - FORCE IT TO BE SET
                         self.selected_id = int(values[0])
+                        self.selected_record = self.db.get_violation(self.selected_id)
                         print(f"Selected ID: {self.selected_id}")  # Debug print
                         
                         # Clear form first
@@ -390,25 +469,244 @@ def main():
                         import traceback
                         traceback.print_exc()
                 
+                def show_similar_plates(self, search_term):
+                    """Fall back to plates one misread character away; False if none"""
+                    compact = search_term.replace("-", "").replace(" ", "")
+                    if not (3 <= len(compact) <= 10 and compact.isalnum()):
+                        return False
+                    
+                    # The index is built off the Tk thread; until then searches
+                    # just report no match
+                    if not self.plate_index_ready.is_set():
+                        return False
+                    with self.plate_index_lock:
+                        matches = self.plate_index.search(search_term, limit=10)
+                    if not matches:
+                        return False
+                    
+                    plates = [plate for plate, _ in matches]
+                    results = self.db.get_violations_for_plates(plates)
+                    self.show_rows(results)
+                    self.filtered = True
+                    self.status_bar.config(
+                        text=f"No exact match - {len(results)} record(s) for similar plates: {', '.join(plates)}")
+                    return True
+                
+                def maintain_plate_index(self):
+                    """Build the similar-plate index, then keep it current (worker thread)
+                    
+                    Runs on its own autocommit connection, since the Tk thread owns
+                    self.db and each refresh must see rows committed since the last.
+                    """
+                    index_db = None
+                    while not self.plate_index_stop.is_set():
+                        try:
+                            if index_db is None:
+                                index_db = ViolationDatabase(getattr(self.db, 'config', None),
+                                                             read_only=True)
+                                self.plate_index.db = index_db
+                            with self.plate_index_lock:
+                                self.plate_index.refresh()
+                            self.plate_index_ready.set()
+                        except Exception as e:
+                            print(f"⚠ Plate index refresh failed: {e}")
+                            if index_db is not None:
+                                index_db.close()
+                                index_db = None
+                        self.plate_index_stop.wait(APP_CONFIG['plate_index_refresh'])
+                    if index_db is not None:
+                        index_db.close()
+                
                 def load_data(self):
                     """Load all violations from database"""
                     try:
-                        self.tree.delete(*self.tree.get_children())
-                        data = self.db.get_all_violations()
-                        
-                        for row in data:
-                            formatted_row = (
-                                row[0], row[1], row[2], row[3], row[4],
-                                f"₱{float(row[5]):,.2f}",
-                                row[6].strftime("%Y-%m-%d %H:%M") if hasattr(row[6], 'strftime') else str(row[6]),
-                                row[7]
-                            )
-                            self.tree.insert("", "end", values=formatted_row)
+                        # Take the mark first so changes made during the load are polled again
+                        _, _, self.high_water = self.db.get_changes_since()
+                        data = self.db.get_all_violations(self.history_var.get())
+                        self.show_rows(data)
+                        self.filtered = False
                         
                         self.status_bar.config(text=f"Loaded {len(data)} record(s)")
                     except Exception as e:
                         messagebox.showerror("Load Error", str(e))
                 
+                def show_rows(self, rows):
+                    """Load query rows into the table model and render the first page
+                    
+                    Only rows the user scrolls towards become Treeview items, so a
+                    large listing costs one page of widget work up front.
+                    """
+                    self.tree.delete(*self.tree.get_children())
+                    self.model.load(rows)
+                    self.rendered = 0
+                    self.render_more()
+                
+                def render_more(self):
+                    """Insert the next page of model rows at the bottom of the Treeview"""
+                    end = min(self.rendered + APP_CONFIG['rows_per_page'], len(self.model))
+                    for index in range(self.rendered, end):
+                        iid = str(self.model.ids[index])
+                        if not self.tree.exists(iid):  # polled rows are shown at the top
+                            self.tree.insert("", "end", iid=iid, values=self.model.display_row(index))
+                    self.rendered = end
+                
+                def on_tree_scrolled(self, first, last):
+                    """Scrollbar update; render another page near the end of the list"""
+                    self.y_scroll.set(first, last)
+                    if float(last) > 0.9 and self.rendered < len(self.model):
+                        self.render_more()
+                
+                def remove_rows(self, ids):
+                    """Drop rows from the model and the Treeview"""
+                    ids = [violation_id for violation_id in ids
+                           if self.model.position(violation_id) is not None]
+                    self.rendered -= sum(1 for violation_id in ids
+                                         if self.model.position(violation_id) < self.rendered)
+                    self.model.remove(ids)
+                    for violation_id in ids:
+                        if self.tree.exists(str(violation_id)):
+                            self.tree.delete(str(violation_id))
+                
+                def poll_changes(self):
+                    """Merge rows changed on other workstations since the last poll"""
+                    try:
+                        rows, deleted, self.high_water = self.db.get_changes_since(
+                            self.high_water, CHANGE_FEED_CONFIG['overlap_seconds']
+                        )
+                        
+                        self.remove_rows(deleted)
+                        
+                        for row in rows:
+                            # Search results only refresh the rows they already show
+                            if self.filtered and self.model.position(row[0]) is None:
+                                continue
+                            is_new = self.model.upsert(row)
+                            values = self.model.display_row(self.model.position(row[0]))
+                            if is_new:
+                                self.tree.insert("", 0, iid=str(row[0]), values=values)
+                            elif self.tree.exists(str(row[0])):
+                                self.tree.item(str(row[0]), values=values)
+                    except Exception as e:
+                        print(f"⚠ Change feed poll failed: {e}")
+                    
+                    try:
+                        self.root.after(CHANGE_FEED_CONFIG['poll_interval_ms'], self.poll_changes)
+                    except tk.TclError:
+                        pass  # window closed
+                
+                def generate_reports(self):
+                    """Render the officer, violation type and location reports for a month"""
+                    last_month = month_start(datetime.now(), -1)
+                    period = simpledialog.askstring(
+                        "Monthly Reports", "Month (YYYY-MM):",
+                        initialvalue=f"{last_month:%Y-%m}", parent=self.root
+                    )
+                    if not period:
+                        return
+                    
+                    try:
+                        futures = self.reports.submit_bundle(period.strip())
+                    except ValueError:
+                        messagebox.showwarning("Validation", "Enter the month as YYYY-MM!")
+                        return
+                    
+                    self.status_bar.config(text=f"Generating reports for {period}...")
+                    self.root.after(500, self.check_reports, period, futures)
+                
+                def check_reports(self, period, futures):
+                    """Wait for report workers without blocking the event loop"""
+                    if not all(future.done() for future in futures.values()):
+                        self.root.after(500, self.check_reports, period, futures)
+                        return
+                    
+                    errors = [future.exception() for future in futures.values() if future.exception()]
+                    if errors:
+                        self.status_bar.config(text=f"Reports for {period} failed")
+                        messagebox.showerror("Report Error", str(errors[0]))
+                        return
+                    
+                    paths = [future.result() for future in futures.values()]
+                    self.status_bar.config(text=f"Reports for {period} saved to {self.reports.output_dir}")
+                    messagebox.showinfo("Monthly Reports", "Reports saved:\n\n" + "\n".join(paths))
+                
+                def get_selected_ids(self):
+                    """Return the record IDs of all selected rows"""
+                    return [int(self.tree.item(item, "values")[0]) for item in self.tree.selection()]
+                
+                def refresh_rows(self, ids):
+                    """Re-read rows after a partial bulk change; drop the ones that are gone"""
+                    try:
+                        rows = self.db.get_violations_by_ids(ids)
+                    except Exception as e:
+                        print(f"⚠ Could not re-read changed rows: {e}")
+                        return
+                    
+                    for row in rows:
+                        if self.model.position(row[0]) is not None:
+                            self.model.upsert(row)
+                            if self.tree.exists(str(row[0])):
+                                self.tree.item(str(row[0]), values=self.model.display_row(self.model.position(row[0])))
+                    
+                    self.remove_rows(set(ids) - {row[0] for row in rows})
+                
+                def bulk_set_status(self):
+                    """Set the status of every selected row in one batch"""
+                    ids = self.get_selected_ids()
+                    if not ids:
+                        messagebox.showwarning("No Selection", MESSAGES['error']['not_selected'])
+                        return
+                    
+                    status = self.bulk_status.get()
+                    confirm = messagebox.askyesno(
+                        "Confirm Bulk Update",
+                        f"Set status of {len(ids)} record(s) to '{status}'?"
+                    )
+                    if not confirm:
+                        return
+                    
+                    try:
+                        updated = self.db.update_status_bulk(ids, status)
+                        if updated == len(ids):
+                            self.model.set_status(ids, status)
+                            
+                            # Update the affected rows in place instead of reloading
+                            for violation_id in ids:
+                                iid = str(violation_id)
+                                if self.tree.exists(iid):
+                                    self.tree.set(iid, "Status", status)
+                            self.status_bar.config(text=f"✓ {updated} record(s) set to {status}")
+                        else:
+                            # A chunk failed or rows vanished: show what the database holds
+                            self.refresh_rows(ids)
+                            self.status_bar.config(
+                                text=f"⚠ Only {updated} of {len(ids)} record(s) set to {status}")
+                    except Exception as e:
+                        messagebox.showerror("Error", f"Failed to update:\n{str(e)}")
+                
+                def bulk_delete(self, ids):
+                    """Delete every selected row in one batch"""
+                    confirm = messagebox.askyesno(
+                        "Confirm Delete",
+                        f"⚠️ DELETE {len(ids)} selected record(s)?\n\n"
+                        f"This action cannot be undone!"
+                    )
+                    if not confirm:
+                        return
+                    
+                    try:
+                        deleted = self.db.delete_violations_bulk(ids)
+                        if deleted == len(ids):
+                            self.remove_rows(ids)
+                            self.status_bar.config(text=f"✓ {deleted} record(s) deleted")
+                        else:
+                            self.refresh_rows(ids)
+                            self.status_bar.config(
+                                text=f"⚠ Only {deleted} of {len(ids)} record(s) deleted")
+                        
+                        self.clear_form()
+                    except Exception as e:
+                        messagebox.showerror("Error", f"Failed to delete:\n{str(e)}")
+                
                 def add_violation(self):
                     """Add new violation"""
                     try:
@@ -432,16 +730,20 @@ def main():
                             messagebox.showwarning("Validation", "Please enter a valid fine amount!")
                             return
                         
-                        officer_name = "Officer"  # You can add officer name field if needed
+                        officer_name = self.user['username'] if self.user else "Officer"
                         violation_id = self.db.create_violation(
                             plate, vehicle, violation, location, 
-                            fine_amount, officer_name, status
+                            fine_amount, officer_name, status,
+                            officer_id=self.user['id'] if self.user else None
                         )
                         
+                        self.locations.add(location)
                         messagebox.showinfo("Success", f"Violation added! ID: {violation_id}")
                         self.load_data()
                         self.clear_form()
                         
+                    except DuplicateViolationError as e:
+                        messagebox.showwarning("Duplicate", f"This ticket was already recorded.\n{str(e)}")
                     except Exception as e:
                         messagebox.showerror("Error", f"Failed to add violation:\n{str(e)}")
                 
@@ -499,12 +801,34 @@ def main():
                         if not confirm:
                             return
                         
-                        officer_name = "Officer"
-                        notes = ""
+                        record = self.selected_record
+                        if not record or record.id != int(self.selected_id):
+                            record = self.db.get_violation(int(self.selected_id))
+                        if not record:
+                            messagebox.showwarning("Warning", "Update failed! Record may not exist.")
+                            return
+                        
+                        # Only send the fields the user actually changed
+                        form_values = {
+                            'plate_number': plate.upper(),
+                            'vehicle_type': vehicle,
+                            'violation_type': violation,
+                            'location': location,
+                            'fine_amount': fine_amount,
+                            'status': status
+                        }
+                        changes = {
+                            column: value for column, value in form_values.items()
+                            if (float(getattr(record, column)) if column == 'fine_amount'
+                                else getattr(record, column)) != value
+                        }
+                        
+                        if not changes:
+                            self.status_bar.config(text=f"No changes to save for Record ID {self.selected_id}")
+                            return
                         
-                        updated = self.db.update_violation(
-                            int(self.selected_id), plate, vehicle, violation,
-                            location, fine_amount, officer_name, status, notes
+                        updated = self.db.patch_violation(
+                            int(self.selected_id), changes, expected_version=record.version
                         )
                         
                         if updated:
@@ -515,11 +839,20 @@ def main():
                         else:
                             messagebox.showwarning("Warning", "Update failed! Record may not exist.")
                             
+                    except StaleRecordError as e:
+                        messagebox.showwarning("Record Changed", str(e))
+                        self.load_data()
+                        self.clear_form()
                     except Exception as e:
                         messagebox.showerror("Error", f"Failed to update:\n{str(e)}")
                 
                 def delete_violation(self):
                     """Delete selected violation"""
+                    selected_ids = self.get_selected_ids()
+                    if len(selected_ids) > 1:
+                        self.bulk_delete(selected_ids)
+                        return
+                    
                     # Check if a record is selected from the table
                     if not hasattr(self, 'selected_id') or self.selected_id is None:
                         # Check if there's a selected row in the table
@@ -578,6 +911,7 @@ def main():
                     
                     # Clear selected ID
                     self.selected_id = None
+                    self.selected_record = None
                     self.status_bar.config(text="Form cleared | Ready")
                 
                 def logout(self):
@@ -585,6 +919,10 @@ def main():
                     confirm = messagebox.askyesno("Logout", "Are you sure you want to logout?")
                     if confirm:
                         self.root.destroy()
+                        self.plate_index_stop.set()
+                        # execl skips atexit handlers, so flush the audit trail now
+                        self.audit.close()
+                        self.reports.close()
                         restart_application()  # Restart the application to show login window
         
             # Create and run application
@@ -0,0 +1,45 @@
+"""
+archive.py - Partition maintenance and archiving job
+Vehicle Violation Management System
+
+Run from cron, e.g. nightly:
+    python archive.py                      # archive into violations_archive
+    python archive.py --file 2024.csv.gz   # archive into a compressed file
+    python archive.py --partition          # one-off: partition violations by month
+"""
+import argparse
+import sys
+from config import ARCHIVE_CONFIG, CHANGE_FEED_CONFIG
+from database import ViolationDatabase
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive closed violations and maintain partitions")
+    parser.add_argument("--days", type=int, default=ARCHIVE_CONFIG['archive_after_days'],
+                        help="archive closed records older than this many days")
+    parser.add_argument("--file", help="write archived rows to this gzip CSV instead of violations_archive")
+    parser.add_argument("--partition", action="store_true",
+                        help="convert the violations table to monthly partitions first")
+    args = parser.parse_args(argv)
+
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        if args.partition and not db.partition_violations_by_month():
+            return 1
+        db.ensure_future_partitions()
+        db.archive_closed_violations(args.days, args.file)
+        db.purge_tombstones(CHANGE_FEED_CONFIG['tombstone_days'])
+        return 0
+    except Exception:
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+async_database.py - Asyncio facade over ViolationDatabase
+Vehicle Violation Management System
+
+Every method is an awaitable counterpart of the blocking ViolationDatabase
+method of the same name. Calls run on a bounded thread pool, each on its own
+pooled connection, so concurrent callers overlap their I/O latency instead of
+serializing on one cursor. Connections are reserved on the event loop before
+a thread is used, so worker threads never wait for one.
+
+    adb = AsyncViolationDatabase(pool_size=8)
+    rows = await adb.search_violations("ABC")
+    async for batch in adb.stream_violations():
+        ...
+    await adb.close()
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from database import ViolationDatabase
+from db_pool import ConnectionPool
+from models import Violation
+
+
+class AsyncViolationDatabase:
+    def __init__(self, pool_size: int = 4, max_pending: int = 64,
+                 timeout: Optional[float] = 30.0, factory: Callable = ViolationDatabase):
+        """Open a connection pool and a matching worker pool
+
+        max_pending bounds how many calls may be queued or running at once;
+        further callers wait (backpressure). timeout is the default number of
+        seconds a call may take, including the wait for a free connection.
+        """
+        self.pool = ConnectionPool(pool_size, factory)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='async-db')
+        self.pool_size = pool_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = None
+        self._connections = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the loop that actually runs the calls
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    def _connection_slots(self) -> asyncio.Semaphore:
+        """One slot per pooled connection, taken on the event loop
+
+        Worker threads only start once a connection is reserved for them, so
+        they never block in pool.acquire. Otherwise calls waiting for a
+        connection could occupy every thread while open streams, which hold
+        connections across awaits, wait for a thread to fetch their next
+        batch and give the connection back.
+        """
+        if self._connections is None:
+            self._connections = asyncio.Semaphore(self.pool_size)
+        return self._connections
+
+    def _submit(self, slots: asyncio.Semaphore, function, *args) -> asyncio.Future:
+        """Run function on the executor; the connection slot is freed when the
+        thread finishes, not when an awaiting caller gives up"""
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass  # loop already closed
+
+        try:
+            work = self.executor.submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        work.add_done_callback(release)
+        return asyncio.wrap_future(work)
+
+    async def _run(self, method: str, *args, timeout: Optional[float] = None, **kwargs):
+        """Run a blocking ViolationDatabase method on a pooled connection
+
+        Cancelling the awaiting task (or hitting the timeout) releases the
+        caller immediately; the statement already sent finishes in its worker
+        thread and the connection then goes back to the pool.
+        """
+        return await self.run_with_connection(
+            lambda db: getattr(db, method)(*args, **kwargs), timeout=timeout)
+
+    async def run_with_connection(self, function: Callable, *args, timeout: Optional[float] = None):
+        """Run function(db, *args) on a worker thread with a pooled connection"""
+        def invoke():
+            # A connection is reserved for this call, so this does not wait
+            with self.pool.connection(self.timeout) as db:
+                return function(db, *args)
+
+        async def reserve_and_call():
+            slots = self._connection_slots()
+            await slots.acquire()
+            return await self._submit(slots, invoke)
+
+        async with self._semaphore():
+            return await asyncio.wait_for(reserve_and_call(),
+                                          timeout if timeout is not None else self.timeout)
+
+    # CRUD
+    async def create_violation(self, *args, **kwargs) -> int:
+        return await self._run('create_violation', *args, **kwargs)
+
+    async def get_violation(self, violation_id: int) -> Optional[Violation]:
+        return await self._run('get_violation', violation_id)
+
+    async def update_violation(self, *args, **kwargs) -> bool:
+        return await self._run('update_violation', *args, **kwargs)
+
+    async def patch_violation(self, violation_id: int, changes: Dict,
+                              expected_version: Optional[int] = None) -> bool:
+        return await self._run('patch_violation', violation_id, changes, expected_version)
+
+    async def delete_violation(self, violation_id: int) -> bool:
+        return await self._run('delete_violation', violation_id)
+
+    # Bulk operations
+    async def insert_violations_bulk(self, records: List[Dict],
+                                     on_duplicate: Optional[str] = None) -> Dict[str, int]:
+        return await self._run('insert_violations_bulk', records, on_duplicate)
+
+    async def update_status_bulk(self, violation_ids: List[int], status: str) -> int:
+        return await self._run('update_status_bulk', violation_ids, status)
+
+    async def delete_violations_bulk(self, violation_ids: List[int]) -> int:
+        return await self._run('delete_violations_bulk', violation_ids)
+
+    # Search and aggregates
+    async def get_all_violations(self, include_history: bool = False,
+                                 limit: Optional[int] = None) -> List[Tuple]:
+        return await self._run('get_all_violations', include_history, limit)
+
+    async def search_violations(self, search_term: str, include_history: bool = False,
+                                limit: Optional[int] = None) -> List[Tuple]:
+        return await self._run('search_violations', search_term, include_history, limit)
+
+    async def search_notes(self, query: str, page: int = 1, page_size: int = 50) -> Tuple[List[Tuple], int]:
+        return await self._run('search_notes', query, page, page_size)
+
+    async def get_plate_history(self, plate_number: str, include_history: bool = True) -> List[Tuple]:
+        return await self._run('get_plate_history', plate_number, include_history)
+
+    async def get_violation_summary(self, group_by: str = 'status', start=None, end=None) -> List[Tuple]:
+        return await self._run('get_violation_summary', group_by, start, end)
+
+    async def stream_violations(self, batch_size: int = 1000, include_history: bool = False):
+        """Async iterator over batches of full violation rows
+
+        Holds one pooled connection until the iteration finishes or the
+        consumer stops early, so slow consumers never buffer the table.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore():
+            slots = self._connection_slots()
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+            try:
+                db = await loop.run_in_executor(self.executor, self.pool.acquire, self.timeout)
+            except BaseException:
+                slots.release()
+                raise
+            batches = db.iter_violations(batch_size, include_history)
+            error = None
+            try:
+                while True:
+                    batch = await loop.run_in_executor(self.executor, next, batches, None)
+                    if batch is None:
+                        break
+                    yield batch
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                # Closing drains the server-side cursor, which is blocking; the
+                # connection slot is freed once the handle is back in the pool
+                await asyncio.shield(self._submit(
+                    slots, functools.partial(_close_stream, self.pool, db, batches, error)
+                ))
+
+    async def close(self):
+        """Wait for running calls, then close every pooled connection"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self.executor.shutdown, wait=True))
+        self.pool.close_all()
+
+
+def _close_stream(pool: ConnectionPool, db, batches, error):
+    try:
+        batches.close()
+    finally:
+        pool.release(db, error if isinstance(error, Exception) else None)
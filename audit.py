@@ -0,0 +1,139 @@
+"""
+audit.py - Append-only audit trail with a background batch writer
+Vehicle Violation Management System
+
+ViolationDatabase hands each change to AuditLogger.record(), which only
+queues it. A daemon thread with its own connection drains the queue into
+the audit_log table in batches, so saves never wait on the audit insert.
+Pending entries are flushed when the logger is closed or the process exits.
+While the database is unreachable the writer keeps retrying the current
+batch with a fresh connection, and new entries wait in the queue.
+
+    audit = AuditLogger(user="jdoe")
+    db.attach_audit_logger(audit)
+"""
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import pymysql
+from config import AUDIT_CONFIG
+
+INSERT_QUERY = """
+    INSERT INTO audit_log
+    (logged_at, username, action, violation_id, before_image, after_image)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def to_image(record: Optional[Dict]) -> Optional[str]:
+    """Serialize a row image; dates and decimals become strings"""
+    if record is None:
+        return None
+    return json.dumps(record, default=str, sort_keys=True)
+
+
+class AuditLogger:
+    def __init__(self, user: str = 'system', config: Optional[Dict] = None, db=None):
+        """Start the writer thread; db defaults to a new connection of its own"""
+        self.user = user
+        self.config = config
+        self.dropped = 0
+        self._db = db
+        self._queue = queue.Queue(maxsize=AUDIT_CONFIG['queue_size'])
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, action: str, violation_id: int, before: Optional[Dict], after: Optional[Dict]):
+        """Queue one entry; blocks only while the queue is full"""
+        if self._closed:
+            return
+        entry = (datetime.now(), self.user, action, violation_id, to_image(before), to_image(after))
+        try:
+            self._queue.put(entry, timeout=AUDIT_CONFIG['put_timeout'])
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠ Audit queue full, entry for violation {violation_id} dropped")
+
+    def _connect(self):
+        # Imported here because database imports nothing from this module
+        from database import ViolationDatabase
+        return ViolationDatabase(self.config, check_schema=False)
+
+    def _writer(self):
+        """Drain the queue in batches until the stop sentinel arrives"""
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=AUDIT_CONFIG['flush_interval'])]
+            except queue.Empty:
+                continue
+            while len(batch) < AUDIT_CONFIG['batch_size']:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [entry for entry in batch if entry is not None]
+            stopping = len(entries) < len(batch)
+            if entries:
+                self._write(entries)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _disconnect(self):
+        """Drop the writer's connection so the next attempt opens a fresh one"""
+        if self._db is not None:
+            try:
+                self._db.close()
+            except Exception:
+                pass
+            self._db = None
+
+    def _write(self, batch):
+        """Insert one batch, retrying while the database is unreachable
+
+        The first failure reconnects at once; the server may have dropped an
+        idle connection. Lost connections are then retried with backoff until
+        the logger closes. Any other repeated error drops the batch.
+        """
+        delay = AUDIT_CONFIG['retry_delay']
+        attempt = 0
+        while True:
+            try:
+                if self._db is None:
+                    self._db = self._connect()
+                self._db.cursor.executemany(INSERT_QUERY, batch)
+                self._db.connection.commit()
+                return
+            except Exception as e:
+                self._disconnect()
+                attempt += 1
+                if attempt == 1:
+                    continue
+                lost = isinstance(e, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
+                if self._closed or not lost:
+                    self.dropped += len(batch)
+                    print(f"✗ Error writing {len(batch)} audit entries: {e}")
+                    return
+                print(f"⚠ Audit database unavailable, retrying in {delay:.0f}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, AUDIT_CONFIG['max_retry_delay'])
+
+    def flush(self):
+        """Block until every queued entry has been written"""
+        self._queue.join()
+
+    def close(self):
+        """Flush pending entries and stop the writer"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._db is not None:
+            self._db.close()
@@ -20,6 +20,11 @@ class AuthManager:
             return user
         return None
         
+    def change_password(self, username, new_password):
+        """Store a new hashed password; False if the user does not exist"""
+        hashed = hashlib.sha256(new_password.encode('utf-8')).hexdigest()
+        return self.db.update_user_password(username, hashed)
+        
     def user_exists(self, username):
         """Check if username exists"""
         return bool(self.db.get_user_by_username(username))
@@ -0,0 +1,398 @@
+"""
+backup.py - Parallel, resumable logical backup and restore
+Vehicle Violation Management System
+
+A dump splits each table into primary-key ranges, which several readers
+write in parallel as gzip-compressed JSON-lines files. The readers open
+their snapshots together under a brief global read lock, so every chunk
+comes from one consistent point in time and nothing stays locked while the
+data is copied. manifest.json, written last, lists the columns, row counts
+and SHA-256 checksum of every chunk.
+
+A restore checks each chunk against its checksum and loads it with
+multi-row INSERTs from several connections at once, one transaction per
+chunk. Completed chunks are recorded in restore_state.json, so an
+interrupted restore picks up where it stopped.
+
+    python backup.py dump [backups/nightly]
+    python backup.py verify backups/nightly
+    python backup.py restore backups/nightly [--database other_db] [--replace]
+
+Backups include the users table and therefore password hashes; store them
+accordingly.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import BACKUP_CONFIG, DATABASE_CONFIG
+
+MANIFEST = 'manifest.json'
+RESTORE_STATE = 'restore_state.json'
+FORMAT_VERSION = 1
+
+# Restoring over rows in these tables needs --replace
+PROTECTED_TABLES = ('users', 'violations', 'violations_archive')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json(path: str, data: Dict):
+    """Write a small JSON file atomically"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(temp_path, path)
+
+
+def load_manifest(directory: str) -> Dict:
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        raise Exception(f"{directory} has no {MANIFEST}; the dump is missing or did not finish")
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise Exception(f"Unsupported backup format {manifest.get('format')}")
+    return manifest
+
+
+# --- Dump ---------------------------------------------------------------------
+
+def open_snapshots(config: Dict, count: int) -> List:
+    """Open `count` read-only handles sharing one consistent snapshot
+
+    The snapshots are started while a global read lock is held, which blocks
+    writers for a few milliseconds only. Without the RELOAD privilege the
+    lock is skipped and each reader's snapshot may differ slightly.
+    """
+    from database import ViolationDatabase
+    coordinator = ViolationDatabase(config, read_only=True)
+    handles = [ViolationDatabase(config, read_only=True) for _ in range(count)]
+    locked = False
+    try:
+        try:
+            coordinator.cursor.execute("FLUSH TABLES WITH READ LOCK")
+            locked = True
+        except Exception as e:
+            print(f"⚠ Could not take the global read lock ({e}); chunks may not share one snapshot")
+        for db in handles:
+            db.cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            db.cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    finally:
+        if locked:
+            coordinator.cursor.execute("UNLOCK TABLES")
+        coordinator.close()
+    return handles
+
+
+def plan_chunks(db, table: str, chunk_rows: int) -> Dict:
+    """Columns and primary-key ranges of one table"""
+    db.cursor.execute(f"SELECT * FROM `{table}` LIMIT 0")
+    columns = [column[0] for column in db.cursor.description]
+    db.cursor.fetchall()
+    if 'id' not in columns:
+        # Small lookup tables keyed by text are dumped in one piece
+        return {'columns': columns, 'key': None, 'ranges': [(None, None)]}
+    db.cursor.execute(f"SELECT MIN(id), MAX(id) FROM `{table}`")
+    low, high = db.cursor.fetchone()
+    if low is None:
+        return {'columns': columns, 'key': 'id', 'ranges': []}
+    ranges = [(first, min(first + chunk_rows - 1, high)) for first in range(low, high + 1, chunk_rows)]
+    return {'columns': columns, 'key': 'id', 'ranges': ranges}
+
+
+def dump_chunk(db, directory: str, table: str, columns: List[str], sequence: int,
+               first: Optional[int], last: Optional[int]) -> Optional[Dict]:
+    """Write one primary-key range to a compressed chunk file; None if it is empty"""
+    column_list = ", ".join(f"`{column}`" for column in columns)
+    if first is None:
+        db.cursor.execute(f"SELECT {column_list} FROM `{table}`")
+    else:
+        db.cursor.execute(f"SELECT {column_list} FROM `{table}` WHERE id BETWEEN %s AND %s ORDER BY id",
+                          (first, last))
+    rows = db.cursor.fetchall()
+    if not rows:
+        return None
+
+    name = f"{table}.{sequence:05d}.jsonl.gz"
+    path = os.path.join(directory, name)
+    with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8', compresslevel=6) as f:
+        for row in rows:
+            # Dates and decimals become strings, which MySQL converts back on insert
+            f.write(json.dumps(row, default=str, ensure_ascii=False))
+            f.write("\n")
+    os.replace(f"{path}.tmp", path)
+    return {'file': name, 'first': first, 'last': last, 'rows': len(rows), 'sha256': file_sha256(path)}
+
+
+def dump_database(directory: str, tables: Optional[List[str]] = None, workers: Optional[int] = None,
+                  chunk_rows: Optional[int] = None, config: Optional[Dict] = None) -> Dict:
+    """Dump tables to directory in parallel; returns the manifest"""
+    config = config or DATABASE_CONFIG
+    tables = tables or BACKUP_CONFIG['tables']
+    workers = workers or BACKUP_CONFIG['workers']
+    chunk_rows = chunk_rows or BACKUP_CONFIG['chunk_rows']
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        raise Exception(f"{directory} already holds a backup")
+    os.makedirs(directory, exist_ok=True)
+
+    started = time.monotonic()
+    handles = open_snapshots(config, workers)
+    idle = queue.Queue()
+    for db in handles:
+        idle.put(db)
+    manifest = {'format': FORMAT_VERSION, 'created_at': datetime.now(),
+                'database': config['database'], 'tables': {}}
+    try:
+        plans = {table: plan_chunks(handles[0], table, chunk_rows) for table in tables}
+
+        def run(table, sequence, first, last):
+            db = idle.get()
+            try:
+                return dump_chunk(db, directory, table, plans[table]['columns'], sequence, first, last)
+            finally:
+                idle.put(db)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {table: [pool.submit(run, table, sequence, first, last)
+                               for sequence, (first, last) in enumerate(plans[table]['ranges'])]
+                       for table in tables}
+            for table in tables:
+                chunks = [chunk for chunk in (future.result() for future in futures[table]) if chunk]
+                manifest['tables'][table] = {
+                    'columns': plans[table]['columns'], 'key': plans[table]['key'],
+                    'rows': sum(chunk['rows'] for chunk in chunks), 'chunks': chunks,
+                }
+                print(f"✓ {table}: {manifest['tables'][table]['rows']:,} row(s) in {len(chunks)} chunk(s)")
+    finally:
+        for db in handles:
+            try:
+                db.connection.rollback()
+                db.close()
+            except Exception:
+                pass
+
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    total = sum(entry['rows'] for entry in manifest['tables'].values())
+    print(f"✓ Backup of {total:,} row(s) written to {directory} in {time.monotonic() - started:.1f}s")
+    return manifest
+
+
+def verify_backup(directory: str) -> bool:
+    """Check every chunk's checksum and row count against the manifest"""
+    manifest = load_manifest(directory)
+    ok = True
+    for table, entry in manifest['tables'].items():
+        for chunk in entry['chunks']:
+            path = os.path.join(directory, chunk['file'])
+            if not os.path.exists(path):
+                print(f"✗ {chunk['file']} is missing")
+                ok = False
+            elif file_sha256(path) != chunk['sha256']:
+                print(f"✗ {chunk['file']} does not match its checksum")
+                ok = False
+            else:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    rows = sum(1 for _ in f)
+                if rows != chunk['rows']:
+                    print(f"✗ {chunk['file']} has {rows} row(s), manifest says {chunk['rows']}")
+                    ok = False
+    if ok:
+        print(f"✓ Backup in {directory} is intact")
+    return ok
+
+
+# --- Restore ------------------------------------------------------------------
+
+class RestoreJob:
+    def __init__(self, directory: str, config: Optional[Dict] = None, workers: Optional[int] = None):
+        self.directory = directory
+        self.config = config or DATABASE_CONFIG
+        self.workers = workers or BACKUP_CONFIG['workers']
+        self.manifest = load_manifest(directory)
+        self.state_path = os.path.join(directory, RESTORE_STATE)
+        self.completed = set()
+        self._lock = threading.Lock()
+
+    def load_state(self) -> bool:
+        """Pick up chunks finished by an earlier run into the same database"""
+        if not os.path.exists(self.state_path):
+            return False
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('database') != self.config['database']:
+            print(f"⚠ Saved restore state is for database '{state.get('database')}', starting over")
+            return False
+        self.completed = set(state.get('completed', []))
+        return True
+
+    def save_state(self):
+        write_json(self.state_path, {'database': self.config['database'],
+                                     'completed': sorted(self.completed)})
+
+    def prepare(self, db, replace: bool):
+        """Empty the tables in the backup, refusing to overwrite records unless replace"""
+        tables = list(self.manifest['tables'])
+        if not replace:
+            for table in tables:
+                if table in PROTECTED_TABLES:
+                    db.cursor.execute(f"SELECT 1 FROM `{table}` LIMIT 1")
+                    if db.cursor.fetchone():
+                        raise Exception(f"Table '{table}' already has rows; use --replace to overwrite")
+        db.cursor.execute("SET SESSION foreign_key_checks = 0")
+        for table in tables:
+            # TRUNCATE bypasses row triggers and resets AUTO_INCREMENT
+            db.cursor.execute(f"TRUNCATE TABLE `{table}`")
+        db.cursor.execute("SET SESSION foreign_key_checks = 1")
+        db.connection.commit()
+
+    def load_chunk(self, db, table: str, chunk: Dict) -> int:
+        """Insert one chunk in a single transaction; re-running it is harmless"""
+        path = os.path.join(self.directory, chunk['file'])
+        if file_sha256(path) != chunk['sha256']:
+            raise Exception(f"{chunk['file']} does not match its checksum")
+        entry = self.manifest['tables'][table]
+        columns = entry['columns']
+        query = (f"INSERT INTO `{table}` ({', '.join(f'`{column}`' for column in columns)}) "
+                 f"VALUES ({', '.join(['%s'] * len(columns))})")
+        batch_size = BACKUP_CONFIG['insert_batch']
+        try:
+            db.cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+            # A chunk committed just before an interruption may be loaded again
+            if entry['key'] is None:
+                db.cursor.execute(f"DELETE FROM `{table}`")
+            else:
+                db.cursor.execute(f"DELETE FROM `{table}` WHERE id BETWEEN %s AND %s",
+                                  (chunk['first'], chunk['last']))
+            batch = []
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    batch.append(json.loads(line))
+                    if len(batch) == batch_size:
+                        db.cursor.executemany(query, batch)
+                        batch = []
+            if batch:
+                db.cursor.executemany(query, batch)
+            db.connection.commit()
+        except Exception:
+            db.connection.rollback()
+            raise
+        with self._lock:
+            self.completed.add(chunk['file'])
+            self.save_state()
+        return chunk['rows']
+
+    def rebuild_derived(self, db):
+        """Recreate tables derived from restored ones"""
+        if 'violations' in self.manifest['tables']:
+            db.cursor.execute("TRUNCATE TABLE violation_notes")
+            db.cursor.execute("""
+                INSERT INTO violation_notes (violation_id, notes)
+                SELECT id, notes FROM violations WHERE notes IS NOT NULL AND notes <> ''
+            """)
+            db.connection.commit()
+
+    def run(self, replace: bool = False, restart: bool = False) -> int:
+        """Restore every chunk not yet loaded; returns rows loaded by this run"""
+        from database import ViolationDatabase
+        from db_pool import ConnectionPool
+
+        # Creates any missing tables in the target before loading
+        db = ViolationDatabase(self.config, check_schema=True)
+        try:
+            if restart or not self.load_state():
+                self.completed = set()
+                self.prepare(db, replace)
+                self.save_state()
+            elif self.completed:
+                print(f"✓ Resuming restore: {len(self.completed)} chunk(s) already loaded")
+
+            pending = [(table, chunk) for table, entry in self.manifest['tables'].items()
+                       for chunk in entry['chunks'] if chunk['file'] not in self.completed]
+            total_chunks = sum(len(entry['chunks']) for entry in self.manifest['tables'].values())
+            started = time.monotonic()
+            loaded = 0
+
+            pool = ConnectionPool(self.workers, lambda: ViolationDatabase(self.config, check_schema=False))
+            try:
+                def run_chunk(table, chunk):
+                    with pool.connection() as loader:
+                        return self.load_chunk(loader, table, chunk)
+
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    futures = [executor.submit(run_chunk, table, chunk) for table, chunk in pending]
+                    try:
+                        for future in futures:
+                            loaded += future.result()
+                            elapsed = max(time.monotonic() - started, 1e-6)
+                            print(f"  {len(self.completed)}/{total_chunks} chunks  {loaded:,} rows  "
+                                  f"({loaded / elapsed:,.0f} rows/s)")
+                    except Exception:
+                        for future in futures:
+                            future.cancel()
+                        raise
+            finally:
+                pool.close_all()
+
+            self.rebuild_derived(db)
+            os.remove(self.state_path)
+            print(f"✓ Restored {loaded:,} row(s) into {self.config['database']} "
+                  f"in {time.monotonic() - started:.1f}s")
+            return loaded
+        finally:
+            db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Logical backup and restore of violations and users")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump = commands.add_parser("dump", help="write a backup")
+    dump.add_argument("directory", nargs="?", help="default: a timestamped folder under BACKUP_CONFIG['output_dir']")
+    dump.add_argument("--tables", nargs="+", help="tables to dump (default from BACKUP_CONFIG)")
+    dump.add_argument("--workers", type=int)
+    dump.add_argument("--chunk-rows", type=int)
+
+    verify = commands.add_parser("verify", help="check a backup's checksums")
+    verify.add_argument("directory")
+
+    restore = commands.add_parser("restore", help="load a backup, resuming an interrupted restore")
+    restore.add_argument("directory")
+    restore.add_argument("--database", help="target database (default from DATABASE_CONFIG)")
+    restore.add_argument("--workers", type=int)
+    restore.add_argument("--replace", action="store_true", help="overwrite tables that already hold records")
+    restore.add_argument("--restart", action="store_true", help="ignore saved progress and start over")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "dump":
+            directory = args.directory or os.path.join(
+                BACKUP_CONFIG['output_dir'], f"backup_{datetime.now():%Y%m%d_%H%M%S}")
+            dump_database(directory, args.tables, args.workers, args.chunk_rows)
+            return 0
+        if args.command == "verify":
+            return 0 if verify_backup(args.directory) else 1
+        config = dict(DATABASE_CONFIG, database=args.database) if args.database else DATABASE_CONFIG
+        RestoreJob(args.directory, config, args.workers).run(args.replace, args.restart)
+        return 0
+    except Exception as e:
+        print(f"✗ {args.command.capitalize()} failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
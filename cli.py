@@ -0,0 +1,359 @@
+"""
+cli.py - Headless command-line interface
+Vehicle Violation Management System
+
+Every operation of the desktop app, for scripts and cron jobs. Tk is never
+imported, each subcommand imports only the modules it needs, and results
+are streamed to stdout (connection messages go to stderr).
+
+    python cli.py init                # create/upgrade the schema once
+    python cli.py create --plate ABC123 --vehicle Car --violation Speeding --location "Main St"
+    python cli.py search ABC --format json
+    python cli.py update 42 --status Paid
+    python cli.py delete 42 43 44
+    python cli.py import camera_export.csv
+    python cli.py export --history > all.csv
+    python cli.py stats --group-by officer_name --start 2024-01-01
+    python cli.py user add jdoe --email jdoe@example.com
+"""
+import argparse
+import contextlib
+import csv
+import getpass
+import json
+import os
+import sys
+from datetime import datetime
+
+LIST_COLUMNS = ('id', 'plate_number', 'vehicle_type', 'violation_type',
+                'location', 'fine_amount', 'date_time', 'status')
+
+
+class RowWriter:
+    """Writes result rows to stdout as tsv, csv or JSON lines"""
+
+    def __init__(self, stream, fmt: str, columns):
+        self.stream = stream
+        self.format = fmt
+        self.columns = list(columns)
+        self._csv = None
+        if fmt in ('csv', 'tsv'):
+            self._csv = csv.writer(stream, delimiter='\t' if fmt == 'tsv' else ',', lineterminator='\n')
+            self._csv.writerow(self.columns)
+
+    def write(self, row):
+        if self._csv is not None:
+            self._csv.writerow(['' if value is None else value for value in row])
+        else:
+            self.stream.write(json.dumps(dict(zip(self.columns, row)), default=str) + "\n")
+
+    def write_all(self, rows):
+        for row in rows:
+            self.write(row)
+
+
+def parse_date(value: str) -> datetime:
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"invalid date '{value}' (use YYYY-MM-DD [HH:MM])")
+
+
+def open_db(args, writes: bool = False):
+    from database import ViolationDatabase
+    db = ViolationDatabase(check_schema=args.check_schema)
+    if writes:
+        from audit import AuditLogger
+        db.attach_audit_logger(AuditLogger(args.user))
+    return db
+
+
+# --- Violations -------------------------------------------------------------
+
+def cmd_init(args, out):
+    from database import ViolationDatabase
+    ViolationDatabase(check_schema=True).close()
+    print("✓ Schema is up to date")
+    return 0
+
+
+def cmd_create(args, out):
+    db = open_db(args, writes=True)
+    fine = args.fine
+    if fine is None:
+        from fines import FineScheduleCache
+        fine = FineScheduleCache(db).fine_for(args.violation, args.date_time)
+    violation_id = db.create_violation(
+        args.plate, args.vehicle, args.violation, args.location, fine,
+        args.officer, args.status, args.notes, date_time=args.date_time,
+        on_duplicate=args.on_duplicate
+    )
+    out.write(f"{violation_id}\n")
+    return 0
+
+
+def cmd_search(args, out):
+    db = open_db(args)
+    if args.notes:
+        rows, _ = db.find_notes(args.term, page=args.page, page_size=args.page_size)
+    else:
+        rows = db.find_violations(args.term, args.history)
+        if not rows and args.fuzzy:
+            from plate_search import PlateIndex
+            index = PlateIndex(db)
+            index.refresh()
+            rows = db.find_violations_for_plates([plate for plate, _ in index.search(args.term)])
+    RowWriter(out, args.format, LIST_COLUMNS).write_all(rows)
+    return 0
+
+
+def cmd_show(args, out):
+    db = open_db(args)
+    record = db.get_violation(args.id)
+    if record is None:
+        print(f"✗ No violation found with ID: {args.id}")
+        return 1
+    data = record.to_dict()
+    RowWriter(out, args.format, data.keys()).write(list(data.values()))
+    return 0
+
+
+def cmd_update(args, out):
+    from database import StaleRecordError
+    changes = {column: value for column, value in (
+        ('plate_number', args.plate), ('vehicle_type', args.vehicle),
+        ('violation_type', args.violation), ('location', args.location),
+        ('fine_amount', args.fine), ('officer_name', args.officer),
+        ('status', args.status), ('notes', args.notes)
+    ) if value is not None}
+    if not changes:
+        print("✗ Nothing to update; pass at least one field option")
+        return 2
+    db = open_db(args, writes=True)
+    try:
+        return 0 if db.patch_violation(args.id, changes, args.version) else 1
+    except StaleRecordError as e:
+        print(f"✗ {e}")
+        return 3
+
+
+def cmd_set_status(args, out):
+    db = open_db(args, writes=True)
+    updated = db.update_status_bulk(args.ids, args.status)
+    out.write(f"{updated}\n")
+    return 0 if updated == len(args.ids) else 1
+
+
+def cmd_delete(args, out):
+    db = open_db(args, writes=True)
+    if len(args.ids) == 1:
+        return 0 if db.delete_violation(args.ids[0]) else 1
+    deleted = db.delete_violations_bulk(args.ids)
+    out.write(f"{deleted}\n")
+    return 0 if deleted == len(args.ids) else 1
+
+
+def cmd_import(args, out):
+    from ingest import IngestPipeline
+    db = open_db(args)
+    totals = IngestPipeline(args.file, db, workers=args.workers,
+                            on_duplicate=args.on_duplicate).run(args.restart)
+    out.write(json.dumps(totals) + "\n")
+    return 0
+
+
+def cmd_export(args, out):
+    from database import ARCHIVE_COLUMNS
+    db = open_db(args)
+    stream = open(args.output, 'w', newline='', encoding='utf-8') if args.output else out
+    try:
+        writer = RowWriter(stream, args.format, ARCHIVE_COLUMNS)
+        for rows in db.iter_violations(include_history=args.history):
+            writer.write_all(rows)
+    finally:
+        if args.output:
+            stream.close()
+    return 0
+
+
+def cmd_stats(args, out):
+    db = open_db(args)
+    rows = db.summarize_violations(args.group_by, args.start, args.end)
+    RowWriter(out, args.format, (args.group_by, 'violations', 'total_fines')).write_all(rows)
+    return 0
+
+
+# --- Users ------------------------------------------------------------------
+
+def read_password(args) -> str:
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip("\n")
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Confirm password: "):
+        raise ValueError("Passwords do not match")
+    return password
+
+
+def cmd_user_add(args, out):
+    from auth import AuthManager
+    password = read_password(args)
+    if len(password) < 8:
+        print("✗ Password must be at least 8 characters")
+        return 2
+    auth = AuthManager(open_db(args))
+    if auth.user_exists(args.username):
+        print(f"✗ User '{args.username}' already exists")
+        return 1
+    out.write(f"{auth.register_user(args.username, args.email, password, args.role)}\n")
+    return 0
+
+
+def cmd_user_list(args, out):
+    rows = open_db(args).fetch_users()
+    RowWriter(out, args.format, ('id', 'username', 'email', 'role', 'created_at')).write_all(rows)
+    return 0
+
+
+def cmd_user_passwd(args, out):
+    from auth import AuthManager
+    password = read_password(args)
+    if len(password) < 8:
+        print("✗ Password must be at least 8 characters")
+        return 2
+    if not AuthManager(open_db(args)).change_password(args.username, password):
+        print(f"✗ No user '{args.username}'")
+        return 1
+    print(f"✓ Password changed for {args.username}")
+    return 0
+
+
+# --- Argument parsing -------------------------------------------------------
+
+def common_options(defaults: bool) -> argparse.ArgumentParser:
+    """Options accepted before or after the subcommand name
+
+    Only the top-level copy has defaults; the subcommand copies leave the
+    attribute unset unless given, so they never overwrite an earlier value.
+    """
+    options = argparse.ArgumentParser(add_help=False)
+    default = (lambda value: value) if defaults else (lambda value: argparse.SUPPRESS)
+    options.add_argument("--format", choices=('tsv', 'csv', 'json'), default=default('tsv'),
+                         help="output format for rows (default: tsv)")
+    options.add_argument("--user", default=default(os.environ.get('USER') or os.environ.get('USERNAME') or 'cli'),
+                         help="name recorded in the audit log")
+    options.add_argument("--check-schema", action="store_true", default=default(False),
+                         help="create missing tables/columns first (slower start)")
+    return options
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Vehicle Violation Management System (headless)",
+                                     parents=[common_options(defaults=True)])
+    common = [common_options(defaults=False)]
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="create or upgrade the database schema", parents=common)
+    init.set_defaults(handler=cmd_init)
+
+    create = commands.add_parser("create", help="record a violation", parents=common)
+    create.add_argument("--plate", required=True)
+    create.add_argument("--vehicle", required=True)
+    create.add_argument("--violation", required=True)
+    create.add_argument("--location", required=True)
+    create.add_argument("--fine", type=float, help="default: scheduled fine for the date")
+    create.add_argument("--officer", default='Officer')
+    create.add_argument("--status", default='Pending')
+    create.add_argument("--notes", default='')
+    create.add_argument("--date-time", type=parse_date)
+    create.add_argument("--on-duplicate", choices=('reject', 'merge', 'flag'))
+    create.set_defaults(handler=cmd_create)
+
+    search = commands.add_parser("search", help="search by plate, type or location", parents=common)
+    search.add_argument("term")
+    search.add_argument("--history", action="store_true", help="include archived violations")
+    search.add_argument("--notes", action="store_true", help="full-text search of notes instead")
+    search.add_argument("--fuzzy", action="store_true", help="fall back to similar plates")
+    search.add_argument("--page", type=int, default=1)
+    search.add_argument("--page-size", type=int, default=100)
+    search.set_defaults(handler=cmd_search)
+
+    show = commands.add_parser("show", help="print one violation with every column", parents=common)
+    show.add_argument("id", type=int)
+    show.set_defaults(handler=cmd_show)
+
+    update = commands.add_parser("update", help="change fields of a violation", parents=common)
+    update.add_argument("id", type=int)
+    update.add_argument("--plate")
+    update.add_argument("--vehicle")
+    update.add_argument("--violation")
+    update.add_argument("--location")
+    update.add_argument("--fine", type=float)
+    update.add_argument("--officer")
+    update.add_argument("--status")
+    update.add_argument("--notes")
+    update.add_argument("--version", type=int, help="fail if the record changed since this version")
+    update.set_defaults(handler=cmd_update)
+
+    set_status = commands.add_parser("set-status", help="set the status of many violations", parents=common)
+    set_status.add_argument("status")
+    set_status.add_argument("ids", type=int, nargs="+")
+    set_status.set_defaults(handler=cmd_set_status)
+
+    delete = commands.add_parser("delete", help="delete violations", parents=common)
+    delete.add_argument("ids", type=int, nargs="+")
+    delete.set_defaults(handler=cmd_delete)
+
+    bulk_import = commands.add_parser("import", help="bulk import a CSV export", parents=common)
+    bulk_import.add_argument("file")
+    bulk_import.add_argument("--workers", type=int)
+    bulk_import.add_argument("--on-duplicate", choices=('reject', 'merge', 'flag'))
+    bulk_import.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    bulk_import.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="stream every violation", parents=common)
+    export.add_argument("--history", action="store_true", help="include archived violations")
+    export.add_argument("--output", help="write to a file instead of stdout")
+    export.set_defaults(handler=cmd_export)
+
+    stats = commands.add_parser("stats", help="counts and fine totals per group", parents=common)
+    stats.add_argument("--group-by", default='status',
+                       choices=('status', 'violation_type', 'vehicle_type', 'officer_name', 'location'))
+    stats.add_argument("--start", type=parse_date)
+    stats.add_argument("--end", type=parse_date)
+    stats.set_defaults(handler=cmd_stats)
+
+    user = commands.add_parser("user", help="manage accounts", parents=common)
+    user_commands = user.add_subparsers(dest="user_command", required=True)
+    user_add = user_commands.add_parser("add", help="create an account", parents=common)
+    user_add.add_argument("username")
+    user_add.add_argument("--email", required=True)
+    user_add.add_argument("--role", default='officer')
+    user_add.add_argument("--password-stdin", action="store_true", help="read the password from stdin")
+    user_add.set_defaults(handler=cmd_user_add)
+    user_list = user_commands.add_parser("list", help="list accounts", parents=common)
+    user_list.set_defaults(handler=cmd_user_list)
+    user_passwd = user_commands.add_parser("passwd", help="change a password", parents=common)
+    user_passwd.add_argument("username")
+    user_passwd.add_argument("--password-stdin", action="store_true", help="read the password from stdin")
+    user_passwd.set_defaults(handler=cmd_user_passwd)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    # The data layer reports progress with print(); keep stdout for results only
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return args.handler(args, out)
+        except BrokenPipeError:
+            return 0
+        except Exception as e:
+            print(f"✗ {e}")
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
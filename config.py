@@ -12,6 +12,16 @@ DATABASE_CONFIG = {
     'port': 3306
 }
 
+# Read replicas for search, dashboard and export traffic. Each entry takes
+# the same keys as DATABASE_CONFIG; leave empty to send everything to the primary
+REPLICA_CONFIGS = []
+
+REPLICATION_CONFIG = {
+    'max_lag_seconds': 5,           # Skip replicas lagging further behind
+    'read_your_writes_seconds': 5,  # Read from the primary this long after a write
+    'lag_check_interval': 2         # Seconds between replica lag probes
+}
+
 # Application Settings
 APP_CONFIG = {
     'title': '🚗 Vehicle Violation Management System',
@@ -19,7 +29,9 @@ APP_CONFIG = {
     'window_width': 1400,
     'window_height': 800,
     'min_width': 1200,
-    'min_height': 600
+    'min_height': 600,
+    'rows_per_page': 500,         # Table rows rendered at a time as the user scrolls
+    'plate_index_refresh': 30     # Seconds between background refreshes of the similar-plate index
 }
 
 # Dropdown Options
@@ -89,6 +101,132 @@ DEFAULT_FINES = {
     "Other": 500.00
 }
 
+# Partitioning & Archiving
+# Default views read the most recent `hot_months` of violations plus every
+# ticket still open; closed records older than `archive_after_days` are moved
+# out by archive.py
+ARCHIVE_CONFIG = {
+    'hot_months': 12,
+    'archive_after_days': 365,
+    'closed_statuses': ['Paid', 'Cancelled'],
+    'batch_size': 1000,
+    'future_partitions': 3
+}
+
+# Duplicate Detection
+# A ticket with the same plate, violation type and location as an existing one
+# within `window_minutes` is a duplicate. Policy: 'reject', 'merge' or 'flag'
+DUPLICATE_CONFIG = {
+    'window_minutes': 10,
+    'policy': 'flag'
+}
+
+# HTTP API Service (api_server.py)
+API_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'pool_size': 8,
+    'rate_limit_per_second': 50,
+    'rate_limit_burst': 100,
+    'cache_ttl_seconds': 30,
+    'cache_max_entries': 10000,
+    'list_default_limit': 100,    # Rows GET /violations returns without ?limit
+    'list_max_limit': 1000        # Largest ?limit GET /violations accepts
+}
+
+# Bulk Ingestion Pipeline (ingest.py)
+INGEST_CONFIG = {
+    'chunk_bytes': 1024 * 1024,   # Size of the file slice each worker parses
+    'workers': None,              # None = one per CPU core
+    'queue_size': 8,              # Parsed chunks waiting for the writer
+    'on_duplicate': 'merge'       # Re-running an import must not double-insert
+}
+
+# Fine schedule cache
+FINE_CONFIG = {
+    'check_interval': 60          # Seconds between checks for schedule edits
+}
+
+# Change feed polling by the desktop clients
+CHANGE_FEED_CONFIG = {
+    'poll_interval_ms': 5000,     # How often each workstation asks for changes
+    'overlap_seconds': 5,         # Re-read window for transactions that commit late
+    'tombstone_days': 7           # How long deleted IDs are kept for the feed
+}
+
+# Audit trail writer
+AUDIT_CONFIG = {
+    'queue_size': 10000,          # Entries buffered before saves start to wait
+    'batch_size': 200,            # Rows per INSERT
+    'flush_interval': 1.0,        # Seconds a partial batch may wait
+    'put_timeout': 5.0,           # Seconds a save waits on a full queue before dropping the entry
+    'retry_delay': 1.0,           # First wait before rewriting a batch while the database is down
+    'max_retry_delay': 30.0       # Longest wait between those attempts
+}
+
+# Report engine
+REPORT_CONFIG = {
+    'output_dir': 'reports',      # Rendered reports, named by their cache key
+    'workers': 2                  # Rendering processes
+}
+
+# Camera (ANPR) detection daemon
+ANPR_CONFIG = {
+    'spool_dir': 'spool',         # Cameras drop *.jsonl files here (write, then rename)
+    'host': '127.0.0.1',          # Socket for line-delimited JSON detections
+    'port': 8090,
+    'metrics_port': 8091,         # GET /metrics returns JSON counters
+    'queue_size': 20000,          # Detections buffered before sources are paused
+    'batch_size': 500,            # Rows per insert transaction
+    'batch_timeout': 0.25,        # Seconds a partial batch may wait
+    'poll_interval': 0.5,         # Seconds between spool directory scans
+    'retry_max_seconds': 30,      # Back-off ceiling while the database is down
+    'shutdown_timeout': 30,       # Seconds to commit the queue on SIGTERM before giving up
+    'on_duplicate': 'merge'       # Redelivered detections must not double-insert
+}
+
+# UI diagnostics (hidden menu: Ctrl+Shift+D)
+DIAGNOSTICS_CONFIG = {
+    'enabled': False,             # Start the latency monitor with the app
+    'frame_budget_ms': 100,       # Event loop blocked longer than this counts as a stall
+    'heartbeat_ms': 50,           # Timer used to detect stalls outside callbacks
+    'sample_interval_ms': 5,      # Sampling profiler period
+    'output_dir': 'diagnostics'   # Stall log, reports and profiles
+}
+
+# Query-plan regression checks (query_plans.py). Plans are taken against a
+# scratch database seeded with `seed_rows` synthetic violations
+QUERY_PLAN_CONFIG = {
+    'database_suffix': '_plans',  # Scratch database: DATABASE_CONFIG name + suffix
+    'seed_rows': 50000,
+    'expectations': 'query_plans.json',
+    'row_headroom': 2.0           # --update budgets this many times the estimated rows
+}
+
+# Logical backup and restore (backup.py). The gazetteer and fine schedule
+# travel with the violations that reference them
+BACKUP_CONFIG = {
+    'output_dir': 'backups',
+    'tables': ['users', 'locations', 'location_aliases', 'fine_schedule',
+               'violations', 'violations_archive'],
+    'workers': 4,                 # Parallel dump readers / restore loaders
+    'chunk_rows': 50000,          # Primary-key span of one chunk file
+    'insert_batch': 1000          # Rows per multi-row INSERT when restoring
+}
+
+# Regional sharding (sharding.py). Each region maps to a server config like
+# DATABASE_CONFIG plus a unique 'shard_number' between 1 and id_stride - 1;
+# leave empty to keep every municipality on one server
+SHARD_CONFIGS = {}
+
+SHARDING_CONFIG = {
+    'id_stride': 64,              # auto_increment_increment on every shard; id % stride = shard_number
+    'workers': 8,                 # Threads for scatter-gather queries
+    'directory': None,            # Server holding the plate -> region directory; None = DATABASE_CONFIG
+    'default_region': None,       # Region used when a write names none
+    'legacy_max_id': 0            # Highest ID issued before sharding; start each shard's AUTO_INCREMENT above it
+}
+
 # Messages
 MESSAGES = {
     'success': {
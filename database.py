@@ -2,34 +2,118 @@
 database.py - MySQL Database Handler for XAMPP
 Vehicle Violation Management System
 """
+import bisect
+import csv
+import gzip
+import os
+import re
 import pymysql
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime, timedelta
 from typing import List, Tuple, Optional, Dict
+from config import (DATABASE_CONFIG, ARCHIVE_CONFIG, DUPLICATE_CONFIG,
+                    VEHICLE_TYPES, VIOLATION_TYPES, STATUS_TYPES, DEFAULT_FINES)
+from gazetteer import canonicalize_location
+from models import Violation
+
+# Columns shared by the live and archive tables
+ARCHIVE_COLUMNS = (
+    'id', 'plate_number', 'vehicle_type', 'violation_type', 'location',
+    'fine_amount', 'date_time', 'officer_name', 'status', 'notes', 'created_at'
+)
+
+# Columns stored as ENUMs over the fixed lists in config.py
+ENUM_COLUMNS = {
+    'vehicle_type': VEHICLE_TYPES,
+    'violation_type': VIOLATION_TYPES,
+    'status': STATUS_TYPES,
+}
+
+# Columns the summary aggregates may group by
+SUMMARY_COLUMNS = ('status', 'violation_type', 'vehicle_type', 'officer_name', 'location')
+
+# Columns a patch-style update may touch
+PATCHABLE_COLUMNS = (
+    'plate_number', 'vehicle_type', 'violation_type', 'location',
+    'fine_amount', 'officer_name', 'status', 'notes'
+)
+
+
+class StaleRecordError(Exception):
+    """Raised when a record was changed by someone else since it was read"""
+
+
+class DuplicateViolationError(Exception):
+    """Raised when a new violation duplicates a recent one under the 'reject' policy"""
+    
+    def __init__(self, existing_id: int):
+        super().__init__(f"Duplicate of existing violation ID {existing_id}")
+        self.existing_id = existing_id
+
+
+# A boolean-mode operator at the start of a token, or a quoted phrase
+BOOLEAN_OPERATOR = re.compile(r'(^|\s)[+\-~<>]|"')
+
+
+def notes_search_expression(query: str) -> str:
+    """Turn a notes search into a MATCH ... IN BOOLEAN MODE expression
+    
+    Queries using operators the way boolean syntax does ("+tinted -paid",
+    '"expired plate"') pass through unchanged. Anything else is split into
+    words that must all match as prefixes, so hyphens inside plates
+    ("ABC-123") and stray ( ) @ < > ~ cannot turn into operators or
+    syntax errors. Returns '' when there is nothing to search for.
+    """
+    if BOOLEAN_OPERATOR.search(query):
+        return query.strip()
+    return " ".join(f"+{word}*" for word in re.findall(r'\w+', query))
+
+
+def month_start(value: datetime, offset: int = 0) -> datetime:
+    """Return the first day of the month `offset` months away from value"""
+    month_index = value.year * 12 + (value.month - 1) + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
 
 class ViolationDatabase:
-    def __init__(self):
-        """Initialize MySQL database connection"""
+    def __init__(self, config: Optional[Dict] = None, read_only: bool = False,
+                 check_schema: Optional[bool] = None):
+        """Initialize MySQL database connection
+        
+        config defaults to DATABASE_CONFIG. A read_only handle (e.g. for a
+        replica) skips the schema checks, which would issue DDL; short-lived
+        clients on an existing schema can skip them with check_schema=False.
+        """
+        self.config = config or DATABASE_CONFIG
+        self.read_only = read_only
         self.connection = None
         self.cursor = None
+        self._location_ids: Dict[str, int] = {}
+        self._officer_ids: Dict[str, int] = {}
+        self.audit_logger = None
         self.connect()
         self.create_database()
-        self.create_tables()
+        if (not read_only) if check_schema is None else check_schema:
+            self.create_tables()
     
     def connect(self):
         """Connect to MySQL server (XAMPP)"""
         try:
             print("  - Attempting MySQL connection...")
-            print(f"    Host: localhost")
-            print(f"    User: root")
-            print(f"    Port: 3306")
+            print(f"    Host: {self.config['host']}")
+            print(f"    User: {self.config['user']}")
+            print(f"    Port: {self.config['port']}")
             
             self.connection = pymysql.connect(
-                host='localhost',
-                user='root',
-                password='',  # Default XAMPP password is empty
-                port=3306,
+                host=self.config['host'],
+                user=self.config['user'],
+                password=self.config['password'],  # Default XAMPP password is empty
+                port=self.config['port'],
                 connect_timeout=10,
-                charset='utf8mb4'
+                charset='utf8mb4',
+                # Read-only handles never write; autocommit stops REPEATABLE
+                # READ from pinning them to the snapshot of their first read
+                autocommit=self.read_only
             )
             self.cursor = self.connection.cursor()
             print("✓ Connected to MySQL server")
@@ -44,19 +128,20 @@ class ViolationDatabase:
             elif error_code == 1045:
                 raise Exception("Access denied. Check MySQL username/password.")
             elif error_code == 2002:
-                raise Exception("MySQL server is not responding. Check if port 3306 is available.")
+                raise Exception(f"MySQL server is not responding. Check if port {self.config['port']} is available.")
             else:
                 raise Exception(f"MySQL Error ({error_code}): {e}")
     
     def create_database(self):
         """Use existing database"""
+        database = self.config['database']
         try:
-            self.cursor.execute("USE vehicle_violations_db")
+            self.cursor.execute(f"USE `{database}`")
             self.connection.commit()
-            print("✓ Connected to existing database: vehicle_violations_db")
+            print(f"✓ Connected to existing database: {database}")
         except Exception as e:
             print(f"✗ Database error: {e}")
-            raise Exception(f"Cannot connect to database 'vehicle_violations_db'. Make sure it exists!")
+            raise Exception(f"Cannot connect to database '{database}'. Make sure it exists!")
     
     def create_tables(self):
         """Check if violations table exists"""
@@ -95,75 +180,1156 @@ class ViolationDatabase:
                     )
                 """)
                 print("✓ Table 'users' created")
+            
+            # Check/create archive table for closed, aged-out violations
+            self.cursor.execute("SHOW TABLES LIKE 'violations_archive'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE violations_archive (
+                        id INT PRIMARY KEY,
+                        plate_number VARCHAR(20) NOT NULL,
+                        vehicle_type VARCHAR(50) NOT NULL,
+                        violation_type VARCHAR(100) NOT NULL,
+                        location VARCHAR(255) NOT NULL,
+                        fine_amount DECIMAL(10, 2) NOT NULL,
+                        date_time DATETIME NOT NULL,
+                        officer_name VARCHAR(100) NOT NULL,
+                        status VARCHAR(50) DEFAULT 'Pending',
+                        notes TEXT,
+                        created_at TIMESTAMP NULL,
+                        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_archive_date_time (date_time),
+                        INDEX idx_archive_plate (plate_number)
+                    )
+                """)
+                print("✓ Table 'violations_archive' created")
+            
+            # Optimistic concurrency columns
+            self._ensure_column('violations', 'version', 'INT NOT NULL DEFAULT 0')
+            self._ensure_column(
+                'violations', 'updated_at',
+                'TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'
+            )
+            
+            self._ensure_column('violations', 'duplicate_of', 'INT NULL')
+            
+            # Location gazetteer: canonical names and the raw strings mapped to them
+            self.cursor.execute("SHOW TABLES LIKE 'locations'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE locations (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        canonical_name VARCHAR(255) NOT NULL UNIQUE,
+                        usage_count INT NOT NULL DEFAULT 0
+                    )
+                """)
+                print("✓ Table 'locations' created")
+            
+            self.cursor.execute("SHOW TABLES LIKE 'location_aliases'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE location_aliases (
+                        raw_text VARCHAR(255) PRIMARY KEY,
+                        location_id INT NOT NULL,
+                        INDEX idx_alias_location (location_id)
+                    )
+                """)
+                print("✓ Table 'location_aliases' created")
+            
+            # Effective-dated fines; an open-ended row has effective_to NULL
+            self.cursor.execute("SHOW TABLES LIKE 'fine_schedule'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE fine_schedule (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        violation_type VARCHAR(100) NOT NULL,
+                        amount DECIMAL(10, 2) NOT NULL,
+                        effective_from DATE NOT NULL,
+                        effective_to DATE NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                        UNIQUE KEY uq_fine_type_from (violation_type, effective_from)
+                    )
+                """)
+                self.cursor.executemany(
+                    "INSERT INTO fine_schedule (violation_type, amount, effective_from) VALUES (%s, %s, %s)",
+                    [(violation_type, amount, '2000-01-01') for violation_type, amount in DEFAULT_FINES.items()]
+                )
+                print("✓ Table 'fine_schedule' created")
+            
+            # Deleted and archived IDs, so polling clients can drop them
+            self.cursor.execute("SHOW TABLES LIKE 'violation_tombstones'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE violation_tombstones (
+                        violation_id INT PRIMARY KEY,
+                        deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        INDEX idx_tombstones_deleted_at (deleted_at)
+                    )
+                """)
+                print("✓ Table 'violation_tombstones' created")
+            
+            # Audit trail: who created, changed or deleted what
+            self.cursor.execute("SHOW TABLES LIKE 'audit_log'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE audit_log (
+                        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                        logged_at DATETIME(6) NOT NULL,
+                        username VARCHAR(50) NOT NULL,
+                        action VARCHAR(20) NOT NULL,
+                        violation_id INT NOT NULL,
+                        before_image TEXT NULL,
+                        after_image TEXT NULL,
+                        INDEX idx_audit_violation (violation_id),
+                        INDEX idx_audit_logged_at (logged_at)
+                    )
+                """)
+                # Refuse edits and deletes so the log stays append-only
+                try:
+                    for event in ('UPDATE', 'DELETE'):
+                        self.cursor.execute(f"""
+                            CREATE TRIGGER audit_log_no_{event.lower()}
+                            BEFORE {event} ON audit_log FOR EACH ROW
+                            SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'audit_log is append-only'
+                        """)
+                except Exception as e:
+                    print(f"⚠ Could not make audit_log append-only: {e}")
+                print("✓ Table 'audit_log' created")
+            
+            # Full-text index over notes. It lives in a side table because
+            # partitioned tables cannot carry FULLTEXT indexes.
+            self.cursor.execute("SHOW TABLES LIKE 'violation_notes'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE violation_notes (
+                        violation_id INT PRIMARY KEY,
+                        notes TEXT NOT NULL
+                    )
+                """)
+                self.cursor.execute("""
+                    INSERT INTO violation_notes (violation_id, notes)
+                    SELECT id, notes FROM violations WHERE notes IS NOT NULL AND notes <> ''
+                """)
+                # Building the index after the copy is much faster than maintaining it row by row
+                self.cursor.execute("ALTER TABLE violation_notes ADD FULLTEXT INDEX ft_notes (notes)")
+                self.connection.commit()
+                print("✓ Table 'violation_notes' created")
+            
+            # Which regions hold violations for a plate; the shard router's directory
+            self.cursor.execute("SHOW TABLES LIKE 'plate_regions'")
+            if not self.cursor.fetchone():
+                self.cursor.execute("""
+                    CREATE TABLE plate_regions (
+                        plate_number VARCHAR(20) NOT NULL,
+                        region VARCHAR(50) NOT NULL,
+                        PRIMARY KEY (plate_number, region)
+                    )
+                """)
+                print("✓ Table 'plate_regions' created")
+            
+            self._ensure_column('violations', 'location_id', 'INT NULL')
+            self._ensure_index('violations', 'idx_violations_location_id', 'location_id')
+            
+            self._ensure_column('violations', 'officer_id', 'INT NULL')
+            self._ensure_index('violations', 'idx_violations_officer_id', 'officer_id')
+            
+            self._ensure_index('violations', 'idx_violations_date_time', 'date_time')
+            self._ensure_index('violations', 'idx_violations_dedup',
+                               'plate_number, violation_type, date_time')
+            self._ensure_index('violations', 'idx_violations_plate_status', 'plate_number, status')
+            self._ensure_index('violations', 'idx_violations_updated_at', 'updated_at')
+            self._ensure_index('violations', 'idx_violations_status_date', 'status, date_time')
                 
             self.connection.commit()
         except Exception as e:
             print(f"✗ Table check error: {e}")
             raise
     
+    def _ensure_index(self, table: str, index_name: str, columns: str):
+        """Add an index to a table if it does not exist yet"""
+        self.cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+        if not self.cursor.fetchone():
+            self.cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns})")
+            print(f"✓ Index '{index_name}' created on {table}")
+    
+    def _ensure_column(self, table: str, column: str, definition: str):
+        """Add a column to a table if it does not exist yet"""
+        self.cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+        if not self.cursor.fetchone():
+            self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            print(f"✓ Column '{column}' added to {table}")
+    
+    def _hot_cutoff(self) -> datetime:
+        """Start of the oldest month the default views read"""
+        return month_start(datetime.now(), -(ARCHIVE_CONFIG['hot_months'] - 1))
+    
+    def _hot_union(self, condition: str = "", params: Optional[List] = None) -> Tuple[str, List]:
+        """Default-view SELECT: recent rows plus every open one, newest first
+        
+        Unpaid tickets older than the hot window must stay visible until they
+        are closed. The two cases are separate UNION ALL branches rather than
+        one OR, so the recent branch prunes to the hot partitions and the old
+        one reads idx_violations_status_date. condition is ANDed into both.
+        """
+        closed = ARCHIVE_CONFIG['closed_statuses']
+        open_statuses = [s for s in STATUS_TYPES if s not in closed]
+        status_marks = ", ".join(["%s"] * len(open_statuses))
+        cutoff = self._hot_cutoff()
+        extra = f" AND ({condition})" if condition else ""
+        params = params or []
+        query = f"""
+            SELECT id, plate_number, vehicle_type, violation_type, 
+                   location, fine_amount, date_time, status
+            FROM violations
+            WHERE date_time >= %s{extra}
+            UNION ALL
+            SELECT id, plate_number, vehicle_type, violation_type, 
+                   location, fine_amount, date_time, status
+            FROM violations
+            WHERE status IN ({status_marks}) AND date_time < %s{extra}
+            ORDER BY date_time DESC
+        """
+        return query, [cutoff, *params, *open_statuses, cutoff, *params]
+    
+    def resolve_location_id(self, raw: str) -> Optional[int]:
+        """Map a raw location string to its canonical location ID, creating it if new
+        
+        Runs inside the caller's transaction; the caller commits.
+        """
+        raw = raw.strip()[:255]
+        if raw in self._location_ids:
+            return self._location_ids[raw]
+        
+        self.cursor.execute("SELECT location_id FROM location_aliases WHERE raw_text = %s", (raw,))
+        result = self.cursor.fetchone()
+        if result:
+            location_id = result[0]
+        else:
+            canonical = canonicalize_location(raw)
+            if not canonical:
+                return None
+            self.cursor.execute("""
+                INSERT INTO locations (canonical_name) VALUES (%s)
+                ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+            """, (canonical,))
+            location_id = self.cursor.lastrowid
+            self.cursor.execute(
+                "INSERT IGNORE INTO location_aliases (raw_text, location_id) VALUES (%s, %s)",
+                (raw, location_id)
+            )
+        
+        self._location_ids[raw] = location_id
+        return location_id
+    
+    def _count_location_uses(self, location_ids: List[Optional[int]], delta: int = 1):
+        """Adjust usage counts that rank the location autocomplete"""
+        counts = Counter(location_id for location_id in location_ids if location_id)
+        if counts:
+            self.cursor.executemany(
+                "UPDATE locations SET usage_count = usage_count + %s WHERE id = %s",
+                [(count * delta, location_id) for location_id, count in counts.items()]
+            )
+    
+    def get_location_counts(self) -> List[Tuple[str, int]]:
+        """Canonical location names with how often each was used, most used first"""
+        try:
+            self.cursor.execute("""
+                SELECT canonical_name, usage_count FROM locations
+                ORDER BY usage_count DESC, canonical_name
+            """)
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"✗ Error fetching locations: {e}")
+            return []
+    
+    def backfill_location_ids(self) -> int:
+        """Assign location_id to violations recorded before the gazetteer existed"""
+        try:
+            self.cursor.execute("SELECT DISTINCT location FROM violations WHERE location_id IS NULL")
+            raw_locations = [row[0] for row in self.cursor.fetchall()]
+            
+            updated = 0
+            for raw in raw_locations:
+                location_id = self.resolve_location_id(raw)
+                self.cursor.execute(
+                    "UPDATE violations SET location_id = %s WHERE location = %s AND location_id IS NULL",
+                    (location_id, raw)
+                )
+                updated += self.cursor.rowcount
+                self.connection.commit()
+            
+            # Recount usage from scratch so the ranking matches the data
+            self.cursor.execute("""
+                UPDATE locations l
+                LEFT JOIN (
+                    SELECT location_id, COUNT(*) AS uses FROM violations
+                    WHERE location_id IS NOT NULL GROUP BY location_id
+                ) v ON v.location_id = l.id
+                SET l.usage_count = COALESCE(v.uses, 0)
+            """)
+            self.connection.commit()
+            print(f"✓ Linked {updated} violation(s) to {len(raw_locations)} location string(s)")
+            return updated
+        except Exception as e:
+            self.connection.rollback()
+            self._location_ids.clear()
+            print(f"✗ Error backfilling locations: {e}")
+            return 0
+    
+    def get_officer_id(self, username: str) -> Optional[int]:
+        """User ID for an officer name, cached for the life of the connection"""
+        if username not in self._officer_ids:
+            self.cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+            result = self.cursor.fetchone()
+            if not result:
+                return None
+            self._officer_ids[username] = result[0]
+        return self._officer_ids[username]
+    
+    def normalize_lookup_columns(self) -> bool:
+        """Convert the type/status columns to ENUMs and link officers to users
+        
+        ENUMs store each value as a 1-byte code but read and write as the
+        same strings, so no query changes. Rerun after adding values to
+        the lists in config.py; appending values is a metadata-only change.
+        """
+        try:
+            for column, values in ENUM_COLUMNS.items():
+                marks = ", ".join(["%s"] * len(values))
+                self.cursor.execute(
+                    f"SELECT DISTINCT {column} FROM violations WHERE {column} NOT IN ({marks})",
+                    values
+                )
+                unknown = [row[0] for row in self.cursor.fetchall()]
+                if unknown:
+                    print(f"✗ {column} has values missing from config.py: {', '.join(map(str, unknown))}")
+                    return False
+            
+            definitions = []
+            for column, values in ENUM_COLUMNS.items():
+                escaped = ", ".join("'" + value.replace("'", "''") + "'" for value in values)
+                default = " DEFAULT 'Pending'" if column == 'status' else ""
+                definitions.append(f"MODIFY {column} ENUM({escaped}) NOT NULL{default}")
+            self.cursor.execute("ALTER TABLE violations " + ", ".join(definitions))
+            print("✓ vehicle_type, violation_type and status converted to ENUM")
+            
+            self.cursor.execute("""
+                UPDATE violations v
+                JOIN users u ON u.username = v.officer_name
+                SET v.officer_id = u.id
+                WHERE v.officer_id IS NULL
+            """)
+            print(f"✓ Linked {self.cursor.rowcount} violation(s) to officer accounts")
+            
+            # Partitioned InnoDB tables cannot carry foreign keys
+            if not self.is_partitioned():
+                if not self._has_officer_foreign_key():
+                    self.cursor.execute("""
+                        ALTER TABLE violations ADD CONSTRAINT fk_violations_officer
+                        FOREIGN KEY (officer_id) REFERENCES users (id)
+                    """)
+                    print("✓ officer_id now references users")
+            
+            self.connection.commit()
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error normalizing lookup columns: {e}")
+            return False
+    
+    def get_fine_schedule(self) -> List[Tuple]:
+        """All (violation_type, amount, effective_from, effective_to) fine periods"""
+        try:
+            self.cursor.execute("""
+                SELECT violation_type, amount, effective_from, effective_to
+                FROM fine_schedule ORDER BY violation_type, effective_from
+            """)
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"✗ Error fetching fine schedule: {e}")
+            return []
+    
+    def get_fine_schedule_version(self) -> Tuple:
+        """Changes whenever a fine period is added or edited"""
+        self.cursor.execute("SELECT COUNT(*), MAX(updated_at) FROM fine_schedule")
+        return tuple(self.cursor.fetchone())
+    
+    def set_fine(self, violation_type: str, amount: float, effective_from: date) -> bool:
+        """Schedule a new fine from a date, closing the period it supersedes"""
+        try:
+            # End the period covering effective_from, if one does
+            self.cursor.execute("""
+                UPDATE fine_schedule SET effective_to = %s
+                WHERE violation_type = %s AND effective_from < %s
+                  AND (effective_to IS NULL OR effective_to > %s)
+            """, (effective_from, violation_type, effective_from, effective_from))
+            # The new period runs until the next scheduled change, if any
+            self.cursor.execute("""
+                SELECT MIN(effective_from) FROM fine_schedule
+                WHERE violation_type = %s AND effective_from > %s
+            """, (violation_type, effective_from))
+            effective_to = self.cursor.fetchone()[0]
+            self.cursor.execute("""
+                INSERT INTO fine_schedule (violation_type, amount, effective_from, effective_to)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE amount = VALUES(amount)
+            """, (violation_type, amount, effective_from, effective_to))
+            self.connection.commit()
+            print(f"✓ {violation_type} fine set to {amount:,.2f} from {effective_from}")
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error setting fine: {e}")
+            return False
+    
+    def _has_officer_foreign_key(self) -> bool:
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'violations'
+              AND CONSTRAINT_NAME = 'fk_violations_officer'
+        """)
+        return self.cursor.fetchone()[0] > 0
+    
+    def attach_audit_logger(self, audit_logger):
+        """Send before/after images of every change to an AuditLogger"""
+        self.audit_logger = audit_logger
+    
+    def _snapshot_violations(self, violation_ids: List[int]) -> Dict[int, Dict]:
+        """Lock rows about to change and return their current images (caller commits)"""
+        if self.audit_logger is None or not violation_ids:
+            return {}
+        id_marks = ", ".join(["%s"] * len(violation_ids))
+        self.cursor.execute(
+            f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM violations WHERE id IN ({id_marks}) FOR UPDATE",
+            list(violation_ids)
+        )
+        return {row[0]: dict(zip(ARCHIVE_COLUMNS, row)) for row in self.cursor.fetchall()}
+    
+    def _audit(self, action: str, violation_id: int, before: Optional[Dict], after: Optional[Dict]):
+        if self.audit_logger is not None:
+            self.audit_logger.record(action, violation_id, before, after)
+    
+    def _sync_notes(self, violation_id: int, notes: Optional[str]):
+        """Mirror one row's notes into the full-text table (the caller commits)"""
+        if notes:
+            self.cursor.execute("""
+                INSERT INTO violation_notes (violation_id, notes) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE notes = VALUES(notes)
+            """, (violation_id, notes))
+        else:
+            self._drop_notes([violation_id])
+    
+    def _drop_notes(self, violation_ids: List[int]):
+        if violation_ids:
+            id_marks = ", ".join(["%s"] * len(violation_ids))
+            self.cursor.execute(
+                f"DELETE FROM violation_notes WHERE violation_id IN ({id_marks})", list(violation_ids)
+            )
+    
+    def search_notes(self, query: str, page: int = 1,
+                     page_size: int = 50) -> Tuple[List[Tuple], int]:
+        """Full-text search over notes, best matches first
+        
+        Returns (rows, total matches) with rows in the get_all_violations
+        columns. Plain words must all appear and match as prefixes
+        ("tint" finds "tinted"); see notes_search_expression for when the
+        query is passed through as MySQL boolean syntax.
+        """
+        try:
+            return self.find_notes(query, page, page_size)
+        except Exception as e:
+            print(f"✗ Error searching notes: {e}")
+            return [], 0
+    
+    def find_notes(self, query: str, page: int = 1,
+                   page_size: int = 50) -> Tuple[List[Tuple], int]:
+        """search_notes that raises on errors instead of returning no matches
+        
+        For scripts, where an empty result must not stand in for a failed query.
+        """
+        expression = notes_search_expression(query)
+        if not expression:
+            return [], 0
+        
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM violation_notes
+            WHERE MATCH(notes) AGAINST (%s IN BOOLEAN MODE)
+        """, (expression,))
+        total = self.cursor.fetchone()[0]
+        
+        self.cursor.execute("""
+            SELECT v.id, v.plate_number, v.vehicle_type, v.violation_type,
+                   v.location, v.fine_amount, v.date_time, v.status
+            FROM (
+                SELECT violation_id, MATCH(notes) AGAINST (%s IN BOOLEAN MODE) AS score
+                FROM violation_notes
+                WHERE MATCH(notes) AGAINST (%s IN BOOLEAN MODE)
+                ORDER BY score DESC, violation_id DESC
+                LIMIT %s OFFSET %s
+            ) matches
+            JOIN violations v ON v.id = matches.violation_id
+            ORDER BY matches.score DESC, v.id DESC
+        """, (expression, expression, page_size, (max(page, 1) - 1) * page_size))
+        return self.cursor.fetchall(), total
+    
+    def find_duplicate(self, plate_number: str, violation_type: str, location: str,
+                       date_time: datetime, window_minutes: Optional[int] = None) -> Optional[int]:
+        """Return the ID of a matching violation recorded within the time window"""
+        window = timedelta(minutes=window_minutes if window_minutes is not None
+                           else DUPLICATE_CONFIG['window_minutes'])
+        query = """
+            SELECT id FROM violations
+            WHERE plate_number = %s AND violation_type = %s
+              AND date_time BETWEEN %s AND %s
+              AND location = %s
+            ORDER BY date_time
+            LIMIT 1
+        """
+        self.cursor.execute(query, (plate_number.upper(), violation_type,
+                                    date_time - window, date_time + window, location))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+    
     def create_violation(self, plate_number: str, vehicle_type: str, 
                         violation_type: str, location: str, fine_amount: float,
                         officer_name: str, status: str = 'Pending', 
-                        notes: str = '') -> int:
-        """Insert a new violation record"""
+                        notes: str = '', date_time: Optional[datetime] = None,
+                        on_duplicate: Optional[str] = None,
+                        officer_id: Optional[int] = None) -> int:
+        """Insert a new violation record
+        
+        Duplicates are handled per on_duplicate (default DUPLICATE_CONFIG['policy']):
+        'reject' raises DuplicateViolationError, 'merge' returns the existing ID
+        without inserting and 'flag' inserts with duplicate_of set.
+        """
         try:
-            date_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            date_time = (date_time or datetime.now()).replace(microsecond=0)
+            policy = on_duplicate or DUPLICATE_CONFIG['policy']
+            
+            duplicate_of = self.find_duplicate(plate_number, violation_type, location, date_time)
+            if duplicate_of:
+                if policy == 'reject':
+                    raise DuplicateViolationError(duplicate_of)
+                if policy == 'merge':
+                    print(f"✓ Violation merged into existing ID: {duplicate_of}")
+                    return duplicate_of
+            
+            location_id = self.resolve_location_id(location)
+            if officer_id is None:
+                officer_id = self.get_officer_id(officer_name)
             
             query = """
                 INSERT INTO violations 
                 (plate_number, vehicle_type, violation_type, location, 
-                 fine_amount, date_time, officer_name, status, notes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                 fine_amount, date_time, officer_name, status, notes, duplicate_of,
+                 location_id, officer_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             
             values = (
                 plate_number.upper(), vehicle_type, violation_type, 
-                location, fine_amount, date_time, officer_name, status, notes
+                location, fine_amount, date_time, officer_name, status, notes,
+                duplicate_of, location_id, officer_id
             )
             
             self.cursor.execute(query, values)
+            violation_id = self.cursor.lastrowid
+            self._count_location_uses([location_id])
+            if notes:
+                self._sync_notes(violation_id, notes)
             self.connection.commit()
             
-            violation_id = self.cursor.lastrowid
+            self._audit('create', violation_id, None, dict(
+                zip(('plate_number', 'vehicle_type', 'violation_type', 'location', 'fine_amount',
+                     'date_time', 'officer_name', 'status', 'notes', 'duplicate_of'), values),
+                id=violation_id
+            ))
+            if duplicate_of:
+                print(f"⚠ Violation {violation_id} flagged as duplicate of ID: {duplicate_of}")
             print(f"✓ Violation created with ID: {violation_id}")
             return violation_id
             
         except Exception as e:
+            self.connection.rollback()
+            self._location_ids.clear()
             print(f"✗ Error creating violation: {e}")
             raise
     
-    def get_all_violations(self) -> List[Tuple]:
-        """Retrieve all violation records"""
+    def insert_violations_bulk(self, records: List[Dict],
+                               on_duplicate: Optional[str] = None) -> Dict[str, int]:
+        """Insert many violations in one transaction with duplicate detection
+        
+        Each record is a dict with the violations columns; date_time defaults
+        to now. Existing candidates for the whole batch are fetched with a
+        single indexed range query and checked in memory.
+        """
+        policy = on_duplicate or DUPLICATE_CONFIG['policy']
+        window = timedelta(minutes=DUPLICATE_CONFIG['window_minutes'])
+        counts = {'inserted': 0, 'merged': 0, 'flagged': 0, 'rejected': 0}
+        if not records:
+            return counts
+        
+        now = datetime.now().replace(microsecond=0)
+        rows = []
+        for record in records:
+            rows.append((
+                record['plate_number'].upper(), record['vehicle_type'],
+                record['violation_type'], record['location'], record['fine_amount'],
+                record.get('date_time') or now, record.get('officer_name', 'Officer'),
+                record.get('status', 'Pending'), record.get('notes', '')
+            ))
+        rows.sort(key=lambda row: row[5])
+        
         try:
-            query = """
-                SELECT id, plate_number, vehicle_type, violation_type, 
-                       location, fine_amount, date_time, status
+            # Existing rows that could collide with anything in this batch
+            plates = sorted({row[0] for row in rows})
+            plate_marks = ", ".join(["%s"] * len(plates))
+            self.cursor.execute(f"""
+                SELECT id, plate_number, violation_type, location, date_time
                 FROM violations
-                ORDER BY date_time DESC
+                WHERE plate_number IN ({plate_marks})
+                  AND date_time BETWEEN %s AND %s
+            """, (*plates, rows[0][5] - window, rows[-1][5] + window))
+            
+            seen: Dict[tuple, list] = {}
+            for violation_id, plate, vtype, location, date_time in self.cursor.fetchall():
+                seen.setdefault((plate, vtype, location), []).append((date_time, violation_id))
+            for times in seen.values():
+                times.sort()
+            
+            fresh, flagged = [], []
+            for row in rows:
+                key = (row[0], row[2], row[3])
+                times = seen.setdefault(key, [])
+                index = bisect.bisect_left(times, (row[5] - window,))
+                match = times[index] if index < len(times) and times[index][0] <= row[5] + window else None
+                
+                if match is None:
+                    fresh.append(row + (None,))
+                    bisect.insort(times, (row[5], 0))  # ID assigned on insert
+                elif policy == 'reject':
+                    counts['rejected'] += 1
+                elif policy == 'merge':
+                    counts['merged'] += 1
+                else:
+                    flagged.append((row, match[1]))
+            
+            location_ids = {raw: self.resolve_location_id(raw) for raw in {row[3] for row in rows}}
+            officer_ids = {name: self.get_officer_id(name) for name in {row[6] for row in rows}}
+            
+            self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM violations")
+            last_id = self.cursor.fetchone()[0]
+            
+            query = """
+                INSERT INTO violations 
+                (plate_number, vehicle_type, violation_type, location, 
+                 fine_amount, date_time, officer_name, status, notes, duplicate_of,
+                 location_id, officer_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
-            self.cursor.execute(query)
+            fresh = [row + (location_ids[row[3]], officer_ids[row[6]]) for row in fresh]
+            if fresh:
+                self.cursor.executemany(query, fresh)
+                counts['inserted'] += len(fresh)
+            
+            # Duplicates of rows inserted above only now have an ID to point at
+            flagged_rows = []
+            for row, duplicate_of in flagged:
+                if not duplicate_of:
+                    duplicate_of = self.find_duplicate(row[0], row[2], row[3], row[5])
+                flagged_rows.append(row + (duplicate_of, location_ids[row[3]], officer_ids[row[6]]))
+            if flagged_rows:
+                self.cursor.executemany(query, flagged_rows)
+                counts['inserted'] += len(flagged_rows)
+                counts['flagged'] += len(flagged_rows)
+            
+            self._count_location_uses([row[10] for row in fresh + flagged_rows])
+            if any(row[8] for row in fresh + flagged_rows):
+                # executemany may split the batch, so pick up the new IDs by range
+                self.cursor.execute("""
+                    INSERT INTO violation_notes (violation_id, notes)
+                    SELECT id, notes FROM violations WHERE id > %s AND notes <> ''
+                    ON DUPLICATE KEY UPDATE notes = VALUES(notes)
+                """, (last_id,))
+            self.connection.commit()
+            print(f"✓ Bulk insert: {counts['inserted']} inserted, {counts['merged']} merged, "
+                  f"{counts['flagged']} flagged, {counts['rejected']} rejected")
+            return counts
+        except Exception as e:
+            self.connection.rollback()
+            self._location_ids.clear()
+            print(f"✗ Error in bulk insert: {e}")
+            raise
+    
+    def scan_duplicates(self, window_minutes: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Find existing duplicates in one pass over the dedup index
+        
+        Returns (violation_id, duplicate_of) pairs where duplicate_of is the
+        first ticket of each run of matching tickets within the window.
+        """
+        window = timedelta(minutes=window_minutes if window_minutes is not None
+                           else DUPLICATE_CONFIG['window_minutes'])
+        pairs = []
+        stream = self.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            stream.execute("""
+                SELECT id, plate_number, violation_type, location, date_time
+                FROM violations
+                ORDER BY plate_number, violation_type, date_time
+            """)
+            group = None
+            last_seen: Dict[str, tuple] = {}
+            for violation_id, plate, vtype, location, date_time in stream:
+                if (plate, vtype) != group:
+                    group = (plate, vtype)
+                    last_seen = {}
+                
+                previous = last_seen.get(location)
+                if previous and date_time - previous[0] <= window:
+                    anchor = previous[1]
+                    pairs.append((violation_id, anchor))
+                else:
+                    anchor = violation_id
+                last_seen[location] = (date_time, anchor)
+        finally:
+            stream.close()
+        
+        print(f"✓ Found {len(pairs)} duplicate violation(s)")
+        return pairs
+    
+    def flag_duplicates(self, pairs: List[Tuple[int, int]], chunk_size: int = 500) -> int:
+        """Set duplicate_of for (violation_id, duplicate_of) pairs"""
+        try:
+            for start in range(0, len(pairs), chunk_size):
+                chunk = pairs[start:start + chunk_size]
+                self.cursor.executemany(
+                    "UPDATE violations SET duplicate_of = %s WHERE id = %s",
+                    [(duplicate_of, violation_id) for violation_id, duplicate_of in chunk]
+                )
+                self.connection.commit()
+            print(f"✓ Flagged {len(pairs)} duplicate violation(s)")
+            return len(pairs)
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error flagging duplicates: {e}")
+            return 0
+    
+    def get_all_violations(self, include_history: bool = False,
+                           limit: Optional[int] = None) -> List[Tuple]:
+        """Retrieve recent and still-open violation records (or all history)
+        
+        limit caps the newest-first result in SQL, so callers that show a
+        page do not pull every hot row over the wire.
+        """
+        try:
+            if include_history:
+                query = """
+                    SELECT id, plate_number, vehicle_type, violation_type, 
+                           location, fine_amount, date_time, status
+                    FROM violations
+                    UNION ALL
+                    SELECT id, plate_number, vehicle_type, violation_type, 
+                           location, fine_amount, date_time, status
+                    FROM violations_archive
+                    ORDER BY date_time DESC
+                """
+                params = []
+            else:
+                query, params = self._hot_union()
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit)
+            self.cursor.execute(query, params)
             return self.cursor.fetchall()
         except Exception as e:
             print(f"✗ Error fetching violations: {e}")
             return []
     
-    def search_violations(self, search_term: str) -> List[Tuple]:
-        """Search violations by plate number, violation type, or location"""
+    def search_violations(self, search_term: str, include_history: bool = False,
+                          limit: Optional[int] = None) -> List[Tuple]:
+        """Search violations by plate number, violation type, or location
+        
+        Locations also match on their canonical name, so "main st" finds
+        rows recorded as "Main Street". limit caps the result as in
+        get_all_violations.
+        """
         try:
+            return self.find_violations(search_term, include_history, limit)
+        except Exception as e:
+            print(f"✗ Error searching violations: {e}")
+            return []
+    
+    def find_violations(self, search_term: str, include_history: bool = False,
+                        limit: Optional[int] = None) -> List[Tuple]:
+        """search_violations that raises on errors instead of returning []
+        
+        For scripts, where an empty result must not stand in for a failed query.
+        """
+        search_pattern = f'%{search_term}%'
+        # A term that canonicalizes to nothing ("-", "#", blanks) would
+        # match every location as '%%'; LIKE NULL matches none instead
+        canonical = canonicalize_location(search_term)
+        location_pattern = f'%{canonical}%' if canonical else None
+        if include_history:
             query = """
                 SELECT id, plate_number, vehicle_type, violation_type, 
                        location, fine_amount, date_time, status
                 FROM violations
+                WHERE plate_number LIKE %s 
+                   OR violation_type LIKE %s 
+                   OR location LIKE %s
+                   OR location_id IN (SELECT id FROM locations WHERE canonical_name LIKE %s)
+                UNION ALL
+                SELECT id, plate_number, vehicle_type, violation_type, 
+                       location, fine_amount, date_time, status
+                FROM violations_archive
                 WHERE plate_number LIKE %s 
                    OR violation_type LIKE %s 
                    OR location LIKE %s
                 ORDER BY date_time DESC
             """
-            search_pattern = f'%{search_term}%'
-            self.cursor.execute(query, (search_pattern, search_pattern, search_pattern))
+            params = [search_pattern, search_pattern, search_pattern, location_pattern,
+                      search_pattern, search_pattern, search_pattern]
+        else:
+            query, params = self._hot_union(
+                """plate_number LIKE %s 
+                   OR violation_type LIKE %s 
+                   OR location LIKE %s
+                   OR location_id IN (SELECT id FROM locations WHERE canonical_name LIKE %s)""",
+                [search_pattern, search_pattern, search_pattern, location_pattern])
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+    
+    def iter_violations(self, batch_size: int = 1000, include_history: bool = False):
+        """Stream full violation rows in id order, one batch at a time
+        
+        Uses a server-side cursor, so the connection cannot run other
+        queries until the generator is exhausted or closed.
+        """
+        columns = ", ".join(ARCHIVE_COLUMNS)
+        query = f"SELECT {columns} FROM violations"
+        if include_history:
+            query += f" UNION ALL SELECT {columns} FROM violations_archive"
+        query += " ORDER BY id"
+        
+        stream = self.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            stream.execute(query)
+            while True:
+                rows = stream.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            stream.close()
+    
+    def get_violation_summary(self, group_by: str = 'status',
+                              start: Optional[datetime] = None,
+                              end: Optional[datetime] = None,
+                              include_history: bool = False) -> List[Tuple]:
+        """Count violations and total fines per group within a date range"""
+        if group_by not in SUMMARY_COLUMNS:
+            raise ValueError(f"Cannot group by '{group_by}'")
+        try:
+            return self.summarize_violations(group_by, start, end, include_history)
+        except Exception as e:
+            print(f"✗ Error summarizing violations: {e}")
+            return []
+    
+    def summarize_violations(self, group_by: str = 'status',
+                             start: Optional[datetime] = None,
+                             end: Optional[datetime] = None,
+                             include_history: bool = False) -> List[Tuple]:
+        """get_violation_summary that raises on errors instead of returning []
+        
+        For callers that store the result, where an empty summary must not
+        stand in for a failed query. include_history adds archived rows.
+        """
+        if group_by not in SUMMARY_COLUMNS:
+            raise ValueError(f"Cannot group by '{group_by}'")
+        period = (start or self._hot_cutoff(), end or datetime.max.replace(microsecond=0))
+        if group_by == 'location':
+            # Group on the compact canonical ID rather than the raw text
+            query = """
+                SELECT COALESCE(l.canonical_name, '(unmapped)'), COUNT(*), SUM(v.fine_amount)
+                FROM violations v
+                LEFT JOIN locations l ON l.id = v.location_id
+                WHERE v.date_time >= %s AND v.date_time < %s
+                GROUP BY v.location_id, l.canonical_name
+                ORDER BY COUNT(*) DESC
+            """
+            if include_history:
+                # Archived rows keep only the raw text; map it through its alias
+                query = """
+                    SELECT COALESCE(name, '(unmapped)'), COUNT(*), SUM(fine_amount)
+                    FROM (
+                        SELECT l.canonical_name AS name, v.fine_amount
+                        FROM violations v
+                        LEFT JOIN locations l ON l.id = v.location_id
+                        WHERE v.date_time >= %s AND v.date_time < %s
+                        UNION ALL
+                        SELECT l.canonical_name, a.fine_amount
+                        FROM violations_archive a
+                        LEFT JOIN location_aliases la ON la.raw_text = a.location
+                        LEFT JOIN locations l ON l.id = la.location_id
+                        WHERE a.date_time >= %s AND a.date_time < %s
+                    ) combined
+                    GROUP BY name
+                    ORDER BY COUNT(*) DESC
+                """
+        elif include_history:
+            query = f"""
+                SELECT {group_by}, COUNT(*), SUM(fine_amount)
+                FROM (
+                    SELECT {group_by}, fine_amount FROM violations
+                    WHERE date_time >= %s AND date_time < %s
+                    UNION ALL
+                    SELECT {group_by}, fine_amount FROM violations_archive
+                    WHERE date_time >= %s AND date_time < %s
+                ) combined
+                GROUP BY {group_by}
+                ORDER BY COUNT(*) DESC
+            """
+        else:
+            query = f"""
+                SELECT {group_by}, COUNT(*), SUM(fine_amount)
+                FROM violations
+                WHERE date_time >= %s AND date_time < %s
+                GROUP BY {group_by}
+                ORDER BY COUNT(*) DESC
+            """
+        self.cursor.execute(query, period * 2 if include_history else period)
+        return self.cursor.fetchall()
+    
+    def get_period_high_water(self, start: datetime, end: datetime,
+                              include_history: bool = False) -> Tuple:
+        """(row count, last change) for a date range; changes whenever its data does
+        
+        include_history appends the archive's row count and last archiving time.
+        """
+        self.cursor.execute("""
+            SELECT COUNT(*), MAX(updated_at) FROM violations
+            WHERE date_time >= %s AND date_time < %s
+        """, (start, end))
+        high_water = tuple(self.cursor.fetchone())
+        if include_history:
+            self.cursor.execute("""
+                SELECT COUNT(*), MAX(archived_at) FROM violations_archive
+                WHERE date_time >= %s AND date_time < %s
+            """, (start, end))
+            high_water += tuple(self.cursor.fetchone())
+        return high_water
+    
+    def fetch_analytics_rows(self, since_id: int = 0,
+                             since_updated: Optional[datetime] = None) -> List[Tuple]:
+        """Rows added after since_id or changed at/after since_updated
+        
+        Returns (id, vehicle_type, violation_type, status, fine_amount,
+        date_time, updated_at) tuples for the analytics snapshot.
+        """
+        try:
+            query = """
+                SELECT id, vehicle_type, violation_type, status, fine_amount,
+                       date_time, updated_at
+                FROM violations
+                WHERE id > %s
+            """
+            params = [since_id]
+            if since_updated is not None:
+                # Two indexed branches instead of one OR that scans the table
+                query += """
+                UNION
+                SELECT id, vehicle_type, violation_type, status, fine_amount,
+                       date_time, updated_at
+                FROM violations
+                WHERE updated_at >= %s
+                """
+                params.append(since_updated)
+            self.cursor.execute(query, params)
             return self.cursor.fetchall()
         except Exception as e:
-            print(f"✗ Error searching violations: {e}")
+            print(f"✗ Error fetching analytics rows: {e}")
+            return []
+    
+    def _record_tombstones(self, violation_ids: List[int]):
+        """Note removed IDs for the change feed (the caller commits)"""
+        if violation_ids:
+            self.cursor.executemany("""
+                INSERT INTO violation_tombstones (violation_id) VALUES (%s)
+                ON DUPLICATE KEY UPDATE deleted_at = CURRENT_TIMESTAMP
+            """, [(violation_id,) for violation_id in violation_ids])
+    
+    def get_changes_since(self, high_water: Optional[datetime] = None,
+                          overlap_seconds: int = 0) -> Tuple[List[Tuple], List[int], datetime]:
+        """Change feed: (changed rows, deleted IDs, new high-water mark)
+        
+        Rows use the get_all_violations columns. With no high-water mark only
+        the mark is returned. overlap_seconds re-reads a short window before
+        the mark, so rows committed late by slow transactions are not missed;
+        merging a row twice is harmless. Changed rows are returned whatever
+        their age, so an old open ticket that gets paid is updated in place.
+        """
+        try:
+            self.cursor.execute("SELECT NOW()")
+            now = self.cursor.fetchone()[0]
+            if high_water is None:
+                return [], [], now
+            
+            since = high_water - timedelta(seconds=overlap_seconds)
+            self.cursor.execute("""
+                SELECT id, plate_number, vehicle_type, violation_type, 
+                       location, fine_amount, date_time, status
+                FROM violations
+                WHERE updated_at >= %s
+                ORDER BY updated_at
+            """, (since,))
+            rows = self.cursor.fetchall()
+            deleted = self.get_deleted_ids_since(since)
+            # Autocommit is off: end the read so the next poll sees new commits
+            self.connection.commit()
+            return rows, deleted, now
+        except Exception as e:
+            print(f"✗ Error reading change feed: {e}")
+            return [], [], high_water
+    
+    def get_deleted_ids_since(self, since: datetime) -> List[int]:
+        """IDs deleted or archived at or after a point in time"""
+        self.cursor.execute(
+            "SELECT violation_id FROM violation_tombstones WHERE deleted_at >= %s",
+            (since,)
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def purge_tombstones(self, older_than_days: int = 7) -> int:
+        """Drop tombstones every client has long since applied"""
+        try:
+            self.cursor.execute(
+                "DELETE FROM violation_tombstones WHERE deleted_at < %s",
+                (datetime.now() - timedelta(days=older_than_days),)
+            )
+            self.connection.commit()
+            return self.cursor.rowcount
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error purging tombstones: {e}")
+            return 0
+    
+    def get_plate_history(self, plate_number: str, include_history: bool = True) -> List[Tuple]:
+        """Retrieve every violation recorded against a plate, newest first"""
+        try:
+            query = """
+                SELECT id, plate_number, vehicle_type, violation_type, 
+                       location, fine_amount, date_time, status
+                FROM violations
+                WHERE plate_number = %s
+            """
+            params = [plate_number.upper()]
+            if include_history:
+                query += """
+                UNION ALL
+                SELECT id, plate_number, vehicle_type, violation_type, 
+                       location, fine_amount, date_time, status
+                FROM violations_archive
+                WHERE plate_number = %s
+                """
+                params.append(plate_number.upper())
+            query += " ORDER BY date_time DESC"
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"✗ Error fetching plate history: {e}")
+            return []
+    
+    def get_violations_for_plates(self, plate_numbers: List[str],
+                                  include_history: bool = True) -> List[Tuple]:
+        """Violations recorded against any of several plates, newest first"""
+        try:
+            return self.find_violations_for_plates(plate_numbers, include_history)
+        except Exception as e:
+            print(f"✗ Error fetching plate history: {e}")
+            return []
+    
+    def find_violations_for_plates(self, plate_numbers: List[str],
+                                   include_history: bool = True) -> List[Tuple]:
+        """get_violations_for_plates that raises on errors instead of returning []"""
+        if not plate_numbers:
+            return []
+        plates = [plate.upper() for plate in plate_numbers]
+        plate_marks = ", ".join(["%s"] * len(plates))
+        query = f"""
+            SELECT id, plate_number, vehicle_type, violation_type, 
+                   location, fine_amount, date_time, status
+            FROM violations
+            WHERE plate_number IN ({plate_marks})
+        """
+        params = list(plates)
+        if include_history:
+            query += f"""
+            UNION ALL
+            SELECT id, plate_number, vehicle_type, violation_type, 
+                   location, fine_amount, date_time, status
+            FROM violations_archive
+            WHERE plate_number IN ({plate_marks})
+            """
+            params += plates
+        query += " ORDER BY date_time DESC"
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+    
+    def get_violations_by_ids(self, violation_ids: List[int]) -> List[Tuple]:
+        """List rows for the given IDs; IDs no longer present are simply missing
+        
+        Errors are raised, so callers can tell "deleted" from "unreachable".
+        """
+        if not violation_ids:
+            return []
+        id_marks = ", ".join(["%s"] * len(violation_ids))
+        self.cursor.execute(f"""
+            SELECT id, plate_number, vehicle_type, violation_type, 
+                   location, fine_amount, date_time, status
+            FROM violations
+            WHERE id IN ({id_marks})
+        """, list(violation_ids))
+        rows = self.cursor.fetchall()
+        self.connection.commit()
+        return rows
+    
+    def get_distinct_plates(self) -> Tuple[List[str], int, Optional[datetime]]:
+        """Every plate in violations and the archive, with the high-water marks
+        for fetch_plate_changes (read first, so nothing falls in between)
+        """
+        try:
+            self.cursor.execute("SELECT COALESCE(MAX(id), 0), MAX(updated_at) FROM violations")
+            max_id, max_updated = self.cursor.fetchone()
+            self.cursor.execute("""
+                SELECT plate_number FROM violations
+                UNION
+                SELECT plate_number FROM violations_archive
+            """)
+            return [row[0] for row in self.cursor.fetchall()], max_id, max_updated
+        except Exception as e:
+            print(f"✗ Error fetching plates: {e}")
+            return [], 0, None
+    
+    def fetch_plate_changes(self, since_id: int,
+                            since_updated: Optional[datetime] = None) -> List[Tuple]:
+        """(id, plate_number, updated_at) of rows added after since_id or changed since since_updated"""
+        try:
+            query = "SELECT id, plate_number, updated_at FROM violations WHERE id > %s"
+            params = [since_id]
+            if since_updated is not None:
+                query += """
+                UNION
+                SELECT id, plate_number, updated_at FROM violations WHERE updated_at >= %s
+                """
+                params.append(since_updated)
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+        except Exception as e:
+            print(f"✗ Error fetching plate changes: {e}")
             return []
     
     def update_violation(self, violation_id: int, plate_number: str, 
@@ -175,20 +1341,32 @@ class ViolationDatabase:
             query = """
                 UPDATE violations 
                 SET plate_number = %s, vehicle_type = %s, violation_type = %s,
-                    location = %s, fine_amount = %s, officer_name = %s,
-                    status = %s, notes = %s
+                    location = %s, location_id = %s, fine_amount = %s,
+                    officer_name = %s, officer_id = %s, status = %s, notes = %s,
+                    version = version + 1
                 WHERE id = %s
             """
             
             values = (
                 plate_number.upper(), vehicle_type, violation_type, location,
-                fine_amount, officer_name, status, notes, violation_id
+                self.resolve_location_id(location), fine_amount, officer_name,
+                self.get_officer_id(officer_name), status, notes, violation_id
             )
             
+            before = self._snapshot_violations([violation_id]).get(violation_id)
             self.cursor.execute(query, values)
+            updated = self.cursor.rowcount
+            if updated:
+                self._sync_notes(violation_id, notes)
             self.connection.commit()
             
-            if self.cursor.rowcount > 0:
+            if updated > 0:
+                if before:
+                    self._audit('update', violation_id, before, dict(
+                        before, plate_number=plate_number.upper(), vehicle_type=vehicle_type,
+                        violation_type=violation_type, location=location, fine_amount=fine_amount,
+                        officer_name=officer_name, status=status, notes=notes
+                    ))
                 print(f"✓ Violation {violation_id} updated successfully")
                 return True
             else:
@@ -196,17 +1374,101 @@ class ViolationDatabase:
                 return False
                 
         except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error updating violation: {e}")
+            return False
+    
+    def get_violation(self, violation_id: int) -> Optional[Violation]:
+        """Get a single violation with every column, including its version"""
+        try:
+            query = """
+                SELECT id, plate_number, vehicle_type, violation_type, location,
+                       fine_amount, date_time, officer_name, status, notes,
+                       created_at, version, updated_at
+                FROM violations
+                WHERE id = %s
+            """
+            self.cursor.execute(query, (violation_id,))
+            result = self.cursor.fetchone()
+            
+            if result:
+                columns = [column[0] for column in self.cursor.description]
+                return Violation.from_row(result, columns)
+            return None
+        except Exception as e:
+            print(f"✗ Error fetching violation: {e}")
+            return None
+    
+    def patch_violation(self, violation_id: int, changes: Dict,
+                        expected_version: Optional[int] = None) -> bool:
+        """Update only the changed columns of a violation
+        
+        When expected_version is given the row is only written if nobody else
+        has saved it since it was read; otherwise StaleRecordError is raised.
+        """
+        changes = {column: value for column, value in changes.items()
+                   if column in PATCHABLE_COLUMNS}
+        if not changes:
+            print(f"✓ Violation {violation_id} unchanged, nothing to save")
+            return True
+        
+        if 'plate_number' in changes:
+            changes['plate_number'] = changes['plate_number'].upper()
+        
+        try:
+            if 'location' in changes:
+                changes['location_id'] = self.resolve_location_id(changes['location'])
+            if 'officer_name' in changes:
+                changes['officer_id'] = self.get_officer_id(changes['officer_name'])
+            
+            assignments = ", ".join(f"{column} = %s" for column in changes)
+            query = f"UPDATE violations SET {assignments}, version = version + 1 WHERE id = %s"
+            values = [*changes.values(), violation_id]
+            if expected_version is not None:
+                query += " AND version = %s"
+                values.append(expected_version)
+            
+            before = self._snapshot_violations([violation_id]).get(violation_id)
+            self.cursor.execute(query, values)
+            updated = self.cursor.rowcount
+            if updated and 'notes' in changes:
+                self._sync_notes(violation_id, changes['notes'])
+            self.connection.commit()
+            
+            if updated > 0:
+                if before:
+                    after = dict(before)
+                    after.update((column, value) for column, value in changes.items() if column in after)
+                    self._audit('update', violation_id, before, after)
+                print(f"✓ Violation {violation_id} updated ({', '.join(changes)})")
+                return True
+        except Exception as e:
+            self.connection.rollback()
             print(f"✗ Error updating violation: {e}")
             return False
+        
+        if expected_version is not None and self.get_violation(violation_id):
+            raise StaleRecordError(
+                f"Violation {violation_id} was modified by another user. Reload and try again."
+            )
+        print(f"✗ No violation found with ID: {violation_id}")
+        return False
     
     def delete_violation(self, violation_id: int) -> bool:
         """Delete a violation record"""
         try:
+            before = self._snapshot_violations([violation_id]).get(violation_id)
             query = 'DELETE FROM violations WHERE id = %s'
             self.cursor.execute(query, (violation_id,))
+            deleted = self.cursor.rowcount
+            if deleted:
+                self._record_tombstones([violation_id])
+                self._drop_notes([violation_id])
             self.connection.commit()
             
-            if self.cursor.rowcount > 0:
+            if deleted > 0:
+                if before:
+                    self._audit('delete', violation_id, before, None)
                 print(f"✓ Violation {violation_id} deleted successfully")
                 return True
             else:
@@ -214,9 +1476,208 @@ class ViolationDatabase:
                 return False
                 
         except Exception as e:
+            self.connection.rollback()
             print(f"✗ Error deleting violation: {e}")
             return False
     
+    def update_status_bulk(self, violation_ids: List[int], status: str,
+                           chunk_size: int = 500) -> int:
+        """Set the status of many violations, one transaction per chunk"""
+        updated = 0
+        try:
+            for start in range(0, len(violation_ids), chunk_size):
+                chunk = violation_ids[start:start + chunk_size]
+                id_marks = ", ".join(["%s"] * len(chunk))
+                before = self._snapshot_violations(chunk)
+                self.cursor.execute(
+                    f"UPDATE violations SET status = %s, version = version + 1 WHERE id IN ({id_marks})",
+                    (status, *chunk)
+                )
+                updated += self.cursor.rowcount
+                self.connection.commit()
+                for violation_id, image in before.items():
+                    self._audit('update', violation_id, image, dict(image, status=status))
+            
+            print(f"✓ {updated} violation(s) set to {status}")
+            return updated
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error updating violations: {e}")
+            return updated
+    
+    def delete_violations_bulk(self, violation_ids: List[int], chunk_size: int = 500) -> int:
+        """Delete many violations, one transaction per chunk"""
+        deleted = 0
+        try:
+            for start in range(0, len(violation_ids), chunk_size):
+                chunk = violation_ids[start:start + chunk_size]
+                id_marks = ", ".join(["%s"] * len(chunk))
+                before = self._snapshot_violations(chunk)
+                self.cursor.execute(f"DELETE FROM violations WHERE id IN ({id_marks})", chunk)
+                deleted += self.cursor.rowcount
+                self._record_tombstones(chunk)
+                self._drop_notes(chunk)
+                self.connection.commit()
+                for violation_id, image in before.items():
+                    self._audit('delete', violation_id, image, None)
+            
+            print(f"✓ {deleted} violation(s) deleted")
+            return deleted
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error deleting violations: {e}")
+            return deleted
+    
+    def is_partitioned(self) -> bool:
+        """Check whether the violations table is already partitioned"""
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'violations'
+              AND PARTITION_NAME IS NOT NULL
+        """)
+        return self.cursor.fetchone()[0] > 0
+    
+    def partition_violations_by_month(self) -> bool:
+        """Convert violations to monthly RANGE partitions on date_time"""
+        try:
+            if self.is_partitioned():
+                print("✓ Table 'violations' is already partitioned")
+                return True
+            
+            self.cursor.execute("SELECT MIN(date_time) FROM violations")
+            oldest = self.cursor.fetchone()[0] or datetime.now()
+            first = month_start(oldest)
+            last = month_start(datetime.now(), ARCHIVE_CONFIG['future_partitions'])
+            
+            partitions = []
+            current = first
+            while current <= last:
+                upper = month_start(current, 1)
+                partitions.append(
+                    f"PARTITION p{current:%Y%m} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))"
+                )
+                current = upper
+            partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+            
+            # Partitioned tables cannot have foreign keys; officer_id stays indexed
+            if self._has_officer_foreign_key():
+                self.cursor.execute("ALTER TABLE violations DROP FOREIGN KEY fk_violations_officer")
+            
+            # The partitioning column must be part of every unique key
+            self.cursor.execute("""
+                ALTER TABLE violations
+                DROP PRIMARY KEY, ADD PRIMARY KEY (id, date_time)
+            """)
+            self.cursor.execute(
+                "ALTER TABLE violations PARTITION BY RANGE (TO_DAYS(date_time)) (\n    "
+                + ",\n    ".join(partitions) + "\n)"
+            )
+            self.connection.commit()
+            print(f"✓ Table 'violations' partitioned into {len(partitions)} partitions")
+            return True
+        except Exception as e:
+            print(f"✗ Error partitioning violations: {e}")
+            return False
+    
+    def ensure_future_partitions(self) -> int:
+        """Split the catch-all partition so upcoming months get their own"""
+        try:
+            if not self.is_partitioned():
+                return 0
+            
+            self.cursor.execute("""
+                SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'violations'
+            """)
+            existing = {row[0] for row in self.cursor.fetchall()}
+            
+            added = 0
+            for offset in range(ARCHIVE_CONFIG['future_partitions'] + 1):
+                current = month_start(datetime.now(), offset)
+                name = f"p{current:%Y%m}"
+                if name in existing:
+                    continue
+                upper = month_start(current, 1)
+                self.cursor.execute(f"""
+                    ALTER TABLE violations REORGANIZE PARTITION pmax INTO (
+                        PARTITION {name} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}')),
+                        PARTITION pmax VALUES LESS THAN MAXVALUE
+                    )
+                """)
+                added += 1
+            
+            self.connection.commit()
+            if added:
+                print(f"✓ Added {added} monthly partition(s)")
+            return added
+        except Exception as e:
+            print(f"✗ Error adding partitions: {e}")
+            return 0
+    
+    def archive_closed_violations(self, older_than_days: Optional[int] = None,
+                                  archive_file: Optional[str] = None) -> int:
+        """Move closed violations older than the cutoff to the archive table or a gzip CSV"""
+        days = older_than_days if older_than_days is not None else ARCHIVE_CONFIG['archive_after_days']
+        cutoff = datetime.now() - timedelta(days=days)
+        statuses = ARCHIVE_CONFIG['closed_statuses']
+        batch_size = ARCHIVE_CONFIG['batch_size']
+        
+        columns = ", ".join(ARCHIVE_COLUMNS)
+        status_marks = ", ".join(["%s"] * len(statuses))
+        select_query = f"""
+            SELECT {columns} FROM violations
+            WHERE date_time < %s AND status IN ({status_marks}) AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        insert_query = f"""
+            INSERT INTO violations_archive ({columns})
+            VALUES ({", ".join(["%s"] * len(ARCHIVE_COLUMNS))})
+        """
+        
+        archived = 0
+        last_id = 0
+        # tell() on an appended gzip stream is 0 every run; check the file itself
+        write_header = bool(archive_file) and not (
+            os.path.exists(archive_file) and os.path.getsize(archive_file) > 0)
+        writer_file = gzip.open(archive_file, 'at', newline='', encoding='utf-8') if archive_file else None
+        try:
+            writer = csv.writer(writer_file) if writer_file else None
+            if write_header:
+                writer.writerow(ARCHIVE_COLUMNS)
+            
+            while True:
+                self.cursor.execute(select_query, (cutoff, *statuses, last_id, batch_size))
+                rows = self.cursor.fetchall()
+                if not rows:
+                    break
+                
+                ids = [row[0] for row in rows]
+                if writer:
+                    writer.writerows(rows)
+                    writer_file.flush()
+                else:
+                    self.cursor.executemany(insert_query, rows)
+                
+                id_marks = ", ".join(["%s"] * len(ids))
+                self.cursor.execute(f"DELETE FROM violations WHERE id IN ({id_marks})", ids)
+                self._record_tombstones(ids)
+                self._drop_notes(ids)
+                self.connection.commit()
+                
+                archived += len(rows)
+                last_id = ids[-1]
+            
+            print(f"✓ Archived {archived} closed violation(s) older than {cutoff:%Y-%m-%d}")
+            return archived
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error archiving violations: {e}")
+            raise
+        finally:
+            if writer_file:
+                writer_file.close()
+    
     def create_user(self, username: str, email: str, password: str, role: str = 'officer') -> int:
         """Create a new user account"""
         try:
@@ -231,6 +1692,61 @@ class ViolationDatabase:
             print(f"✗ Error creating user: {e}")
             raise
     
+    def list_users(self) -> List[Tuple]:
+        """(id, username, email, role, created_at) for every account"""
+        try:
+            return self.fetch_users()
+        except Exception as e:
+            print(f"✗ Error listing users: {e}")
+            return []
+    
+    def fetch_users(self) -> List[Tuple]:
+        """list_users that raises on errors instead of returning []"""
+        self.cursor.execute("SELECT id, username, email, role, created_at FROM users ORDER BY username")
+        return self.cursor.fetchall()
+    
+    def update_user_password(self, username: str, password: str) -> bool:
+        """Replace a user's stored (already hashed) password"""
+        try:
+            self.cursor.execute("UPDATE users SET password = %s WHERE username = %s", (password, username))
+            self.connection.commit()
+            return self.cursor.rowcount > 0
+        except Exception as e:
+            print(f"✗ Error updating password: {e}")
+            return False
+    
+    def add_plate_regions(self, pairs: List[Tuple[str, str]]):
+        """Record (plate_number, region) pairs in the shard directory"""
+        if not pairs:
+            return
+        try:
+            self.cursor.executemany(
+                "INSERT IGNORE INTO plate_regions (plate_number, region) VALUES (%s, %s)",
+                sorted({(plate.upper(), region) for plate, region in pairs})
+            )
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            print(f"✗ Error updating plate directory: {e}")
+            raise
+    
+    def get_plate_regions(self, plate_numbers: List[str]) -> Dict[str, List[str]]:
+        """Regions holding violations for each plate, from the shard directory"""
+        if not plate_numbers:
+            return {}
+        plates = sorted({plate.upper() for plate in plate_numbers})
+        plate_marks = ", ".join(["%s"] * len(plates))
+        self.cursor.execute(
+            f"SELECT plate_number, region FROM plate_regions WHERE plate_number IN ({plate_marks})",
+            plates
+        )
+        regions: Dict[str, List[str]] = {}
+        for plate, region in self.cursor.fetchall():
+            regions.setdefault(plate, []).append(region)
+        # End the read so later lookups see other writers' entries
+        self.connection.commit()
+        return regions
+    
     def get_user_by_username(self, username: str) -> Optional[dict]:
         """Get user by username"""
         try:
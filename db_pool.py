@@ -0,0 +1,96 @@
+"""
+db_pool.py - Connection pool for ViolationDatabase
+Vehicle Violation Management System
+
+pymysql connections are not thread-safe, so concurrent callers each borrow
+a whole ViolationDatabase (connection + cursor) from the pool.
+"""
+import queue
+import threading
+import pymysql
+from contextlib import contextmanager
+from typing import Callable, Optional
+from database import ViolationDatabase
+
+
+class ConnectionPool:
+    def __init__(self, size: int = 4, factory: Callable = ViolationDatabase):
+        """Open `size` database handles up front"""
+        self.size = size
+        self.factory = factory
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            db = factory()
+            self._all.append(db)
+            self._idle.put(db)
+        print(f"✓ Connection pool ready ({size} connection(s))")
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take a database handle, blocking until one is free"""
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No database connection available")
+
+    def release(self, db, error: Optional[Exception] = None):
+        """Return a handle; a dropped server connection poisons it, so replace it
+
+        Any open transaction is rolled back first. Autocommit is off and
+        InnoDB reads are REPEATABLE READ, so otherwise the next borrower
+        would keep reading the snapshot an earlier request started.
+        """
+        if error is None or not is_connection_error(error):
+            connection = getattr(db, 'connection', None)
+            try:
+                if connection is not None:
+                    connection.rollback()
+            except Exception as e:
+                error = e
+        if error is not None and is_connection_error(error):
+            db = self._replace(db)
+        self._idle.put(db)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a database handle for the duration of a with-block"""
+        db = self.acquire(timeout)
+        error = None
+        try:
+            yield db
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(db, error)
+
+    def _replace(self, broken):
+        """Swap a broken handle for a fresh one"""
+        try:
+            broken.close()
+        except Exception:
+            pass
+        try:
+            fresh = self.factory()
+        except Exception as e:
+            print(f"✗ Could not reopen pooled connection: {e}")
+            return broken
+        with self._lock:
+            self._all[self._all.index(broken)] = fresh
+        return fresh
+
+    def close_all(self):
+        """Close every handle owned by the pool"""
+        with self._lock:
+            for db in self._all:
+                try:
+                    db.close()
+                except Exception:
+                    pass
+            self._all = []
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Check whether an error means the server connection is gone"""
+    return isinstance(error, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
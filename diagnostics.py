@@ -0,0 +1,302 @@
+"""
+diagnostics.py - UI thread latency monitor and on-demand profilers
+Vehicle Violation Management System
+
+Times every Tk callback (commands, bindings, after() timers) and logs the
+ones that keep the event loop from running for longer than the frame
+budget, named after the handler responsible. A heartbeat timer catches
+stalls that happen outside Python callbacks, such as long redraws.
+Time a callback spends in a nested event loop, for example while a
+messagebox waits for the user, does not count as blocking.
+
+Tk binds each command to CallWrapper.__call__ when the command is created,
+so the timing hook is installed when this module is imported, before the
+main window is built, and passes calls straight through while monitoring
+is off.
+
+The hidden menu (Ctrl+Shift+D) switches monitoring on and off, starts and
+stops cProfile or a sampling profiler, and writes reports to
+DIAGNOSTICS_CONFIG['output_dir'].
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tkinter as tk
+from collections import Counter, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from config import DIAGNOSTICS_CONFIG
+
+_original_call = tk.CallWrapper.__call__
+# The UIDiagnostics currently timing callbacks, if any
+_active: Optional['UIDiagnostics'] = None
+
+
+def _dispatch_call(wrapper, *args):
+    diagnostics = _active
+    if diagnostics is None:
+        return _original_call(wrapper, *args)
+    return diagnostics._timed(_original_call, wrapper, args)
+
+
+tk.CallWrapper.__call__ = _dispatch_call
+
+
+def describe_callback(func) -> str:
+    """module.qualname of a callback, looking through after()'s wrapper"""
+    closure = getattr(func, '__closure__', None)
+    if getattr(func, '__qualname__', '').endswith('after.<locals>.callit') and closure:
+        for cell in closure:
+            inner = cell.cell_contents
+            if callable(inner) and inner is not func:
+                return describe_callback(inner)
+    module = getattr(func, '__module__', None) or ''
+    name = getattr(func, '__qualname__', None) or repr(func)
+    # Classes defined inside functions get long qualnames; keep the innermost part
+    name = name.rsplit('<locals>.', 1)[-1]
+    return f"{module}.{name}" if module and module != '__main__' else name
+
+
+class HandlerStats:
+    __slots__ = ('calls', 'total', 'longest', 'blocked_max', 'stalls')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.blocked_max = 0.0
+        self.stalls = 0
+
+
+class SamplingProfiler:
+    """Samples the UI thread's stack on a timer; cheap enough to leave on while reproducing"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, name='ui-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self):
+        while self._running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def write(self, path: str):
+        """Collapsed stacks ("a;b;c count"), the input format of flame graph tools"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class UIDiagnostics:
+    def __init__(self, root: tk.Misc, notify: Optional[Callable[[str], None]] = None):
+        self.root = root
+        self.notify = notify or print
+        self.budget = DIAGNOSTICS_CONFIG['frame_budget_ms'] / 1000
+        self.heartbeat = DIAGNOSTICS_CONFIG['heartbeat_ms'] / 1000
+        self.output_dir = DIAGNOSTICS_CONFIG['output_dir']
+        self.enabled = False
+        self.stats: Dict[str, HandlerStats] = {}
+        self.stalls = deque(maxlen=1000)
+        self._stack: List[list] = []
+        self._last_activity = 0.0
+        self._slowest_since_tick = None
+        self._expected_tick = 0.0
+        self._heartbeat_id = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[SamplingProfiler] = None
+        self._menu: Optional[tk.Menu] = None
+
+    # --- Monitoring -------------------------------------------------------
+
+    def enable(self):
+        """Start timing callbacks and watching for stalls"""
+        global _active
+        if self.enabled:
+            return
+        self.enabled = True
+        _active = self
+        self._last_activity = time.perf_counter()
+        self._schedule_heartbeat()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.notify(f"Diagnostics on: stalls over {self.budget * 1000:.0f} ms are logged")
+
+    def disable(self):
+        global _active
+        if not self.enabled:
+            return
+        self.enabled = False
+        if _active is self:
+            _active = None
+        if self._heartbeat_id is not None:
+            self.root.after_cancel(self._heartbeat_id)
+            self._heartbeat_id = None
+        self.notify("Diagnostics off")
+
+    def _timed(self, original, wrapper, args):
+        now = time.perf_counter()
+        if self._stack:
+            # A callback running inside another means the outer one yielded to the event loop
+            outer = self._stack[-1]
+            outer[2] = max(outer[2], now - self._last_activity)
+        frame = [wrapper.func, now, 0.0]
+        self._stack.append(frame)
+        self._last_activity = now
+        try:
+            return original(wrapper, *args)
+        finally:
+            end = time.perf_counter()
+            frame[2] = max(frame[2], end - self._last_activity)
+            self._stack.pop()
+            self._last_activity = end
+            self._account(frame[0], end - frame[1], frame[2])
+
+    def _account(self, func, duration: float, blocked: float):
+        name = describe_callback(func)
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = HandlerStats()
+        stats.calls += 1
+        stats.total += duration
+        stats.longest = max(stats.longest, duration)
+        stats.blocked_max = max(stats.blocked_max, blocked)
+        if blocked > self.budget:
+            stats.stalls += 1
+            self._record_stall(name, blocked, duration)
+            if self._slowest_since_tick is None or blocked > self._slowest_since_tick[1]:
+                self._slowest_since_tick = (name, blocked)
+
+    def _record_stall(self, name: str, blocked: float, duration: float):
+        stall = (datetime.now(), name, blocked, duration)
+        self.stalls.append(stall)
+        with open(os.path.join(self.output_dir, 'stalls.log'), 'a', encoding='utf-8') as f:
+            f.write(f"{stall[0]:%Y-%m-%d %H:%M:%S.%f}  blocked {blocked * 1000:8.1f} ms  "
+                    f"(ran {duration * 1000:8.1f} ms)  {name}\n")
+
+    def _schedule_heartbeat(self):
+        self._expected_tick = time.perf_counter() + self.heartbeat
+        self._heartbeat_id = self.root.after(int(self.heartbeat * 1000), self._tick)
+
+    def _tick(self):
+        if not self.enabled:
+            return
+        late = time.perf_counter() - self._expected_tick
+        # Late ticks not explained by a slow callback were lost outside Python (redraw, layout)
+        if late > self.budget and self._slowest_since_tick is None:
+            self._record_stall("(outside Python callbacks: redraw/layout)", late, late)
+        self._slowest_since_tick = None
+        self._schedule_heartbeat()
+
+    def report(self) -> str:
+        """Per-handler timings, worst blockers first"""
+        lines = [f"UI diagnostics report {datetime.now():%Y-%m-%d %H:%M:%S}",
+                 f"Frame budget {self.budget * 1000:.0f} ms, {len(self.stalls)} stall(s)", "",
+                 f"{'calls':>7} {'total ms':>10} {'max ms':>9} {'blocked ms':>11} {'stalls':>7}  handler"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].blocked_max):
+            lines.append(f"{stats.calls:>7} {stats.total * 1000:>10.1f} {stats.longest * 1000:>9.1f} "
+                         f"{stats.blocked_max * 1000:>11.1f} {stats.stalls:>7}  {name}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> str:
+        path = self._output_path('ui_report', 'txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        self.notify(f"Diagnostics report saved to {path}")
+        return path
+
+    # --- Profilers --------------------------------------------------------
+
+    def _output_path(self, prefix: str, extension: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{prefix}_{datetime.now():%Y%m%d_%H%M%S}.{extension}")
+
+    def start_cprofile(self):
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+            self.notify("cProfile running")
+
+    def stop_cprofile(self) -> Optional[str]:
+        """Stop cProfile and save raw stats plus a cumulative-time summary"""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        path = self._output_path('cprofile', 'prof')
+        self._profile.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(self._profile, stream=summary).sort_stats('cumulative').print_stats(40)
+        with open(path[:-len('.prof')] + '.txt', 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+        self._profile = None
+        self.notify(f"cProfile saved to {path}")
+        return path
+
+    def start_sampler(self):
+        if self._sampler is None:
+            self._sampler = SamplingProfiler(threading.get_ident(),
+                                             DIAGNOSTICS_CONFIG['sample_interval_ms'] / 1000)
+            self._sampler.start()
+            self.notify("Sampling profiler running")
+
+    def stop_sampler(self) -> Optional[str]:
+        if self._sampler is None:
+            return None
+        self._sampler.stop()
+        path = self._output_path('samples', 'folded')
+        self._sampler.write(path)
+        self._sampler = None
+        self.notify(f"Samples saved to {path}")
+        return path
+
+    # --- Hidden menu ------------------------------------------------------
+
+    def bind_menu(self, sequence: str = '<Control-Shift-D>'):
+        """Pop up the diagnostics menu on a key chord"""
+        self.root.bind_all(sequence, self.show_menu)
+
+    def show_menu(self, event=None):
+        menu = tk.Menu(self.root, tearoff=0)
+        if self.enabled:
+            menu.add_command(label="Stop latency monitor", command=self.disable)
+        else:
+            menu.add_command(label="Start latency monitor", command=self.enable)
+        menu.add_command(label="Save latency report", command=self.write_report)
+        menu.add_separator()
+        if self._profile is None:
+            menu.add_command(label="Start cProfile", command=self.start_cprofile)
+        else:
+            menu.add_command(label="Stop cProfile and save", command=self.stop_cprofile)
+        if self._sampler is None:
+            menu.add_command(label="Start sampling profiler", command=self.start_sampler)
+        else:
+            menu.add_command(label="Stop sampling profiler and save", command=self.stop_sampler)
+        self._menu = menu
+        x = event.x_root if event is not None else self.root.winfo_pointerx()
+        y = event.y_root if event is not None else self.root.winfo_pointery()
+        try:
+            menu.tk_popup(x, y)
+        finally:
+            menu.grab_release()
@@ -0,0 +1,39 @@
+"""
+duplicates.py - One-shot duplicate ticket scan
+Vehicle Violation Management System
+
+    python duplicates.py                # report duplicates
+    python duplicates.py --flag         # also set duplicate_of on them
+"""
+import argparse
+import sys
+from config import DUPLICATE_CONFIG
+from database import ViolationDatabase
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find duplicate violations in a single sorted pass")
+    parser.add_argument("--window", type=int, default=DUPLICATE_CONFIG['window_minutes'],
+                        help="minutes within which matching tickets count as duplicates")
+    parser.add_argument("--flag", action="store_true", help="mark the duplicates found")
+    args = parser.parse_args(argv)
+
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        pairs = db.scan_duplicates(args.window)
+        for violation_id, duplicate_of in pairs:
+            print(f"  ID {violation_id} duplicates ID {duplicate_of}")
+        if args.flag:
+            db.flag_duplicates(pairs)
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+fines.py - Effective-dated fine schedule
+Vehicle Violation Management System
+
+The fine_schedule table records each fine with the date range it applies
+to, so back-dated records get the fine that was in force at the time.
+FineSchedule indexes those periods in memory for bisect lookups by
+(violation_type, date); FineScheduleCache reloads it after edits.
+
+    cache = FineScheduleCache(db)
+    cache.fine_for("Speeding", datetime(2023, 5, 1))
+    cache.set_fine("Speeding", 1500.00, date(2025, 1, 1))
+"""
+import bisect
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import FINE_CONFIG, get_default_fine
+
+
+class FineSchedule:
+    """Per-type interval index over (amount, effective_from, effective_to) periods"""
+
+    def __init__(self, entries: Iterable[Tuple] = ()):
+        self.entries = [tuple(entry) for entry in entries]
+        self._starts: Dict[str, List[date]] = {}
+        self._periods: Dict[str, List[Tuple[float, Optional[date]]]] = {}
+        for violation_type, amount, effective_from, effective_to in sorted(self.entries, key=lambda e: (e[0], e[2])):
+            self._starts.setdefault(violation_type, []).append(effective_from)
+            self._periods.setdefault(violation_type, []).append((float(amount), effective_to))
+
+    def lookup(self, violation_type: str, when: date) -> Optional[float]:
+        """Fine in force on a date, or None if no period covers it"""
+        starts = self._starts.get(violation_type)
+        if not starts:
+            return None
+        index = bisect.bisect_right(starts, when) - 1
+        if index < 0:
+            return None
+        amount, effective_to = self._periods[violation_type][index]
+        if effective_to is not None and when >= effective_to:
+            return None
+        return amount
+
+    def fine_for(self, violation_type: str, when=None) -> float:
+        """Scheduled fine for a violation on a date (default today), else the config default"""
+        if when is None:
+            when = date.today()
+        elif isinstance(when, datetime):
+            when = when.date()
+        amount = self.lookup(violation_type, when)
+        return get_default_fine(violation_type) if amount is None else amount
+
+
+class FineScheduleCache:
+    """Keeps a FineSchedule loaded, reloading when the table changes"""
+
+    def __init__(self, db, check_interval: Optional[float] = None):
+        self.db = db
+        self.check_interval = FINE_CONFIG['check_interval'] if check_interval is None else check_interval
+        self._schedule: Optional[FineSchedule] = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._schedule = None
+
+    def schedule(self, db=None) -> FineSchedule:
+        """Current schedule; checks for edits by other clients at most every check_interval
+
+        db overrides the handle used for the check, for callers that borrow
+        a pooled connection per call.
+        """
+        db = db or self.db
+        now = time.monotonic()
+        if self._schedule is not None and now - self._checked_at < self.check_interval:
+            return self._schedule
+
+        self._checked_at = now
+        try:
+            version = db.get_fine_schedule_version()
+        except Exception as e:
+            print(f"⚠ Could not check fine schedule: {e}")
+            return self._schedule or FineSchedule()
+
+        if self._schedule is None or version != self._version:
+            self._schedule = FineSchedule(db.get_fine_schedule())
+            self._version = version
+        return self._schedule
+
+    def fine_for(self, violation_type: str, when=None) -> float:
+        return self.schedule().fine_for(violation_type, when)
+
+    def set_fine(self, violation_type: str, amount: float, effective_from: date) -> bool:
+        """Edit the schedule and drop the cached copy"""
+        saved = self.db.set_fine(violation_type, amount, effective_from)
+        self.invalidate()
+        return saved
@@ -0,0 +1,132 @@
+"""
+gazetteer.py - Location normalization and autocomplete
+Vehicle Violation Management System
+
+Free-text locations ("Main St", "main st.", "Main Street") are reduced to
+one canonical name, stored once in the `locations` table and referenced
+from violations by a compact location_id.
+
+    python gazetteer.py --backfill   # assign location_id to existing rows
+"""
+import argparse
+import bisect
+import heapq
+import re
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+# Street-type abbreviations expanded during canonicalization
+ABBREVIATIONS = {
+    'st': 'street', 'str': 'street',
+    'ave': 'avenue', 'av': 'avenue',
+    'rd': 'road',
+    'blvd': 'boulevard',
+    'hwy': 'highway',
+    'dr': 'drive',
+    'ln': 'lane',
+    'ct': 'court',
+    'pl': 'place',
+    'sq': 'square',
+    'jct': 'junction',
+    'ext': 'extension',
+    'cor': 'corner',
+    'brgy': 'barangay',
+    'nat\'l': 'national', 'natl': 'national',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']|(?<!\w)'|'(?!\w)")
+
+
+def canonicalize_location(raw: str) -> str:
+    """Canonical form of a location: lowercased, punctuation-free, abbreviations expanded, title-cased"""
+    text = _PUNCTUATION.sub(' ', raw.lower().replace('&', ' and '))
+    words = [ABBREVIATIONS.get(word, word) for word in text.split()]
+    # A leading "St" names a saint ("St. Luke's Road"), not a street
+    if len(words) > 1 and text.split()[0] == 'st':
+        words[0] = 'saint'
+    return " ".join(word.capitalize() for word in words)
+
+
+class LocationAutocomplete:
+    """Frequency-ranked prefix search over canonical location names
+
+    Matches the start of the whole name or of any word in it, so "stre"
+    finds "Main Street". Ties are broken alphabetically.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]] = ()):
+        self.counts: Dict[str, int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        for name, count in entries:
+            self.counts[name] = count
+        self._rebuild()
+
+    def _rebuild(self):
+        keys = []
+        for name in self.counts:
+            lowered = name.lower()
+            keys.append((lowered, name))
+            for position, character in enumerate(lowered):
+                if character == ' ':
+                    keys.append((lowered[position + 1:], name))
+        keys.sort()
+        self._keys = keys
+
+    def add(self, raw: str):
+        """Count one more use of a location, adding it if new"""
+        name = canonicalize_location(raw)
+        if not name:
+            return
+        is_new = name not in self.counts
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if is_new:
+            lowered = name.lower()
+            bisect.insort(self._keys, (lowered, name))
+            for position, character in enumerate(lowered):
+                if character == ' ':
+                    bisect.insort(self._keys, (lowered[position + 1:], name))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Most used locations whose name or a word in it starts with prefix"""
+        prefix = canonicalize_location(prefix).lower() if prefix.strip() else ''
+        if not prefix:
+            return heapq.nsmallest(limit, self.counts, key=lambda name: (-self.counts[name], name))
+
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + '\uffff',))
+        matches = {name for _, name in self._keys[start:end]}
+        return heapq.nsmallest(limit, matches, key=lambda name: (-self.counts[name], name))
+
+
+def load_autocomplete(db) -> LocationAutocomplete:
+    """Build the autocomplete index from the locations table"""
+    return LocationAutocomplete(db.get_location_counts())
+
+
+def main(argv=None):
+    # database imports this module, so import it lazily
+    from database import ViolationDatabase
+
+    parser = argparse.ArgumentParser(description="Location gazetteer maintenance")
+    parser.add_argument("--backfill", action="store_true",
+                        help="assign location_id to violations that have none")
+    args = parser.parse_args(argv)
+
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        if args.backfill:
+            db.backfill_location_ids()
+        for name, count in db.get_location_counts()[:20]:
+            print(f"  {count:>8}  {name}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
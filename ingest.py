@@ -0,0 +1,307 @@
+"""
+ingest.py - Parallel bulk import of camera exports
+Vehicle Violation Management System
+
+Parsing, plate normalization and fine defaulting are fanned out over a
+process pool, one file slice per task. Each worker receives the fine
+schedule once at start-up, so missing fines are filled in with the fine in
+force on the violation date without a query per row. Parsed chunks flow in file order
+through a bounded queue to a single writer thread that inserts each chunk
+in one transaction and then records a checkpoint, so an interrupted import
+resumes after the last committed chunk.
+
+    python ingest.py camera_export.csv [--workers 8] [--restart]
+
+The CSV header must name the violations columns: plate_number, vehicle_type,
+violation_type, location and optionally fine_amount, date_time,
+officer_name, status and notes.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config import INGEST_CONFIG, VEHICLE_TYPES, VIOLATION_TYPES, STATUS_TYPES
+from fines import FineSchedule
+
+REQUIRED_COLUMNS = ('plate_number', 'vehicle_type', 'violation_type', 'location')
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y %H:%M")
+
+_VEHICLE_TYPES = frozenset(VEHICLE_TYPES)
+_VIOLATION_TYPES = frozenset(VIOLATION_TYPES)
+_STATUS_TYPES = frozenset(STATUS_TYPES)
+
+# Fine schedule used by normalize_record; replaced in each worker by init_worker
+_fine_schedule = FineSchedule()
+
+
+def install_fine_schedule(schedule: FineSchedule):
+    """Use this schedule for fines missing from input rows"""
+    global _fine_schedule
+    _fine_schedule = schedule
+
+
+def init_worker(schedule_entries: List[Tuple]):
+    """Process pool initializer: install the fine schedule snapshot"""
+    install_fine_schedule(FineSchedule(schedule_entries))
+
+
+def parse_date_time(value: str) -> datetime:
+    """Parse the timestamp formats found in camera exports"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date_time '{value}'")
+
+
+def normalize_record(fields: Dict[str, str]) -> Dict:
+    """Validate one input row and turn it into a violations record"""
+    for column in REQUIRED_COLUMNS:
+        if not (fields.get(column) or '').strip():
+            raise ValueError(f"missing {column}")
+
+    plate = fields['plate_number'].strip().upper().replace(' ', '')
+    if not plate.replace('-', '').isalnum() or len(plate) > 20:
+        raise ValueError(f"invalid plate '{plate}'")
+
+    vehicle_type = fields['vehicle_type'].strip()
+    if vehicle_type not in _VEHICLE_TYPES:
+        raise ValueError(f"unknown vehicle type '{vehicle_type}'")
+
+    violation_type = fields['violation_type'].strip()
+    if violation_type not in _VIOLATION_TYPES:
+        raise ValueError(f"unknown violation type '{violation_type}'")
+
+    status = (fields.get('status') or '').strip() or 'Pending'
+    if status not in _STATUS_TYPES:
+        raise ValueError(f"unknown status '{status}'")
+
+    raw_date = (fields.get('date_time') or '').strip()
+    date_time = parse_date_time(raw_date) if raw_date else datetime.now().replace(microsecond=0)
+
+    raw_fine = (fields.get('fine_amount') or '').strip()
+    fine_amount = float(raw_fine) if raw_fine else _fine_schedule.fine_for(violation_type, date_time)
+    if fine_amount <= 0:
+        raise ValueError("fine amount must be positive")
+
+    return {
+        'plate_number': plate,
+        'vehicle_type': vehicle_type,
+        'violation_type': violation_type,
+        'location': fields['location'].strip()[:255],
+        'fine_amount': fine_amount,
+        'date_time': date_time,
+        'officer_name': (fields.get('officer_name') or '').strip() or 'Camera',
+        'status': status,
+        'notes': (fields.get('notes') or '').strip()
+    }
+
+
+def parse_chunk(path: str, start: int, end: int, header: List[str]) -> Tuple[List[Dict], List[Tuple]]:
+    """Parse the byte range [start, end) of the file (runs in a worker process)"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    records, rejects = [], []
+    for line in csv.reader(io.StringIO(data.decode('utf-8', errors='replace'))):
+        if not line:
+            continue
+        try:
+            records.append(normalize_record(dict(zip(header, line))))
+        except ValueError as e:
+            rejects.append((",".join(line), str(e)))
+    return records, rejects
+
+
+def iter_chunks(path: str, start: int, chunk_bytes: int):
+    """Yield (start, end) byte ranges that end on record boundaries
+
+    Quoted fields may span lines (multi-line notes), so a newline only ends
+    a record when an even number of quotes precede it since the chunk start.
+    Every chunk starts on a record boundary, so the count is always exact.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            in_quotes = f.read(end - start).count(b'"') % 2 == 1
+            while end < size:
+                piece = f.read(64 * 1024)
+                newline = piece.find(b'\n')
+                position = 0
+                while newline >= 0:
+                    in_quotes ^= piece.count(b'"', position, newline) % 2 == 1
+                    if not in_quotes:
+                        break
+                    position = newline
+                    newline = piece.find(b'\n', newline + 1)
+                if newline >= 0:
+                    end += newline + 1
+                    break
+                in_quotes ^= piece.count(b'"', position) % 2 == 1
+                end += len(piece)
+            end = min(end, size)
+            yield start, end
+            f.seek(end)
+            start = end
+
+
+class IngestPipeline:
+    def __init__(self, path: str, db=None, workers: Optional[int] = None,
+                 on_duplicate: Optional[str] = None):
+        self.path = path
+        self.db = db
+        self.workers = workers or INGEST_CONFIG['workers'] or os.cpu_count() or 1
+        self.on_duplicate = on_duplicate or INGEST_CONFIG['on_duplicate']
+        self.checkpoint_path = f"{path}.checkpoint.json"
+        self.rejects_path = f"{path}.rejects.csv"
+        self.totals = {'rows': 0, 'inserted': 0, 'merged': 0, 'flagged': 0, 'rejected': 0}
+
+    def _file_identity(self) -> Dict:
+        stat = os.stat(self.path)
+        return {'file': os.path.abspath(self.path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def load_checkpoint(self) -> Optional[Dict]:
+        """Return the saved checkpoint if it belongs to this exact file"""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        identity = self._file_identity()
+        if all(checkpoint.get(key) == value for key, value in identity.items()):
+            return checkpoint
+        print("⚠ Checkpoint is for a different version of the file, starting over")
+        return None
+
+    def save_checkpoint(self, next_offset: int):
+        checkpoint = dict(self._file_identity(), next_offset=next_offset, totals=self.totals)
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def run(self, restart: bool = False) -> Dict[str, int]:
+        """Import the file, resuming from the last checkpoint unless restart"""
+        with open(self.path, 'rb') as f:
+            header_line = f.readline()
+            data_start = f.tell()
+        header = [column.strip().lower() for column in next(csv.reader([header_line.decode('utf-8-sig')]))]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise Exception(f"Input is missing column(s): {', '.join(missing)}")
+
+        checkpoint = None if restart else self.load_checkpoint()
+        start = data_start
+        if checkpoint:
+            start = checkpoint['next_offset']
+            self.totals.update(checkpoint.get('totals', {}))
+            print(f"✓ Resuming at byte {start:,} ({self.totals['rows']:,} rows already done)")
+
+        if self.db is None:
+            from database import ViolationDatabase
+            self.db = ViolationDatabase()
+
+        size = os.path.getsize(self.path)
+        parsed = queue.Queue(maxsize=INGEST_CONFIG['queue_size'])
+        writer_error = []
+        started = time.monotonic()
+
+        def writer():
+            """Single consumer: insert each chunk, then checkpoint it"""
+            with open(self.rejects_path, 'a', newline='', encoding='utf-8') as rejects_file:
+                rejects_writer = csv.writer(rejects_file)
+                while True:
+                    item = parsed.get()
+                    if item is None:
+                        return
+                    end, records, rejects = item
+                    try:
+                        if records:
+                            counts = self.db.insert_violations_bulk(records, self.on_duplicate)
+                            for key, value in counts.items():
+                                self.totals[key] += value
+                        rejects_writer.writerows(rejects)
+                        rejects_file.flush()
+                        self.totals['rows'] += len(records) + len(rejects)
+                        self.totals['rejected'] += len(rejects)
+                        self.save_checkpoint(end)
+                    except Exception as e:
+                        writer_error.append(e)
+                        # Keep draining so the producer never blocks forever
+                        while parsed.get() is not None:
+                            pass
+                        return
+
+                    elapsed = max(time.monotonic() - started, 1e-6)
+                    print(f"  {end / size:6.1%}  {self.totals['rows']:,} rows  "
+                          f"({self.totals['rows'] / elapsed:,.0f} rows/s)")
+
+        writer_thread = threading.Thread(target=writer, name='ingest-writer', daemon=True)
+        writer_thread.start()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(self.db.get_fine_schedule(),)) as pool:
+                in_flight = deque()
+                for chunk_start, chunk_end in iter_chunks(self.path, start, INGEST_CONFIG['chunk_bytes']):
+                    if writer_error:
+                        break
+                    in_flight.append((chunk_end, pool.submit(parse_chunk, self.path, chunk_start,
+                                                             chunk_end, header)))
+                    # Hand results over in file order so checkpoints stay contiguous
+                    while len(in_flight) >= self.workers * 2:
+                        end, future = in_flight.popleft()
+                        parsed.put((end, *future.result()))
+                while in_flight and not writer_error:
+                    end, future = in_flight.popleft()
+                    parsed.put((end, *future.result()))
+                for _, future in in_flight:
+                    future.cancel()
+        finally:
+            parsed.put(None)
+            writer_thread.join()
+
+        if writer_error:
+            print(f"✗ Import stopped: {writer_error[0]}")
+            raise writer_error[0]
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        elapsed = time.monotonic() - started
+        print(f"✓ Imported {self.totals['inserted']:,} violation(s) in {elapsed:.1f}s "
+              f"({self.totals['merged']:,} merged, {self.totals['flagged']:,} flagged, "
+              f"{self.totals['rejected']:,} rejected)")
+        return self.totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a camera export into violations")
+    parser.add_argument("file", help="CSV export with a header row")
+    parser.add_argument("--workers", type=int, help="parser processes (default: CPU count)")
+    parser.add_argument("--on-duplicate", choices=['reject', 'merge', 'flag'],
+                        help="duplicate policy (default from INGEST_CONFIG)")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args(argv)
+
+    try:
+        IngestPipeline(args.file, workers=args.workers, on_duplicate=args.on_duplicate).run(args.restart)
+        return 0
+    except Exception as e:
+        print(f"✗ Import failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
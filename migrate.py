@@ -0,0 +1,38 @@
+"""
+migrate.py - One-off schema migrations
+Vehicle Violation Management System
+
+    python migrate.py --lookups    # ENUM type/status columns, link officer_id to users
+
+Rerun --lookups after adding vehicle types, violation types or statuses
+to config.py so the ENUM definitions pick up the new values.
+"""
+import argparse
+import sys
+from database import ViolationDatabase
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the violations table")
+    parser.add_argument("--lookups", action="store_true",
+                        help="store vehicle/violation types and status as ENUMs and link officers")
+    args = parser.parse_args(argv)
+
+    if not args.lookups:
+        parser.print_help()
+        return 0
+
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        return 0 if db.normalize_lookup_columns() else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+models.py - Compact in-memory representations of violation rows
+Vehicle Violation Management System
+"""
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class Violation:
+    """One violation record with every column, as returned by get_violation"""
+
+    __slots__ = ('id', 'plate_number', 'vehicle_type', 'violation_type', 'location',
+                 'fine_amount', 'date_time', 'officer_name', 'status', 'notes',
+                 'created_at', 'version', 'updated_at')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_row(cls, row: Sequence, columns: Sequence[str]) -> 'Violation':
+        """Build a record from a cursor row and its column names"""
+        return cls(**dict(zip(columns, row)))
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return isinstance(other, Violation) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"Violation(id={self.id}, plate_number={self.plate_number!r}, status={self.status!r})"
+
+
+def format_fine(amount: float) -> str:
+    return f"₱{amount:,.2f}"
+
+
+def format_date_time(value) -> str:
+    if hasattr(value, 'strftime'):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return str(value)
+
+
+class ViolationTableModel:
+    """Column-store of the rows shown in the violations table
+
+    IDs, fines and timestamps live in typed arrays; the low-cardinality text
+    columns hold interned strings so every row shares the same few objects.
+    Display strings are only built when a row is actually shown.
+    """
+
+    def __init__(self, rows: Optional[Iterable[Tuple]] = None):
+        self.clear()
+        if rows is not None:
+            self.load(rows)
+
+    def clear(self):
+        self.ids = array('q')
+        self.fines = array('d')
+        self.timestamps = array('d')
+        self.plates: List[str] = []
+        self.vehicle_types: List[str] = []
+        self.violation_types: List[str] = []
+        self.locations: List[str] = []
+        self.statuses: List[str] = []
+        self._positions: Dict[int, int] = {}
+
+    def load(self, rows: Iterable[Tuple]):
+        """Replace the contents with list/search query rows"""
+        self.clear()
+        for row in rows:
+            self.append(row)
+
+    def append(self, row: Tuple):
+        """Add one (id, plate, vehicle, violation, location, fine, date, status) row"""
+        intern = sys.intern
+        self._positions[row[0]] = len(self.ids)
+        self.ids.append(row[0])
+        self.plates.append(intern(row[1]))
+        self.vehicle_types.append(intern(row[2]))
+        self.violation_types.append(intern(row[3]))
+        self.locations.append(intern(row[4]))
+        self.fines.append(float(row[5]))
+        self.timestamps.append(row[6].timestamp() if isinstance(row[6], datetime) else float('nan'))
+        self.statuses.append(intern(row[7]))
+
+    def upsert(self, row: Tuple) -> bool:
+        """Overwrite the row with the same ID, or append it; True if it was new"""
+        index = self._positions.get(row[0])
+        if index is None:
+            self.append(row)
+            return True
+        intern = sys.intern
+        self.plates[index] = intern(row[1])
+        self.vehicle_types[index] = intern(row[2])
+        self.violation_types[index] = intern(row[3])
+        self.locations[index] = intern(row[4])
+        self.fines[index] = float(row[5])
+        self.timestamps[index] = row[6].timestamp() if isinstance(row[6], datetime) else float('nan')
+        self.statuses[index] = intern(row[7])
+        return False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, violation_id: int) -> Optional[int]:
+        return self._positions.get(violation_id)
+
+    def display_row(self, index: int) -> Tuple:
+        """Formatted values for one Treeview row"""
+        timestamp = self.timestamps[index]
+        date_text = '' if timestamp != timestamp else format_date_time(datetime.fromtimestamp(timestamp))
+        return (
+            self.ids[index], self.plates[index], self.vehicle_types[index],
+            self.violation_types[index], self.locations[index],
+            format_fine(self.fines[index]), date_text, self.statuses[index]
+        )
+
+    def set_status(self, violation_ids: Iterable[int], status: str):
+        status = sys.intern(status)
+        for violation_id in violation_ids:
+            index = self._positions.get(violation_id)
+            if index is not None:
+                self.statuses[index] = status
+
+    def remove(self, violation_ids: Iterable[int]):
+        """Drop rows by ID, compacting every column in one pass"""
+        doomed = {self._positions[i] for i in violation_ids if i in self._positions}
+        if not doomed:
+            return
+        keep = [index for index in range(len(self.ids)) if index not in doomed]
+        self.ids = array('q', (self.ids[i] for i in keep))
+        self.fines = array('d', (self.fines[i] for i in keep))
+        self.timestamps = array('d', (self.timestamps[i] for i in keep))
+        self.plates = [self.plates[i] for i in keep]
+        self.vehicle_types = [self.vehicle_types[i] for i in keep]
+        self.violation_types = [self.violation_types[i] for i in keep]
+        self.locations = [self.locations[i] for i in keep]
+        self.statuses = [self.statuses[i] for i in keep]
+        self._positions = {violation_id: index for index, violation_id in enumerate(self.ids)}
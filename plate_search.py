@@ -0,0 +1,216 @@
+"""
+plate_search.py - Fuzzy plate lookup tolerant of OCR and typing errors
+Vehicle Violation Management System
+
+Plates are reduced to a confusion-aware key first, so characters that OCR
+and hurried officers mix up ("O"/"0", "B"/"8", "S"/"5", ...) compare equal.
+The distinct keys are held in a positional n-gram index, so a search only
+computes edit distances for the handful of keys sharing a piece with the
+query. Results are ranked by key distance, then by distance to the plate
+exactly as typed.
+
+    index = PlateIndex(db)
+    index.refresh()                      # initial load, then only new rows
+    index.search("ABC1O3")               # [("ABC103", 0), ("ABC108", 1), ...]
+
+    python plate_search.py ABC1O3 --distance 2
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Characters commonly read or typed in place of one another, mapped to one representative
+CONFUSIONS = str.maketrans({
+    'O': '0', 'Q': '0', 'D': '0',
+    'I': '1', 'L': '1', 'T': '1',
+    'Z': '2',
+    'S': '5',
+    'G': '6',
+    'B': '8',
+})
+
+
+def plate_key(plate: str) -> str:
+    """Uppercase, drop separators and fold confusable characters"""
+    return ''.join(character for character in plate.upper() if character.isalnum()).translate(CONFUSIONS)
+
+
+def _pattern_masks(pattern: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for position, character in enumerate(pattern):
+        masks[character] = masks.get(character, 0) | (1 << position)
+    return masks
+
+
+def edit_distance(pattern: str, text: str, masks: Optional[Dict[str, int]] = None) -> int:
+    """Levenshtein distance, bit-parallel (Myers/Hyyrö): one pass over text"""
+    length = len(pattern)
+    if not length:
+        return len(text)
+    if masks is None:
+        masks = _pattern_masks(pattern)
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    positive, negative, score = full, 0, length
+    for character in text:
+        equal = masks.get(character, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        plus = negative | (~(horizontal | positive) & full)
+        minus = positive & horizontal
+        if plus & high:
+            score += 1
+        elif minus & high:
+            score -= 1
+        plus = ((plus << 1) | 1) & full
+        minus = (minus << 1) & full
+        positive = minus | (~(vertical | plus) & full)
+        negative = plus & vertical
+    return score
+
+
+def _segments(length: int, parts: int) -> List[Tuple[int, int]]:
+    """Split a key of the given length into (start, size) pieces; later pieces take the remainder"""
+    base, extra = divmod(length, parts)
+    pieces, start = [], 0
+    for part in range(parts):
+        size = base + (1 if part >= parts - extra else 0)
+        pieces.append((start, size))
+        start += size
+    return pieces
+
+
+class PlateIndex:
+    """Positional n-gram index over plate keys, refreshed incrementally
+
+    Each key is cut into max_distance + 1 pieces. A key within k edits of
+    the query must share at least one piece with it exactly, shifted by at
+    most k positions (pigeonhole). A search looks those pieces up, then
+    verifies only the few candidates they name with the edit distance.
+    """
+
+    def __init__(self, db=None, plates: Iterable[str] = (), max_distance: int = 1):
+        self.db = db
+        self.max_distance = max_distance
+        self._keys: List[str] = []
+        self._key_ids: Dict[str, int] = {}
+        self._plates: List[Set[str]] = []
+        self._pieces: Dict[Tuple[int, int, str], List[int]] = {}
+        # High-water marks for incremental refresh
+        self.max_id = 0
+        self.max_updated: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+        for plate in plates:
+            self.add(plate)
+
+    def __len__(self):
+        return sum(len(plates) for plates in self._plates)
+
+    def add(self, plate: str):
+        """Index one plate number"""
+        plate = plate.upper()
+        key = plate_key(plate)
+        if not key:
+            return
+        key_id = self._key_ids.get(key)
+        if key_id is not None:
+            self._plates[key_id].add(plate)
+            return
+
+        key_id = len(self._keys)
+        self._key_ids[key] = key_id
+        self._keys.append(key)
+        self._plates.append({plate})
+        length = len(key)
+        for part, (start, size) in enumerate(_segments(length, self.max_distance + 1)):
+            self._pieces.setdefault((length, part, key[start:start + size]), []).append(key_id)
+
+    def refresh(self) -> int:
+        """Add plates from rows inserted or changed since the last refresh"""
+        if self.refreshed_at is None:
+            plates, self.max_id, self.max_updated = self.db.get_distinct_plates()
+        else:
+            rows = self.db.fetch_plate_changes(self.max_id, self.max_updated)
+            plates = [row[1] for row in rows]
+            for violation_id, _, updated_at in rows:
+                self.max_id = max(self.max_id, violation_id)
+                if updated_at is not None and (self.max_updated is None or updated_at > self.max_updated):
+                    self.max_updated = updated_at
+        self.refreshed_at = datetime.now()
+        for plate in plates:
+            self.add(plate)
+        return len(plates)
+
+    def search(self, plate: str, max_distance: Optional[int] = None,
+               limit: int = 20) -> List[Tuple[str, int]]:
+        """Known plates within max_distance edits of plate (after folding), best first
+
+        Returns (plate, distance) pairs, where distance is measured between
+        the folded keys; ties are ordered by distance to the plate as typed.
+        """
+        distance_limit = self.max_distance if max_distance is None else max_distance
+        if distance_limit > self.max_distance:
+            raise ValueError(f"Index was built for at most {self.max_distance} edit(s)")
+        key = plate_key(plate)
+        if not key:
+            return []
+
+        length = len(key)
+        candidates = set()
+        for other_length in range(max(length - distance_limit, 1), length + distance_limit + 1):
+            for part, (start, size) in enumerate(_segments(other_length, self.max_distance + 1)):
+                for shift in range(-distance_limit, distance_limit + 1):
+                    offset = start + shift
+                    if offset < 0 or offset + size > length:
+                        continue
+                    key_ids = self._pieces.get((other_length, part, key[offset:offset + size]))
+                    if key_ids:
+                        candidates.update(key_ids)
+
+        masks = _pattern_masks(key)
+        typed = ''.join(character for character in plate.upper() if character.isalnum())
+        typed_masks = _pattern_masks(typed)
+        ranked = []
+        for key_id in candidates:
+            distance = edit_distance(key, self._keys[key_id], masks)
+            if distance <= distance_limit:
+                for candidate in self._plates[key_id]:
+                    ranked.append((distance, edit_distance(typed, candidate, typed_masks), candidate))
+        ranked.sort()
+        return [(candidate, distance) for distance, _, candidate in ranked[:limit]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find plates similar to a possibly misread one")
+    parser.add_argument("plate")
+    parser.add_argument("--distance", type=int, default=1, help="edits allowed after folding")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from database import ViolationDatabase
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        started = time.perf_counter()
+        index = PlateIndex(db, max_distance=args.distance)
+        index.refresh()
+        print(f"✓ Indexed {len(index):,} plate(s) in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        matches = index.search(args.plate, args.distance, args.limit)
+        print(f"✓ {len(matches)} match(es) in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for plate, distance in matches:
+            print(f"  {plate:<12} {distance}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+"""
+query_plans.py - Query-plan regression checks for the data layer
+Vehicle Violation Management System
+
+Runs each registered ViolationDatabase method against a scratch database
+seeded with synthetic data, EXPLAINs every statement the method issues and
+compares the plans with query_plans.json: which index each table access
+uses, whether it scans the whole table, and how many rows the optimizer
+expects to examine. Any difference fails the run, so an index dropped by a
+migration or a rewritten WHERE clause cannot quietly turn into a full scan.
+
+    python query_plans.py                  # seed if needed, check, exit 1 on regression
+    python query_plans.py -v               # also print every plan
+    python query_plans.py --only get_plate_history search_notes
+    python query_plans.py --update         # accept the current plans
+    python query_plans.py --reseed         # rebuild the scratch data (it ages with the clock)
+
+Reads are executed normally; UPDATE and DELETE statements are only
+EXPLAINed, so checking write paths leaves the data untouched.
+
+--update stamps the file with the server version and seed size it was
+recorded with. Until the first --update there is no file and every check
+fails. A file without that stamp (a draft written by hand) is refused,
+since its budgets were never observed on a real optimizer.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import random
+import string
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import pymysql
+from config import (DATABASE_CONFIG, QUERY_PLAN_CONFIG, VEHICLE_TYPES,
+                    VIOLATION_TYPES, STATUS_TYPES, DEFAULT_FINES)
+from database import ARCHIVE_COLUMNS, ViolationDatabase
+
+# Statement verbs worth an EXPLAIN, and those that are also executed
+EXPLAINED_VERBS = ('SELECT', 'UPDATE', 'DELETE')
+EXECUTED_VERBS = ('SELECT', 'SHOW')
+
+# Access types that read a whole table or index
+FULL_SCAN_TYPES = ('ALL', 'index')
+
+# Synthetic data: violations spread over SEED_MONTHS, the oldest moved to the archive
+SEED = 20240101
+SEED_MONTHS = 48
+ARCHIVED_MONTHS = 12
+STREETS = ('Main', 'Rizal', 'Mabini', 'Bonifacio', 'Luna', 'Quezon', 'Roxas', 'Aguinaldo', 'Burgos', 'Del Pilar')
+STREET_TYPES = ('Street', 'Avenue', 'Road', 'Boulevard')
+NOTE_WORDS = ('tinted', 'windows', 'expired', 'registration', 'helmet', 'school', 'zone',
+              'towed', 'warning', 'contested', 'receipt', 'camera', 'night', 'passenger', 'cargo')
+
+# Registered statements: name -> call against the database and a sample row.
+# Names with a suffix cover another branch of the same method.
+STATEMENTS: Dict[str, Callable] = {
+    'get_all_violations': lambda db, s: db.get_all_violations(),
+    'get_all_violations.history': lambda db, s: db.get_all_violations(include_history=True),
+    'search_violations': lambda db, s: db.search_violations(s['plate'][:4]),
+    'search_violations.history': lambda db, s: db.search_violations(s['plate'][:4], include_history=True),
+    'search_notes': lambda db, s: db.search_notes('tinted'),
+    'get_violation': lambda db, s: db.get_violation(s['id']),
+    'find_duplicate': lambda db, s: db.find_duplicate(s['plate'], s['violation_type'],
+                                                      s['location'], s['date_time']),
+    'get_plate_history': lambda db, s: db.get_plate_history(s['plate']),
+    'get_violations_for_plates': lambda db, s: db.get_violations_for_plates(s['plates']),
+    'get_distinct_plates': lambda db, s: db.get_distinct_plates(),
+    'fetch_plate_changes': lambda db, s: db.fetch_plate_changes(s['id'] - 100, s['recent']),
+    'fetch_analytics_rows': lambda db, s: db.fetch_analytics_rows(s['id'] - 100, s['recent']),
+    'get_changes_since': lambda db, s: db.get_changes_since(s['recent'], overlap_seconds=5),
+    'get_violation_summary': lambda db, s: db.get_violation_summary('status'),
+    'get_violation_summary.location': lambda db, s: db.get_violation_summary('location'),
+    'get_period_high_water': lambda db, s: db.get_period_high_water(s['month_start'], s['month_end']),
+    'get_location_counts': lambda db, s: db.get_location_counts(),
+    'get_user_by_username': lambda db, s: db.get_user_by_username('officer01'),
+    'patch_violation': lambda db, s: db.patch_violation(s['id'], {'status': 'Paid', 'notes': 'paid'}),
+    'update_status_bulk': lambda db, s: db.update_status_bulk(s['ids'], 'Paid'),
+    'delete_violation': lambda db, s: db.delete_violation(s['id']),
+}
+
+
+class PlanRecorder:
+    """Cursor stand-in that EXPLAINs each statement a data-layer method issues"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._skipped = False
+        self.plans: List[Dict] = []
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, args=None):
+        verb = query.lstrip().split(None, 1)[0].upper()
+        if verb in EXPLAINED_VERBS:
+            self._explain(query, args)
+        # Writes are not run: report one affected row so the method carries on
+        self._skipped = verb not in EXECUTED_VERBS
+        if self._skipped:
+            return 1
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        self._skipped = True
+        return len(args)
+
+    @property
+    def rowcount(self):
+        return 1 if self._skipped else self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return None if self._skipped else self._cursor.lastrowid
+
+    def fetchone(self):
+        return None if self._skipped else self._cursor.fetchone()
+
+    def fetchall(self):
+        return () if self._skipped else self._cursor.fetchall()
+
+    def _explain(self, query, args):
+        self._cursor.execute("EXPLAIN " + query, args)
+        columns = [column[0].lower() for column in self._cursor.description]
+        for row in self._cursor.fetchall():
+            step = dict(zip(columns, row))
+            table = step.get('table')
+            # Skip "no tables used" and the temporary <derivedN>/<unionM,N> steps
+            if not table or table.startswith('<'):
+                continue
+            self.plans.append({
+                'table': table,
+                'type': step.get('type'),
+                'key': step.get('key'),
+                'rows': int(step['rows']) if step.get('rows') is not None else None,
+            })
+
+
+def capture_plans(db: ViolationDatabase, action: Callable, sample: Dict) -> List[Dict]:
+    """Table accesses of every statement one registered call issues, in order"""
+    real_cursor = db.cursor
+    recorder = PlanRecorder(real_cursor)
+    db.cursor = recorder
+    try:
+        # The data layer reports each operation; only the plans matter here
+        with contextlib.redirect_stdout(io.StringIO()):
+            action(db, sample)
+    finally:
+        db.cursor = real_cursor
+        db.connection.rollback()
+    return recorder.plans
+
+
+def compare_plan(plans: List[Dict], expected: Optional[List[Dict]]) -> List[str]:
+    """Problems with a statement's plans; empty when they meet the expectations"""
+    if expected is None:
+        return ["no expectation recorded (run with --update)"]
+    problems = []
+    if len(plans) != len(expected):
+        problems.append(f"{len(plans)} table access(es), expected {len(expected)}: "
+                        f"{', '.join(plan['table'] for plan in plans) or 'none'}")
+    for plan, expectation in zip(plans, expected):
+        table = plan['table']
+        if table != expectation['table']:
+            problems.append(f"reads {table} where {expectation['table']} was expected")
+            continue
+        keys = expectation['key'] if isinstance(expectation['key'], list) else [expectation['key']]
+        if plan['key'] not in keys:
+            allowed = " or ".join(key or 'no index' for key in keys)
+            problems.append(f"{table}: uses {plan['key'] or 'no index'}, expected {allowed}")
+        if plan['type'] in FULL_SCAN_TYPES and not expectation.get('full_scan'):
+            problems.append(f"{table}: full {'table' if plan['type'] == 'ALL' else 'index'} scan")
+        if plan['rows'] is not None and plan['rows'] > expectation['max_rows']:
+            problems.append(f"{table}: ~{plan['rows']} rows examined, budget {expectation['max_rows']}")
+    return problems
+
+
+def updated_expectation(plans: List[Dict], previous: Optional[List[Dict]]) -> List[Dict]:
+    """Expectations accepting the current plans, keeping notes and alternative keys"""
+    previous = previous or []
+    result = []
+    for position, plan in enumerate(plans):
+        old = previous[position] if position < len(previous) else {}
+        if old.get('table') != plan['table']:
+            old = {}
+        keys = old.get('key') if isinstance(old.get('key'), list) else None
+        entry = {
+            'table': plan['table'],
+            'key': keys if keys and plan['key'] in keys else plan['key'],
+            'max_rows': max(10, math.ceil((plan['rows'] or 1) * QUERY_PLAN_CONFIG['row_headroom'] / 10) * 10),
+        }
+        if plan['type'] in FULL_SCAN_TYPES:
+            entry['full_scan'] = True
+        if old.get('note'):
+            entry['note'] = old['note']
+        result.append(entry)
+    return result
+
+
+def describe_plan(plan: Dict) -> str:
+    return f"{plan['table']:<22} {plan['type'] or '-':<9} {plan['key'] or '-':<30} ~{plan['rows']} rows"
+
+
+# --- Scratch database ---------------------------------------------------------
+
+def open_scratch_database(name: str, reseed: bool = False) -> ViolationDatabase:
+    """Create (or recreate) the scratch database and open it with the current schema"""
+    if name == DATABASE_CONFIG['database']:
+        raise ValueError(f"Refusing to use the application database '{name}' as scratch data")
+    connection = pymysql.connect(
+        host=DATABASE_CONFIG['host'], user=DATABASE_CONFIG['user'],
+        password=DATABASE_CONFIG['password'], port=DATABASE_CONFIG['port'],
+        connect_timeout=10, charset='utf8mb4'
+    )
+    try:
+        with connection.cursor() as cursor:
+            if reseed:
+                cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    finally:
+        connection.close()
+    return ViolationDatabase(dict(DATABASE_CONFIG, database=name), check_schema=True)
+
+
+def seed_database(db: ViolationDatabase, rows: int):
+    """Fill an empty schema with reproducible synthetic violations, users and notes"""
+    rng = random.Random(SEED)
+    now = datetime.now().replace(microsecond=0)
+
+    officers = [f"officer{number:02d}" for number in range(1, 21)]
+    for name in officers:
+        db.create_user(name, f"{name}@example.com", hashlib.sha256(name.encode('utf-8')).hexdigest())
+    officer_ids = {name: db.get_officer_id(name) for name in officers}
+    locations = [f"{number} {street} {street_type}" for number in range(1, 6)
+                 for street in STREETS for street_type in STREET_TYPES]
+    location_ids = {raw: db.resolve_location_id(raw) for raw in locations}
+    plates = ["".join(rng.choices(string.ascii_uppercase, k=3)) + "".join(rng.choices(string.digits, k=4))
+              for _ in range(max(rows // 4, 1))]
+
+    query = """
+        INSERT INTO violations
+        (plate_number, vehicle_type, violation_type, location, location_id, fine_amount,
+         date_time, officer_name, officer_id, status, notes, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    batch = []
+    for _ in range(rows):
+        date_time = now - timedelta(seconds=rng.randrange(SEED_MONTHS * 30 * 86400))
+        violation_type = rng.choice(VIOLATION_TYPES)
+        location = rng.choice(locations)
+        officer = rng.choice(officers)
+        notes = " ".join(rng.sample(NOTE_WORDS, rng.randint(3, 6))) if rng.random() < 0.2 else ''
+        batch.append((rng.choice(plates), rng.choice(VEHICLE_TYPES), violation_type, location,
+                      location_ids[location], DEFAULT_FINES.get(violation_type, 500.00), date_time,
+                      officer, officer_ids[officer], rng.choice(STATUS_TYPES), notes, date_time,
+                      min(now, date_time + timedelta(hours=rng.randrange(72)))))
+        if len(batch) == 1000:
+            db.cursor.executemany(query, batch)
+            db.connection.commit()
+            batch = []
+    if batch:
+        db.cursor.executemany(query, batch)
+
+    columns = ", ".join(ARCHIVE_COLUMNS)
+    cutoff = now - timedelta(days=(SEED_MONTHS - ARCHIVED_MONTHS) * 30)
+    db.cursor.execute(f"INSERT INTO violations_archive ({columns}) SELECT {columns} FROM violations "
+                      f"WHERE date_time < %s", (cutoff,))
+    db.cursor.execute("DELETE FROM violations WHERE date_time < %s", (cutoff,))
+    # A week of tombstones, as the change feed keeps them
+    db.cursor.execute("""
+        INSERT INTO violation_tombstones (violation_id, deleted_at)
+        SELECT id, NOW() - INTERVAL (id % 168) HOUR FROM violations_archive ORDER BY id LIMIT 500
+    """)
+    db.cursor.execute("""
+        INSERT INTO violation_notes (violation_id, notes)
+        SELECT id, notes FROM violations WHERE notes <> ''
+    """)
+    db.cursor.execute("""
+        UPDATE locations l SET usage_count = (SELECT COUNT(*) FROM violations v WHERE v.location_id = l.id)
+    """)
+    db.connection.commit()
+    for table in ('violations', 'violations_archive', 'violation_tombstones',
+                  'violation_notes', 'locations', 'users'):
+        db.cursor.execute(f"ANALYZE TABLE {table}")
+        db.cursor.fetchall()
+    print(f"✓ Seeded {rows} synthetic violations")
+
+
+def pick_sample(db: ViolationDatabase) -> Dict:
+    """Arguments for the registered calls, taken from the seeded data"""
+    db.cursor.execute("""
+        SELECT id, plate_number, violation_type, location, date_time
+        FROM violations ORDER BY id DESC LIMIT 1
+    """)
+    violation_id, plate, violation_type, location, date_time = db.cursor.fetchone()
+    db.cursor.execute("SELECT DISTINCT plate_number FROM violations ORDER BY plate_number LIMIT 3")
+    plates = [row[0] for row in db.cursor.fetchall()]
+    db.connection.commit()
+    month_start = (datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                   - timedelta(days=1)).replace(day=1)
+    return {
+        'id': violation_id, 'plate': plate, 'violation_type': violation_type,
+        'location': location, 'date_time': date_time, 'plates': plates,
+        'ids': list(range(violation_id - 49, violation_id + 1)),
+        'recent': datetime.now().replace(microsecond=0) - timedelta(days=1),
+        'month_start': month_start,
+        'month_end': (month_start + timedelta(days=32)).replace(day=1),
+    }
+
+
+def load_expectations(path: str) -> Dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            expectations = json.load(f)
+        expectations.setdefault('statements', {})
+        return expectations
+    except FileNotFoundError:
+        return {'statements': {}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check data-layer query plans against recorded expectations")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="check only these statements")
+    parser.add_argument("--update", action="store_true", help="record the current plans as the expectations")
+    parser.add_argument("--reseed", action="store_true", help="drop and rebuild the scratch database")
+    parser.add_argument("--database", default=DATABASE_CONFIG['database'] + QUERY_PLAN_CONFIG['database_suffix'],
+                        help="scratch database name")
+    parser.add_argument("--rows", type=int, default=QUERY_PLAN_CONFIG['seed_rows'],
+                        help="violations to seed into an empty scratch database")
+    parser.add_argument("--expectations", default=QUERY_PLAN_CONFIG['expectations'])
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.only or ()) - set(STATEMENTS))
+    if unknown:
+        parser.error(f"unknown statement(s): {', '.join(unknown)}")
+
+    expectations = load_expectations(args.expectations)
+    if args.update and args.only and 'recorded_with' not in expectations:
+        print("✗ Record every statement once before updating only some (drop --only)")
+        return 2
+    if not args.update and not expectations['statements']:
+        print(f"✗ No plans recorded in {args.expectations} yet; "
+              f"run with --update, review the file and commit it")
+        return 1
+    if not args.update and 'recorded_with' not in expectations:
+        print(f"✗ {args.expectations} was never recorded against a server "
+              f"({expectations.get('draft', 'no recorded_with stamp')}); "
+              f"run with --update, review the diff and commit it")
+        return 2
+
+    try:
+        db = open_scratch_database(args.database, args.reseed)
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        db.cursor.execute("SELECT COUNT(*) FROM violations")
+        if db.cursor.fetchone()[0] == 0:
+            seed_database(db, args.rows)
+        sample = pick_sample(db)
+
+        recorded = expectations.setdefault('statements', {})
+        failed = []
+        for name in args.only or STATEMENTS:
+            plans = capture_plans(db, STATEMENTS[name], sample)
+            if args.update:
+                recorded[name] = updated_expectation(plans, recorded.get(name))
+                problems = []
+            else:
+                problems = compare_plan(plans, recorded.get(name))
+            print(f"{'✗' if problems else '✓'} {name}")
+            for problem in problems:
+                print(f"    - {problem}")
+            if args.verbose or problems:
+                for plan in plans:
+                    print(f"      {describe_plan(plan)}")
+            if problems:
+                failed.append(name)
+
+        if args.update:
+            db.cursor.execute("SELECT VERSION()")
+            expectations.pop('draft', None)
+            expectations['seed_rows'] = args.rows
+            expectations['recorded_with'] = {'server': db.cursor.fetchone()[0],
+                                             'date': f"{datetime.now():%Y-%m-%d}"}
+            with open(args.expectations, 'w', encoding='utf-8') as f:
+                json.dump(expectations, f, indent=2, sort_keys=True)
+                f.write("\n")
+            print(f"✓ Expectations written to {args.expectations}; review the diff before committing")
+            return 0
+        if failed:
+            print(f"\n✗ {len(failed)} statement(s) regressed: {', '.join(failed)}")
+            return 1
+        print(f"\n✓ All {len(args.only or STATEMENTS)} statement plans match {args.expectations}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+reconcile.py - Payment reconciliation batch job
+Vehicle Violation Management System
+
+Streams a bank payment file (CSV with plate_number, amount and an optional
+reference column) into a temporary table, matches it against Pending
+violations with one set-based join, marks the matches Paid in bulk and
+writes every unmatched line to an exceptions report.
+
+    python reconcile.py payments.csv --report exceptions.csv
+"""
+import argparse
+import csv
+import sys
+from decimal import Decimal, InvalidOperation
+from typing import Dict
+from database import ViolationDatabase
+
+STAGE_CHUNK_SIZE = 5000
+
+# Limits of the payment_lines columns, so a bad line is reported instead of
+# failing the whole insert batch
+MAX_PLATE_LENGTH = 20
+MAX_REFERENCE_LENGTH = 100
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def _stage_payments(db: ViolationDatabase, payment_file: str, report) -> int:
+    """Load the payment file into temporary tables, returning the staged line count"""
+    db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_lines")
+    db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_plates")
+    db.cursor.execute("""
+        CREATE TEMPORARY TABLE payment_lines (
+            line_no INT PRIMARY KEY,
+            plate_number VARCHAR(20) NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            reference VARCHAR(100),
+            rn INT NOT NULL,
+            INDEX idx_payment_match (plate_number, amount, rn)
+        )
+    """)
+    # MySQL cannot open a temporary table twice in one statement, so the
+    # distinct plates used to narrow the violations scan get their own table
+    db.cursor.execute("""
+        CREATE TEMPORARY TABLE payment_plates (
+            plate_number VARCHAR(20) PRIMARY KEY
+        )
+    """)
+
+    insert_line = """
+        INSERT INTO payment_lines (line_no, plate_number, amount, reference, rn)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    insert_plate = "INSERT IGNORE INTO payment_plates (plate_number) VALUES (%s)"
+
+    # Several payments for the same plate and amount each settle a different
+    # violation, so every line is numbered within its (plate, amount) group
+    occurrences: Dict[tuple, int] = {}
+    batch = []
+    staged = 0
+
+    def flush():
+        db.cursor.executemany(insert_line, batch)
+        db.cursor.executemany(insert_plate, list({(row[1],) for row in batch}))
+        batch.clear()
+
+    with open(payment_file, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [column.strip().lower() for column in next(reader, [])]
+        try:
+            plate_col = header.index('plate_number')
+            amount_col = header.index('amount')
+        except ValueError:
+            raise Exception("Payment file needs 'plate_number' and 'amount' columns")
+        reference_col = header.index('reference') if 'reference' in header else None
+
+        for line_no, line in enumerate(reader, start=2):
+            try:
+                plate = line[plate_col].strip().upper()
+                amount = Decimal(line[amount_col].strip()).quantize(Decimal('0.01'))
+                reference = line[reference_col].strip() if reference_col is not None else None
+                if not plate or len(plate) > MAX_PLATE_LENGTH:
+                    raise ValueError("bad plate")
+                if reference is not None and len(reference) > MAX_REFERENCE_LENGTH:
+                    raise ValueError("reference too long")
+                if amount.is_nan() or not Decimal('0') < amount <= MAX_AMOUNT:
+                    raise ValueError("amount out of range")
+            except (IndexError, ValueError, InvalidOperation):
+                report.writerow([line_no, ",".join(line), '', '', 'Invalid line'])
+                continue
+
+            key = (plate, amount)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            batch.append((line_no, plate, amount, reference, occurrences[key]))
+            staged += 1
+
+            if len(batch) >= STAGE_CHUNK_SIZE:
+                flush()
+
+    if batch:
+        flush()
+    return staged
+
+
+def reconcile_payments(db: ViolationDatabase, payment_file: str, report_file: str) -> Dict[str, int]:
+    """Mark Pending violations matched by plate and amount as Paid"""
+    with open(report_file, 'w', newline='', encoding='utf-8') as f:
+        report = csv.writer(f)
+        report.writerow(['line_no', 'plate_number', 'amount', 'reference', 'reason'])
+
+        try:
+            staged = _stage_payments(db, payment_file, report)
+
+            db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_matches")
+            db.cursor.execute("""
+                CREATE TEMPORARY TABLE payment_matches (
+                    line_no INT PRIMARY KEY,
+                    violation_id INT NOT NULL UNIQUE
+                )
+            """)
+            # The n-th payment of a (plate, amount) settles the n-th oldest
+            # Pending violation with that plate and fine
+            db.cursor.execute("""
+                INSERT INTO payment_matches (line_no, violation_id)
+                SELECT p.line_no, v.id
+                FROM payment_lines p
+                JOIN (
+                    SELECT id, plate_number, fine_amount,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY plate_number, fine_amount
+                               ORDER BY date_time, id
+                           ) AS rn
+                    FROM violations
+                    WHERE status = 'Pending'
+                      AND plate_number IN (SELECT plate_number FROM payment_plates)
+                ) v ON v.plate_number = p.plate_number
+                   AND v.fine_amount = p.amount
+                   AND v.rn = p.rn
+            """)
+
+            db.cursor.execute("""
+                UPDATE violations v
+                JOIN payment_matches m ON m.violation_id = v.id
+                SET v.status = 'Paid', v.version = v.version + 1
+                WHERE v.status = 'Pending'
+            """)
+            paid = db.cursor.rowcount
+            db.connection.commit()
+
+            db.cursor.execute("""
+                SELECT p.line_no, p.plate_number, p.amount, p.reference,
+                       CASE WHEN pv.plate_number IS NULL
+                            THEN 'No pending violation for plate'
+                            ELSE 'No pending violation with this amount'
+                       END
+                FROM payment_lines p
+                LEFT JOIN payment_matches m ON m.line_no = p.line_no
+                LEFT JOIN (
+                    SELECT DISTINCT plate_number FROM violations
+                    WHERE status = 'Pending'
+                      AND plate_number IN (SELECT plate_number FROM payment_plates)
+                ) pv ON pv.plate_number = p.plate_number
+                WHERE m.line_no IS NULL
+                ORDER BY p.line_no
+            """)
+            exceptions = 0
+            while True:
+                rows = db.cursor.fetchmany(STAGE_CHUNK_SIZE)
+                if not rows:
+                    break
+                report.writerows(rows)
+                exceptions += len(rows)
+        except Exception as e:
+            db.connection.rollback()
+            print(f"✗ Reconciliation failed: {e}")
+            raise
+        finally:
+            db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_lines")
+            db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_plates")
+            db.cursor.execute("DROP TEMPORARY TABLE IF EXISTS payment_matches")
+
+    print(f"✓ Reconciled {staged} payment line(s): {paid} marked Paid, {exceptions} exception(s)")
+    return {'staged': staged, 'paid': paid, 'exceptions': exceptions}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile a bank payment file against Pending violations")
+    parser.add_argument("payment_file", help="CSV with plate_number, amount and optional reference columns")
+    parser.add_argument("--report", default="reconcile_exceptions.csv",
+                        help="where to write unmatched payment lines")
+    args = parser.parse_args(argv)
+
+    try:
+        db = ViolationDatabase()
+    except Exception as e:
+        print(f"✗ {e}")
+        return 1
+
+    try:
+        reconcile_payments(db, args.payment_file, args.report)
+        return 0
+    except Exception:
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+replication.py - Read/write splitting across a primary and read replicas
+Vehicle Violation Management System
+
+RoutedViolationDatabase exposes the ViolationDatabase API. Heavy reads
+(listings, searches, aggregates, exports) go to a healthy replica; writes
+and everything else go to the primary. After a write, reads stay on the
+primary for a short window so a user always sees their own changes. The
+window is tracked by a WriteClock shared by every router in the process, so
+a write through one pooled handle also pins reads on the others.
+
+Replica handles use autocommit, so every read sees the latest replicated
+data. Replica health is probed with SHOW SLAVE STATUS. A server that is not
+replicating reports no status and counts as current, so two local
+databases can stand in for a primary and a replica during testing.
+"""
+import itertools
+import time
+from typing import Dict, List, Optional
+from config import DATABASE_CONFIG, REPLICA_CONFIGS, REPLICATION_CONFIG
+from database import ViolationDatabase
+
+# Methods that may be served by a replica
+READ_METHODS = frozenset({
+    'get_all_violations', 'search_violations', 'get_plate_history',
+    'get_violation_summary', 'iter_violations', 'scan_duplicates', 'search_notes',
+    'get_violations_for_plates', 'get_distinct_plates', 'fetch_plate_changes',
+    'find_violations', 'find_notes', 'find_violations_for_plates'
+})
+
+# Method name prefixes that modify data on the primary
+WRITE_PREFIXES = ('create_', 'insert_', 'update_', 'patch_', 'delete_',
+                  'flag_', 'archive_', 'partition_', 'set_')
+
+
+class WriteClock:
+    """Time of the latest write, shared by routers that serve the same users"""
+
+    def __init__(self):
+        self.last_write = 0.0
+
+    def touch(self):
+        self.last_write = time.monotonic()
+
+    def since(self) -> float:
+        """Seconds since the latest write"""
+        return time.monotonic() - self.last_write
+
+
+# Default clock, so each handle of a pool built with open_database sees the
+# writes made through the others
+SHARED_WRITE_CLOCK = WriteClock()
+
+
+class ReplicaState:
+    def __init__(self, db: ViolationDatabase):
+        self.db = db
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.db.config['host']}:{self.db.config['port']}"
+
+
+class RoutedViolationDatabase:
+    def __init__(self, primary_config: Optional[Dict] = None,
+                 replica_configs: Optional[List[Dict]] = None,
+                 write_clock: Optional[WriteClock] = None):
+        """Connect to the primary and every configured replica"""
+        self.primary = ViolationDatabase(primary_config or DATABASE_CONFIG)
+        self.replicas = []
+        for replica_config in (REPLICA_CONFIGS if replica_configs is None else replica_configs):
+            try:
+                self.replicas.append(ReplicaState(ViolationDatabase(replica_config, read_only=True)))
+            except Exception as e:
+                print(f"⚠ Replica {replica_config['host']}:{replica_config['port']} unavailable: {e}")
+        self._next_replica = itertools.cycle(range(max(len(self.replicas), 1)))
+        self.write_clock = write_clock or SHARED_WRITE_CLOCK
+        print(f"✓ Routing reads across {len(self.replicas)} replica(s)")
+
+    def _replica_lag(self, replica: ReplicaState) -> Optional[float]:
+        """Seconds the replica is behind, or None if it is unusable (cached briefly)"""
+        now = time.monotonic()
+        if now - replica.checked_at < REPLICATION_CONFIG['lag_check_interval']:
+            return replica.lag
+
+        replica.checked_at = now
+        try:
+            cursor = replica.db.cursor
+            cursor.execute("SHOW SLAVE STATUS")
+            row = cursor.fetchone()
+            if row is None:
+                replica.lag = 0.0
+            else:
+                status = dict(zip([column[0] for column in cursor.description], row))
+                lag = status.get('Seconds_Behind_Master', status.get('Seconds_Behind_Source'))
+                replica.lag = float(lag) if lag is not None else None
+        except Exception as e:
+            print(f"⚠ Replica {replica.name} health check failed: {e}")
+            replica.lag = None
+        return replica.lag
+
+    def _read_target(self) -> ViolationDatabase:
+        """Pick a current replica, falling back to the primary"""
+        if self.write_clock.since() < REPLICATION_CONFIG['read_your_writes_seconds']:
+            return self.primary
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next_replica)]
+            lag = self._replica_lag(replica)
+            if lag is not None and lag <= REPLICATION_CONFIG['max_lag_seconds']:
+                return replica.db
+        return self.primary
+
+    def _read_primary(self, name: str, *args, **kwargs):
+        """Serve a read from the primary, then end its transaction
+
+        Replicas connect with autocommit. The primary does not, so without
+        the commit its next read would still see this read's snapshot.
+        """
+        result = getattr(self.primary, name)(*args, **kwargs)
+        if name != 'iter_violations':  # a stream has not run its query yet
+            self.primary.connection.commit()
+        return result
+
+    def __getattr__(self, name):
+        # Only reached for names not set in __init__; avoid recursing on them
+        if name in ('primary', 'replicas', 'write_clock') or name.startswith('__'):
+            raise AttributeError(name)
+
+        if name in READ_METHODS:
+            target = self._read_target()
+
+            def read(*args, **kwargs):
+                try:
+                    if target is self.primary:
+                        return self._read_primary(name, *args, **kwargs)
+                    return getattr(target, name)(*args, **kwargs)
+                except Exception as e:
+                    if target is self.primary:
+                        raise
+                    print(f"⚠ Replica read failed, retrying on primary: {e}")
+                    for replica in self.replicas:
+                        if replica.db is target:
+                            replica.lag = None
+                            replica.checked_at = time.monotonic()
+                    return self._read_primary(name, *args, **kwargs)
+            return read
+
+        attribute = getattr(self.primary, name)
+        if callable(attribute) and name.startswith(WRITE_PREFIXES):
+            def write(*args, **kwargs):
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self.write_clock.touch()
+            return write
+        return attribute
+
+    def close(self):
+        """Close the primary and replica connections"""
+        self.primary.close()
+        for replica in self.replicas:
+            replica.db.close()
+
+
+def open_database():
+    """Open the data layer, routing reads to replicas when any are configured"""
+    if REPLICA_CONFIGS:
+        return RoutedViolationDatabase()
+    return ViolationDatabase()
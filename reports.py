@@ -0,0 +1,169 @@
+"""
+reports.py - Monthly report bundles rendered in worker processes
+Vehicle Violation Management System
+
+Each report summarizes one month of violations per officer, violation type
+or location, as HTML or CSV, archived violations included. Rendering runs
+in a process pool whose workers hold their own database connection, so the
+Tk UI stays responsive.
+
+Files are named after (report type, period, data high-water mark). A
+request for a period whose rows have not changed since the last render
+returns the existing file without recomputing it.
+
+    python reports.py 2024-05 --format html
+"""
+import argparse
+import csv
+import hashlib
+import html
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from config import REPORT_CONFIG
+
+# Report type -> (summary column, heading)
+REPORT_TYPES = {
+    'officer': ('officer_name', 'Officer'),
+    'violation_type': ('violation_type', 'Violation Type'),
+    'location': ('location', 'Location'),
+}
+
+FORMATS = ('html', 'csv')
+
+# Connection held by each worker process
+_db = None
+
+
+def parse_period(period: str) -> Tuple[datetime, datetime]:
+    """'YYYY-MM' -> (first day of the month, first day of the next)"""
+    from database import month_start
+    start = datetime.strptime(period, "%Y-%m")
+    return start, month_start(start, 1)
+
+
+def init_worker(config: Optional[Dict] = None):
+    """Process pool initializer: open this worker's connection"""
+    global _db
+    from database import ViolationDatabase
+    _db = ViolationDatabase(config, read_only=True)
+
+
+def render_csv(path: str, heading: str, rows: List[Tuple]):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([heading, 'Violations', 'Total Fines'])
+        for name, count, total in rows:
+            writer.writerow([name, count, f"{total:.2f}"])
+
+
+def render_html(path: str, title: str, heading: str, rows: List[Tuple]):
+    count = sum(row[1] for row in rows)
+    total = sum(row[2] for row in rows)
+    body = "\n".join(
+        f"<tr><td>{html.escape(str(name))}</td><td>{rows_count:,}</td><td>₱{rows_total:,.2f}</td></tr>"
+        for name, rows_count, rows_total in rows
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>body{{font-family:Arial,sans-serif}} table{{border-collapse:collapse}}
+td,th{{border:1px solid #ccc;padding:4px 10px}} td+td{{text-align:right}}</style></head>
+<body><h1>{html.escape(title)}</h1>
+<p>Generated {datetime.now():%Y-%m-%d %H:%M}</p>
+<table><tr><th>{html.escape(heading)}</th><th>Violations</th><th>Total Fines</th></tr>
+{body}
+<tr><th>Total</th><th>{count:,}</th><th>₱{total:,.2f}</th></tr></table>
+</body></html>
+""")
+
+
+def render_report(report_type: str, period: str, fmt: str, output_dir: str) -> str:
+    """Render one report unless an up-to-date copy exists; returns its path (runs in a worker)"""
+    column, heading = REPORT_TYPES[report_type]
+    start, end = parse_period(period)
+
+    high_water = _db.get_period_high_water(start, end, include_history=True)
+    _db.connection.commit()  # end the read snapshot so the next task sees new data
+    key = hashlib.sha1(repr(high_water).encode()).hexdigest()[:12]
+    path = os.path.join(output_dir, f"{report_type}_{period}_{key}.{fmt}")
+    if os.path.exists(path):
+        return path
+
+    # Raises on a failed query, so an empty report is never written and reused
+    rows = [(name, count, float(total or 0))
+            for name, count, total in _db.summarize_violations(column, start, end, include_history=True)]
+    temp_path = f"{path}.tmp"
+    if fmt == 'csv':
+        render_csv(temp_path, heading, rows)
+    else:
+        render_html(temp_path, f"Violations by {heading} - {start:%B %Y}", heading, rows)
+    os.replace(temp_path, path)
+    return path
+
+
+class ReportEngine:
+    def __init__(self, workers: Optional[int] = None, output_dir: Optional[str] = None,
+                 config: Optional[Dict] = None):
+        self.workers = workers or REPORT_CONFIG['workers']
+        self.output_dir = output_dir or REPORT_CONFIG['output_dir']
+        self.config = config
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            # Spawned, not forked: a forked child would inherit the Tk interpreter
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker, initargs=(self.config,)
+            )
+        return self._pool
+
+    def submit(self, report_type: str, period: str, fmt: str = 'html') -> Future:
+        """Queue one report; the future resolves to the file path"""
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type '{report_type}'")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'")
+        parse_period(period)
+        return self._executor().submit(render_report, report_type, period, fmt, self.output_dir)
+
+    def submit_bundle(self, period: str, fmt: str = 'html') -> Dict[str, Future]:
+        """Queue every report type for a month"""
+        return {report_type: self.submit(report_type, period, fmt) for report_type in REPORT_TYPES}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render monthly violation reports")
+    parser.add_argument("period", help="month as YYYY-MM")
+    parser.add_argument("--format", choices=FORMATS, default='html')
+    parser.add_argument("--type", choices=list(REPORT_TYPES), help="one report instead of the bundle")
+    args = parser.parse_args(argv)
+
+    engine = ReportEngine()
+    try:
+        if args.type:
+            futures = {args.type: engine.submit(args.type, args.period, args.format)}
+        else:
+            futures = engine.submit_bundle(args.period, args.format)
+        for report_type, future in futures.items():
+            print(f"✓ {report_type}: {future.result()}")
+        return 0
+    except Exception as e:
+        print(f"✗ Report failed: {e}")
+        return 1
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
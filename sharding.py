@@ -0,0 +1,434 @@
+"""
+sharding.py - Regional sharding with scatter-gather queries
+Vehicle Violation Management System
+
+ShardRouter spreads violations over one database per region (municipality
+or jurisdiction). A write goes to the shard of the region it names. Every
+shard hands out IDs from its own residue class (auto_increment_increment =
+id_stride, auto_increment_offset = shard_number), so a violation ID alone
+identifies its shard, and reads, updates and deletes by ID touch a single
+server.
+
+Plate lookups consult a small plate -> region directory and query only the
+shards that hold the plate. Listings, searches, exports and aggregates are
+sent to every shard at once. Each shard returns results already sorted,
+and the router combines them with a k-way merge (heapq.merge), so no shard's
+results are re-sorted.
+
+    router = ShardRouter.from_config()
+    violation_id = router.create_violation('north', 'ABC123', 'Car', 'Speeding', ...)
+    router.get_plate_history('ABC123')       # only shards that saw ABC123
+    router.search_violations('Main')         # every shard, merged newest first
+
+Any objects with the ViolationDatabase API can serve as shards, so several
+local databases (or in-memory fakes) can stand in for regional servers:
+
+    router = ShardRouter({'north': ViolationDatabase(north_config),
+                          'south': ViolationDatabase(south_config)},
+                         shard_numbers={'north': 1, 'south': 2})
+
+IDs only route correctly when every insert uses the shard's offset. The
+router sets it on its own connections; set auto_increment_increment and
+auto_increment_offset in each server's my.cnf as well, so other writers use
+it too.
+
+Rows created before sharding keep their old IDs, whose residue says nothing
+about their shard, and a shard's new IDs may repeat another shard's old
+ones. When loading legacy data, start every shard's AUTO_INCREMENT above
+the highest legacy ID and set SHARDING_CONFIG['legacy_max_id'] to it. IDs
+up to that value are looked up on every shard; one found on several shards
+raises AmbiguousViolationError unless the caller names its region. After
+loading shards directly, run rebuild_plate_directory() so plate lookups
+see those rows. It also repairs the directory after a write whose
+directory update failed; such failures are logged, not raised, since the
+row itself was saved.
+
+Shard handles take writes, so they do not autocommit; the router ends the
+transaction after every call so reads never come from an old snapshot.
+"""
+import heapq
+import itertools
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import DATABASE_CONFIG, SHARD_CONFIGS, SHARDING_CONFIG
+
+# Column positions in get_all_violations-style rows
+ID_COLUMN = 0
+DATE_TIME_COLUMN = 6
+
+_END = object()
+
+
+class AmbiguousViolationError(Exception):
+    """A legacy violation ID exists on more than one shard"""
+
+    def __init__(self, violation_id: int, regions: List[str]):
+        super().__init__(f"Violation ID {violation_id} exists in several regions "
+                         f"({', '.join(sorted(regions))}); name the region")
+        self.violation_id = violation_id
+        self.regions = regions
+
+
+class ShardRouter:
+    def __init__(self, shards: Dict[str, object], shard_numbers: Dict[str, int],
+                 directory=None, id_stride: Optional[int] = None, workers: Optional[int] = None,
+                 default_region: Optional[str] = None, legacy_max_id: Optional[int] = None):
+        """Route across region -> database handles
+
+        shard_numbers gives each region its ID residue. Without a directory,
+        plate lookups are sent to every shard. IDs up to legacy_max_id date
+        from before sharding and are located by asking every shard.
+        """
+        self.shards = dict(shards)
+        self.id_stride = id_stride or SHARDING_CONFIG['id_stride']
+        self.legacy_max_id = SHARDING_CONFIG['legacy_max_id'] if legacy_max_id is None else legacy_max_id
+        self.directory = directory
+        self.default_region = default_region or SHARDING_CONFIG['default_region']
+        if set(shard_numbers) != set(self.shards):
+            raise ValueError("Every shard needs exactly one shard number")
+        numbers = list(shard_numbers.values())
+        if len(set(numbers)) != len(numbers) or not all(0 < n < self.id_stride for n in numbers):
+            raise ValueError(f"Shard numbers must be unique and between 1 and {self.id_stride - 1}")
+        self.shard_numbers = dict(shard_numbers)
+        self._regions_by_number = {number: region for region, number in shard_numbers.items()}
+        # A pymysql connection serves one thread at a time
+        self._locks = {region: threading.Lock() for region in self.shards}
+        self._directory_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers or SHARDING_CONFIG['workers'],
+                                            thread_name_prefix='shard')
+        for region, db in self.shards.items():
+            self._set_id_offset(region, db)
+        print(f"✓ Routing across {len(self.shards)} shard(s): {', '.join(sorted(self.shards))}")
+
+    @classmethod
+    def from_config(cls, shard_configs: Optional[Dict[str, Dict]] = None) -> 'ShardRouter':
+        """Connect to every shard in SHARD_CONFIGS and the plate directory"""
+        from database import ViolationDatabase
+        shard_configs = shard_configs or SHARD_CONFIGS
+        if not shard_configs:
+            raise ValueError("No shards configured in SHARD_CONFIGS")
+        shards = {region: ViolationDatabase(config) for region, config in shard_configs.items()}
+        directory = ViolationDatabase(SHARDING_CONFIG['directory'] or DATABASE_CONFIG)
+        return cls(shards, {region: config['shard_number'] for region, config in shard_configs.items()},
+                   directory=directory)
+
+    def _set_id_offset(self, region: str, db):
+        cursor = getattr(db, 'cursor', None)
+        if cursor is None:
+            return
+        try:
+            cursor.execute("SET SESSION auto_increment_increment = %s, auto_increment_offset = %s",
+                           (self.id_stride, self.shard_numbers[region]))
+        except Exception as e:
+            print(f"⚠ Could not set ID offset on shard '{region}': {e}")
+
+    # --- Placement ----------------------------------------------------------
+
+    def region_for(self, region: Optional[str]) -> str:
+        region = region or self.default_region
+        if region not in self.shards:
+            raise ValueError(f"Unknown region '{region}'")
+        return region
+
+    def region_of(self, violation_id: int) -> Optional[str]:
+        """Region whose shard issued an ID; None for IDs from before sharding"""
+        if violation_id <= self.legacy_max_id:
+            return None
+        return self._regions_by_number.get(violation_id % self.id_stride)
+
+    def _call(self, region: str, call: Callable):
+        db = self.shards[region]
+        with self._locks[region]:
+            try:
+                result = call(db)
+            except Exception:
+                _end_transaction(db, commit=False)
+                raise
+            _end_transaction(db)
+            return result
+
+    def _gather(self, calls: Dict[str, Callable]) -> Dict[str, object]:
+        """Run each region's call(db) in parallel; results by region"""
+        futures = {region: self._executor.submit(self._call, region, call) for region, call in calls.items()}
+        return {region: future.result() for region, future in futures.items()}
+
+    def _scatter(self, call: Callable, regions: Optional[Iterable[str]] = None) -> Dict[str, object]:
+        """Run the same call(db) on several shards (default: all) in parallel"""
+        return self._gather({region: call for region in (self.shards if regions is None else regions)})
+
+    def _locate_legacy(self, violation_ids: List[int]) -> Dict[int, str]:
+        """Shard holding each legacy ID that exists; raises if one is on several"""
+        holders = defaultdict(list)
+        for region, rows in self._scatter(lambda db: db.get_violations_by_ids(violation_ids)).items():
+            for row in rows:
+                holders[row[ID_COLUMN]].append(region)
+        for violation_id, regions in holders.items():
+            if len(regions) > 1:
+                raise AmbiguousViolationError(violation_id, regions)
+        return {violation_id: regions[0] for violation_id, regions in holders.items()}
+
+    def _region_for_id(self, violation_id: int, region: Optional[str] = None) -> str:
+        """Shard to run a by-ID call on; for a missing ID any shard answers 'not found'"""
+        if region is not None:
+            return self.region_for(region)
+        owner = self.region_of(violation_id)
+        if owner is None and violation_id <= self.legacy_max_id:
+            owner = self._locate_legacy([violation_id]).get(violation_id)
+        return owner or next(iter(self.shards))
+
+    def _for_id(self, violation_id: int, call: Callable, region: Optional[str] = None):
+        """Run call on the one shard holding an ID"""
+        return self._call(self._region_for_id(violation_id, region), call)
+
+    def _group_ids(self, violation_ids: List[int]) -> Dict[str, List[int]]:
+        """Shard -> its share of the IDs; IDs no shard can hold are dropped"""
+        groups = defaultdict(list)
+        legacy = []
+        for violation_id in violation_ids:
+            if violation_id <= self.legacy_max_id:
+                legacy.append(violation_id)
+            elif self.region_of(violation_id) is not None:
+                groups[self.region_of(violation_id)].append(violation_id)
+        if legacy:
+            for violation_id, region in self._locate_legacy(legacy).items():
+                groups[region].append(violation_id)
+        return groups
+
+    def _write_plates(self, region: str, plates: Iterable[str]):
+        if self.directory is not None:
+            with self._directory_lock:
+                self.directory.add_plate_regions([(plate, region) for plate in plates])
+
+    def _record_plates(self, region: str, plates: Iterable[str]):
+        """Note plates a committed write added to a region
+
+        The row is already saved on its shard, so a directory failure is only
+        logged; rebuild_plate_directory() fills in what was missed.
+        """
+        try:
+            self._write_plates(region, plates)
+        except Exception as e:
+            print(f"⚠ Plate directory not updated for region '{region}': {e}; "
+                  f"run rebuild_plate_directory()")
+
+    def _plate_regions(self, plate_numbers: List[str]) -> Dict[str, List[str]]:
+        """Shards to ask about each plate"""
+        if self.directory is None:
+            return {region: list(plate_numbers) for region in self.shards}
+        with self._directory_lock:
+            directory = self.directory.get_plate_regions(plate_numbers)
+        by_region = defaultdict(list)
+        for plate, regions in directory.items():
+            for region in regions:
+                if region in self.shards:
+                    by_region[region].append(plate)
+        return by_region
+
+    # --- Writes -------------------------------------------------------------
+
+    def create_violation(self, region: Optional[str], plate_number: str, *args, **kwargs) -> int:
+        """Insert into the region's shard; returns the (globally unique) ID"""
+        region = self.region_for(region)
+        violation_id = self._call(region, lambda db: db.create_violation(plate_number, *args, **kwargs))
+        self._record_plates(region, [plate_number])
+        return violation_id
+
+    def insert_violations_bulk(self, region: Optional[str], records: List[Dict],
+                               on_duplicate: Optional[str] = None) -> Dict[str, int]:
+        region = self.region_for(region)
+        counts = self._call(region, lambda db: db.insert_violations_bulk(records, on_duplicate))
+        self._record_plates(region, {record['plate_number'] for record in records})
+        return counts
+
+    def update_violation(self, violation_id: int, plate_number: str, *args,
+                         region: Optional[str] = None, **kwargs) -> bool:
+        region = self._region_for_id(violation_id, region)
+        updated = self._call(region, lambda db: db.update_violation(violation_id, plate_number, *args, **kwargs))
+        if updated:
+            self._record_plates(region, [plate_number])
+        return updated
+
+    def patch_violation(self, violation_id: int, changes: Dict,
+                        expected_version: Optional[int] = None, region: Optional[str] = None) -> bool:
+        region = self._region_for_id(violation_id, region)
+        patched = self._call(region, lambda db: db.patch_violation(violation_id, changes, expected_version))
+        if patched and 'plate_number' in changes:
+            self._record_plates(region, [changes['plate_number']])
+        return patched
+
+    def delete_violation(self, violation_id: int, region: Optional[str] = None) -> bool:
+        # Directory entries are left behind; they only cost an empty lookup
+        return self._for_id(violation_id, lambda db: db.delete_violation(violation_id), region)
+
+    def _bulk_by_id(self, violation_ids: List[int], method: str, *args) -> int:
+        """Apply a bulk method to each shard's share of the IDs in parallel
+
+        Legacy IDs are located first, and an ambiguous one aborts the call
+        before any shard is changed.
+        """
+        calls = {region: (lambda ids: lambda db: getattr(db, method)(ids, *args))(ids)
+                 for region, ids in self._group_ids(violation_ids).items()}
+        return sum(self._gather(calls).values())
+
+    def update_status_bulk(self, violation_ids: List[int], status: str) -> int:
+        return self._bulk_by_id(violation_ids, 'update_status_bulk', status)
+
+    def delete_violations_bulk(self, violation_ids: List[int]) -> int:
+        return self._bulk_by_id(violation_ids, 'delete_violations_bulk')
+
+    # --- Point reads --------------------------------------------------------
+
+    def get_violation(self, violation_id: int, region: Optional[str] = None):
+        return self._for_id(violation_id, lambda db: db.get_violation(violation_id), region)
+
+    def get_plate_history(self, plate_number: str, include_history: bool = True) -> List[Tuple]:
+        """A plate's violations from the shards the directory names, newest first"""
+        return self.get_violations_for_plates([plate_number], include_history)
+
+    def get_violations_for_plates(self, plate_numbers: List[str],
+                                  include_history: bool = True) -> List[Tuple]:
+        if not plate_numbers:
+            return []
+        calls = {region: (lambda plates: lambda db: db.get_violations_for_plates(plates, include_history))(plates)
+                 for region, plates in self._plate_regions(plate_numbers).items()}
+        return merge_newest_first(self._gather(calls).values())
+
+    # --- Scatter-gather -----------------------------------------------------
+
+    def get_all_violations(self, include_history: bool = False,
+                           limit: Optional[int] = None) -> List[Tuple]:
+        return merge_newest_first(
+            self._scatter(lambda db: db.get_all_violations(include_history, limit)).values(), limit
+        )
+
+    def search_violations(self, search_term: str, include_history: bool = False,
+                          limit: Optional[int] = None) -> List[Tuple]:
+        return merge_newest_first(
+            self._scatter(lambda db: db.search_violations(search_term, include_history, limit)).values(),
+            limit
+        )
+
+    def get_violation_summary(self, group_by: str = 'status', start=None, end=None) -> List[Tuple]:
+        """Counts and fine totals per group, added up across shards"""
+        totals: Dict[object, list] = {}
+        for rows in self._scatter(lambda db: db.get_violation_summary(group_by, start, end)).values():
+            for group, count, fines in rows:
+                entry = totals.setdefault(group, [0, 0])
+                entry[0] += count
+                entry[1] += fines or 0
+        return sorted(((group, count, fines) for group, (count, fines) in totals.items()),
+                      key=lambda row: -row[1])
+
+    def get_region_summary(self, start=None, end=None) -> List[Tuple]:
+        """(region, violations, total fines) per shard"""
+        results = self._scatter(lambda db: db.get_violation_summary('status', start, end))
+        return sorted(((region, sum(row[1] for row in rows), sum(row[2] or 0 for row in rows))
+                       for region, rows in results.items()), key=lambda row: -row[1])
+
+    def iter_violations(self, batch_size: int = 1000, include_history: bool = False):
+        """Stream full rows from every shard at once, merged into one ID order
+
+        Each shard is read by its own thread into a bounded queue, so a slow
+        shard does not stall the others and memory stays flat.
+        """
+        stop = threading.Event()
+        queues = []
+        for region in self.shards:
+            rows = queue.Queue(maxsize=4)
+            queues.append(rows)
+            threading.Thread(target=self._stream_shard, args=(region, batch_size, include_history, rows, stop),
+                             name=f'shard-export-{region}', daemon=True).start()
+        try:
+            batch = []
+            for row in heapq.merge(*(_drain(rows) for rows in queues), key=lambda row: row[ID_COLUMN]):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            stop.set()
+
+    def _stream_shard(self, region: str, batch_size: int, include_history: bool,
+                      rows: queue.Queue, stop: threading.Event):
+        """Producer for iter_violations; hands batches (or the error) to the merger"""
+        with self._locks[region]:
+            stream = self.shards[region].iter_violations(batch_size, include_history)
+            try:
+                for batch in stream:
+                    if not _put(rows, batch, stop):
+                        return
+                _put(rows, _END, stop)
+            except Exception as e:
+                _put(rows, e, stop)
+            finally:
+                stream.close()
+                _end_transaction(self.shards[region], commit=False)
+
+    # --- Maintenance --------------------------------------------------------
+
+    def rebuild_plate_directory(self) -> int:
+        """Refill the directory from every shard's plates; returns the entries written"""
+        if self.directory is None:
+            raise ValueError("No plate directory configured")
+        written = 0
+        for region, (plates, _, _) in self._scatter(lambda db: db.get_distinct_plates()).items():
+            for start in range(0, len(plates), 10000):
+                self._write_plates(region, plates[start:start + 10000])
+            written += len(plates)
+        print(f"✓ Plate directory holds {written:,} plate/region entries")
+        return written
+
+    def close(self):
+        """Close every shard and the directory"""
+        self._executor.shutdown(wait=True)
+        for db in self.shards.values():
+            db.close()
+        if self.directory is not None:
+            self.directory.close()
+
+
+def merge_newest_first(results: Iterable[List[Tuple]], limit: Optional[int] = None) -> List[Tuple]:
+    """k-way merge of per-shard lists already sorted by date_time descending"""
+    merged = heapq.merge(*results, key=lambda row: row[DATE_TIME_COLUMN], reverse=True)
+    return list(itertools.islice(merged, limit or None))
+
+
+def _end_transaction(db, commit: bool = True):
+    """Close the transaction a shard call left open (fakes have no connection)"""
+    connection = getattr(db, 'connection', None)
+    if connection is None:
+        return
+    try:
+        if commit:
+            connection.commit()
+        else:
+            connection.rollback()
+    except Exception as e:
+        print(f"⚠ Could not end shard transaction: {e}")
+
+
+def _put(rows: queue.Queue, item, stop: threading.Event) -> bool:
+    """Queue an item unless the consumer has gone away"""
+    while not stop.is_set():
+        try:
+            rows.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(rows: queue.Queue):
+    """Rows from one shard's producer, re-raising its error"""
+    while True:
+        item = rows.get()
+        if item is _END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield from item
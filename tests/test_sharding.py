@@ -0,0 +1,146 @@
+"""
+test_sharding.py - ShardRouter routing and merging against in-memory shards
+Vehicle Violation Management System
+
+    python -m pytest tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import AmbiguousViolationError, ShardRouter, merge_newest_first  # noqa: E402
+
+STRIDE = 64
+NORTH, SOUTH = 1, 2
+START = datetime(2024, 1, 1)
+
+
+def make_row(violation_id: int, hours: int = 0, plate: str = 'ABC123'):
+    """A get_all_violations-shaped row"""
+    return (violation_id, plate, 'Car', 'Speeding', 'Main Street', 1000,
+            START + timedelta(hours=hours), 'Pending')
+
+
+class FakeShard:
+    """The slice of the ViolationDatabase API the router calls"""
+
+    def __init__(self, rows=(), offset: int = NORTH):
+        self.rows = {row[0]: row for row in rows}
+        self.next_id = offset
+        self.fail_export = False
+
+    def create_violation(self, plate_number, *args, **kwargs):
+        while self.next_id in self.rows:
+            self.next_id += STRIDE
+        self.rows[self.next_id] = make_row(self.next_id, plate=plate_number)
+        return self.next_id
+
+    def get_violation(self, violation_id):
+        return self.rows.get(violation_id)
+
+    def get_violations_by_ids(self, violation_ids):
+        return [self.rows[i] for i in violation_ids if i in self.rows]
+
+    def update_status_bulk(self, violation_ids, status):
+        return len(self.get_violations_by_ids(violation_ids))
+
+    def get_all_violations(self, include_history=False, limit=None):
+        rows = sorted(self.rows.values(), key=lambda row: row[6], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def iter_violations(self, batch_size=1000, include_history=False):
+        rows = sorted(self.rows.values())
+        for start in range(0, len(rows), batch_size):
+            if self.fail_export and start:
+                raise RuntimeError("shard went away")
+            yield rows[start:start + batch_size]
+
+    def close(self):
+        pass
+
+
+class FailingDirectory:
+    def add_plate_regions(self, entries):
+        raise RuntimeError("directory unreachable")
+
+    def close(self):
+        pass
+
+
+class ShardRouterTest(unittest.TestCase):
+    def make_router(self, north=(), south=(), **kwargs):
+        self.north = FakeShard(north, NORTH)
+        self.south = FakeShard(south, SOUTH)
+        with contextlib.redirect_stdout(io.StringIO()):
+            router = ShardRouter({'north': self.north, 'south': self.south},
+                                 {'north': NORTH, 'south': SOUTH}, id_stride=STRIDE,
+                                 default_region='north', **kwargs)
+        self.addCleanup(router.close)
+        return router
+
+    def test_region_of_uses_the_id_residue(self):
+        router = self.make_router(legacy_max_id=100)
+        self.assertEqual(router.region_of(STRIDE * 3 + NORTH), 'north')
+        self.assertEqual(router.region_of(STRIDE * 3 + SOUTH), 'south')
+        self.assertIsNone(router.region_of(STRIDE * 3 + 5))  # no shard has that number
+        self.assertIsNone(router.region_of(NORTH + STRIDE))  # legacy, residue means nothing
+
+    def test_group_ids_places_new_ids_and_locates_legacy_ones(self):
+        router = self.make_router(north=[make_row(7)], south=[make_row(9)], legacy_max_id=100)
+        new_south, unplaceable = STRIDE * 4 + SOUTH, STRIDE * 4 + 5
+        groups = router._group_ids([7, 9, 11, new_south, unplaceable])
+        self.assertEqual(groups['north'], [7])
+        self.assertEqual(sorted(groups['south']), [9, new_south])
+        self.assertNotIn(11, sum(groups.values(), []))  # legacy ID on no shard
+        self.assertNotIn(unplaceable, sum(groups.values(), []))
+        self.assertEqual(set(groups), {'north', 'south'})
+
+    def test_ambiguous_legacy_id_needs_a_region(self):
+        router = self.make_router(north=[make_row(7)], south=[make_row(7, plate='XYZ789')],
+                                  legacy_max_id=100)
+        with self.assertRaises(AmbiguousViolationError) as raised:
+            router.get_violation(7)
+        self.assertEqual(sorted(raised.exception.regions), ['north', 'south'])
+        self.assertEqual(router.get_violation(7, region='south')[1], 'XYZ789')
+        with self.assertRaises(AmbiguousViolationError):
+            router.update_status_bulk([7], 'Paid')
+
+    def test_merge_newest_first_keeps_date_order_and_limit(self):
+        north = [make_row(1, 9), make_row(3, 5), make_row(5, 1)]
+        south = [make_row(2, 8), make_row(4, 2)]
+        merged = merge_newest_first([north, south])
+        self.assertEqual([row[0] for row in merged], [1, 2, 3, 4, 5])
+        self.assertEqual([row[0] for row in merge_newest_first([north, south], limit=2)], [1, 2])
+        self.assertEqual(merge_newest_first([[], []]), [])
+
+    def test_iter_violations_merges_shards_in_id_order(self):
+        north = [make_row(STRIDE * n + NORTH) for n in range(5)]
+        south = [make_row(STRIDE * n + SOUTH) for n in range(3)]
+        router = self.make_router(north=north, south=south)
+        batches = list(router.iter_violations(batch_size=3))
+        ids = [row[0] for batch in batches for row in batch]
+        self.assertEqual(ids, sorted(row[0] for row in north + south))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 2])
+
+    def test_iter_violations_raises_a_shard_error(self):
+        router = self.make_router(north=[make_row(STRIDE * n + NORTH) for n in range(5)])
+        self.north.fail_export = True
+        with self.assertRaises(RuntimeError):
+            list(router.iter_violations(batch_size=2))
+
+    def test_directory_failure_does_not_fail_a_saved_write(self):
+        router = self.make_router(directory=FailingDirectory())
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            violation_id = router.create_violation('north', 'ABC123')
+        self.assertEqual(router.region_of(violation_id), 'north')
+        self.assertIn(violation_id, self.north.rows)
+        self.assertIn('rebuild_plate_directory', output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()